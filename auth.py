@@ -0,0 +1,40 @@
+import streamlit as st
+
+# ==========================================
+# 🔒 安全守門員：登入檢查系統
+# ==========================================
+def check_password():
+    """如果使用者輸入正確密碼，回傳 True，否則回傳 False"""
+
+    def password_entered():
+        """檢查使用者輸入的密碼是否與 secrets 中的設定相符"""
+        if st.session_state["password"] == st.secrets["LOGIN_PASSWORD"]:
+            st.session_state["password_correct"] = True
+            del st.session_state["password"]  # 驗證後刪除輸入框的暫存，保持乾淨
+        else:
+            st.session_state["password_correct"] = False
+
+    # 初始化 session state
+    if "password_correct" not in st.session_state:
+        # 第一次進入，顯示輸入框
+        st.text_input(
+            "請輸入系統密碼 / Password", type="password", on_change=password_entered, key="password"
+        )
+        return False
+    
+    elif not st.session_state["password_correct"]:
+        # 密碼錯誤，再次顯示輸入框
+        st.text_input(
+            "❌ 密碼錯誤，請重試 / Password", type="password", on_change=password_entered, key="password"
+        )
+        return False
+    
+    else:
+        # 密碼正確
+        return True
+
+
+def require_login():
+    """每個頁面開頭呼叫：沒通過登入，程式就停在這裡 (st.stop)"""
+    if not check_password():
+        st.stop()
@@ -0,0 +1 @@
+# 排班引擎共用模組 (不依賴 Streamlit，可供頁面、批次工具與 API 共用)
@@ -0,0 +1,180 @@
+import argparse
+import base64
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from engine.core import ScheduleEngine
+from engine.erp import build_erp_delta, build_erp_workbook, day_cells, diff_manifest, erp_manifest, group_by_employee
+from engine.nurse import NURSE_PAYLOAD_PROFILE
+from engine.payload import check_payload, check_result_rows
+from engine.raw_io import RAW_COLUMNS
+from engine.rehab import REHAB_PAYLOAD_PROFILE
+from engine.trace import TRACE_COLUMNS
+from engine.validate import MAX_UPLOAD_MB
+
+# ==========================================
+# 🔌 本機 JSON API：不經 Streamlit、不經 xlsx (python -m engine.api --port 8765)
+# ==========================================
+# POST /schedule  排班輸入 (格式見 engine.payload) -> 排班結果 rows
+# POST /validate  同樣的輸入，只檢查不排班
+# POST /erp       排班結果 rows (+ 上一版 manifest) -> 每位員工的 ERP 區塊與指紋
+# 請求本體可為單一物件，或物件的 list (批次)，批次一律回 200，各筆自帶 ok
+DEPARTMENTS = {
+    'rehab': (REHAB_PAYLOAD_PROFILE, ('PT', 'OT'), ('OFF', 'ON')),
+    'nurse': (NURSE_PAYLOAD_PROFILE, ('need',), ('OFF', 'ON', 'PT_OK')),
+}
+ROW_COLUMNS = ['date', 'shift', 'loc', 'name', 'id']   # 與 RAW_COLUMNS 同順序
+
+
+def _department(req):
+    dept = req.get('dept') if isinstance(req, dict) else None
+    if dept not in DEPARTMENTS: raise ValueError(f"dept 需為 {'/'.join(DEPARTMENTS)}: {dept!r}")
+    return dept, DEPARTMENTS[dept]
+
+
+def _load(req):
+    """結構檢查一次後載入：回傳 (engine, []) 或 (None, 錯誤訊息清單)"""
+    dept, (profile, site_numbers, kinds) = _department(req)
+    errors = check_payload(req, site_numbers, kinds)
+    if errors: return None, errors
+    engine = ScheduleEngine(profile, req, trace=bool(req.get('trace')))
+    success, msg = engine.load_data()
+    return (engine, []) if success else (None, [f"❌ {msg}"])
+
+
+def _failed(errors):
+    return {'ok': False, 'msg': errors[0] if len(errors) == 1 else f"❌ 共 {len(errors)} 項錯誤", 'errors': errors}
+
+
+def _rows(engine):
+    return [[r['日期'].strftime('%Y/%m/%d') if hasattr(r['日期'], 'strftime') else r['日期'], r['時段'], r['地點'], r['姓名'], r['員工編號']]
+            for r in engine.records()]
+
+
+def _unfilled(engine):
+    out = []
+    for (d_str, shift, loc), req in engine.requirements.items():
+        if d_str not in engine.schedule or shift not in engine.open_shifts.get(d_str, ()): continue
+        missing = int(sum(req.values())) - len(engine.workers(d_str, shift, loc))
+        if missing > 0: out.append([d_str, shift, loc, missing])
+    return sorted(out)
+
+
+def api_schedule(req):
+    engine, errors = _load(req)
+    if errors: return _failed(errors)
+    engine.solve()
+    res = {'ok': True, 'msg': f"排班成功 ({len(engine.dates)} 天)", 'dept': req['dept'], 'columns': ROW_COLUMNS, 'rows': _rows(engine),
+           'staff': {name: [engine.assigned.get(name, 0), info['target']] for name, info in engine.staff.items()},
+           'unfilled': _unfilled(engine), 'pairs': engine.pairs.rows()}
+    if engine.trace is not None:
+        res['trace'] = {'columns': TRACE_COLUMNS, 'rows': engine.trace.to_frame().values.tolist()}
+    return res
+
+
+def api_validate(req):
+    engine, errors = _load(req)
+    if errors: return _failed(errors)
+    slots = sum(1 for d in engine.dates for _ in engine.open_shifts.get(d, ()))
+    return {'ok': True, 'msg': "格式正確", 'errors': [],
+            'summary': {'dates': len(engine.dates), 'shifts': slots, 'staff': len(engine.staff), 'exceptions': len(engine.exceptions),
+                        'locations': engine.layout.locations, 'fill_locations': engine.layout.fill_locations, 'rest': engine.rest_config}}
+
+
+def api_erp(req):
+    """rows: /schedule 的結果 (可含手動修改)；previous: 上一版回傳的 manifest，給了就只回傳有異動的員工"""
+    dept, (profile, _, _) = _department(req)
+    rows = req.get('rows')
+    errors = check_result_rows(rows, req.get('previous'))
+    if errors: return _failed(errors)
+    df_raw = pd.DataFrame(rows, columns=RAW_COLUMNS)
+    _, staff_schedule = group_by_employee(df_raw.copy())
+    manifest = erp_manifest(staff_schedule)
+    previous = req.get('previous')
+    if previous is not None:
+        previous = {str(k): tuple(v) for k, v in previous.items()}
+        changed, removed, changes = diff_manifest(previous, manifest)
+    else:
+        changed, removed, changes = sorted(staff_schedule), {}, None
+    employees = []
+    for emp_id in changed:
+        days = {d_str: list(day_cells(items)) for d_str, items in sorted(staff_schedule[emp_id]['data'].items())}
+        employees.append({'id': emp_id, 'name': staff_schedule[emp_id]['name'], 'fingerprint': manifest[emp_id][1], 'days': days})
+    res = {'ok': True, 'msg': f"ERP 轉檔成功 ({len(employees)} 位員工)", 'employees': employees,
+           'removed': [[emp_id, name] for emp_id, name in removed.items()],
+           'manifest': {emp_id: list(v) for emp_id, v in manifest.items()}}
+    if changes is not None: res['changes'] = {'columns': list(changes.columns), 'rows': changes.values.tolist()}
+    if req.get('xlsx'):
+        # 仍需 ERP 導入檔時附上 base64 xlsx (與頁面下載的相同)
+        output = build_erp_workbook(df_raw, profile['erp_theme']) if previous is None else build_erp_delta(df_raw, previous, profile['erp_theme'])[0]
+        res['xlsx'] = base64.b64encode(output.getvalue()).decode('ascii')
+    return res
+
+
+ROUTES = {'/schedule': api_schedule, '/validate': api_validate, '/erp': api_erp}
+
+
+def handle(path, body):
+    """不經 HTTP 直接呼叫 (同一支程式內批次用)；回傳 JSON 可序列化的 dict / list"""
+    handler = ROUTES.get(path.rstrip('/'))
+    if handler is None: return {'ok': False, 'msg': f"❌ 沒有這個路徑: {path}"}
+    if isinstance(body, list): return [handle(path, item) for item in body]
+    try:
+        return handler(body)
+    except Exception as e:
+        return {'ok': False, 'msg': f"❌ 處理失敗: {e}"}
+
+
+class ScheduleAPIHandler(BaseHTTPRequestHandler):
+    server_version = 'IanScheduleAPI/1.0'
+    quiet = False
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.split('?')[0].rstrip('/') == '/health': self._send(200, {'ok': True, 'routes': sorted(ROUTES)})
+        else: self._send(404, {'ok': False, 'msg': f"❌ 沒有這個路徑: {self.path}"})
+
+    def do_POST(self):
+        path = self.path.split('?')[0]
+        if path.rstrip('/') not in ROUTES: return self._send(404, {'ok': False, 'msg': f"❌ 沒有這個路徑: {path}"})
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_UPLOAD_MB * 2**20: return self._send(413, {'ok': False, 'msg': f"❌ 請求 {length / 2**20:.1f} MB 超過上限 {MAX_UPLOAD_MB:g} MB"})
+        try:
+            body = json.loads(self.rfile.read(length) or b'null')
+        except ValueError as e:
+            return self._send(400, {'ok': False, 'msg': f"❌ JSON 格式錯誤: {e}"})
+        res = handle(path, body)
+        self._send(200 if isinstance(res, list) or res['ok'] else 400, res)
+
+    def log_message(self, fmt, *args):
+        if not self.quiet: super().log_message(fmt, *args)
+
+
+def serve(host='127.0.0.1', port=8765, quiet=False):
+    ScheduleAPIHandler.quiet = quiet
+    server = ThreadingHTTPServer((host, port), ScheduleAPIHandler)
+    print(f"排班 API 啟動: http://{host}:{server.server_port} ({', '.join(sorted(ROUTES))})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="本機排班 JSON API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--quiet', action='store_true', help="不輸出每筆請求的紀錄")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.quiet)
@@ -0,0 +1,126 @@
+import csv
+import os
+import tempfile
+from datetime import datetime
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+
+from engine.core import WEEKDAY_CHARS
+from engine.dashboard import STAT_COLUMNS, compute_staff_stats
+from engine.raw_io import RAW_COLUMNS, RAW_SHEET
+
+# ==========================================
+# 🧱 分段排班：逐月 / 逐週排班並直接寫到暫存檔 (整年、多院區用)
+# ==========================================
+# 記憶體上限 (約略)：
+#   輸入表的需求 / 例外索引 (與天數成正比，每 (日, 時段, 院區) 約 0.5 KB)
+#   + 全年的固定班 (通常每天數十筆)
+#   + 一個區段的班表與該段儀表板的一列資料
+# 輸出用 openpyxl write-only：每列寫入後即轉存到磁碟暫存檔，不保留 cell 物件；
+# 一般模式則要同時保留整本活頁簿 (每格約 0.5~1 KB) 與底稿的 DataFrame 副本。
+# 實測 (tracemalloc，整年輸入)：復健部 25 MB -> 5 MB、護理部 15 MB -> 3.5 MB，底稿與一般模式逐筆相同。
+CHUNKS = ('month', 'week')
+
+
+def chunk_dates(dates, chunk='month'):
+    """排序後的 'YYYY/MM/DD' -> [(區段名稱, [日期])]"""
+    if chunk not in CHUNKS: raise ValueError(f"chunk 需為 {' / '.join(CHUNKS)}")
+    groups = {}
+    for d_str in dates:
+        dt = datetime.strptime(d_str, '%Y/%m/%d')
+        if chunk == 'month': label = dt.strftime('%Y-%m')
+        else: y, w, _ = dt.isocalendar(); label = f"{y}-W{w:02d}"
+        groups.setdefault(label, []).append(d_str)
+    return list(groups.items())
+
+
+def _write_chunk_sheet(wb, engine, label, dates, style):
+    """一個區段的互動排班表 (逐列寫入；write-only 不支援合併儲存格，日期寫在每組第一欄)"""
+    theme = engine.profile['theme']
+    ws = wb.create_sheet(f"排班 {label}")
+    ws.freeze_panes = "M7"
+    cols = []  # [(日期, 時段, 地點)]
+    for d_str in dates:
+        for slot in engine.active_slots_for(d_str):
+            cols.append((d_str, *engine.layout.decode(slot)))
+    col_idx = {key: i for i, key in enumerate(cols)}
+
+    row_date, row_wk, row_shift = [None] * 12, [None] * 12, [None] * 12
+    prev = None
+    for d_str, shift, loc in cols:
+        dt = datetime.strptime(d_str, '%Y/%m/%d')
+        row_date.append(dt.strftime('%m/%d') if d_str != prev else None)
+        row_wk.append(WEEKDAY_CHARS[dt.weekday()] if d_str != prev and theme.get('weekday_row') else None)
+        row_shift.append(shift); prev = d_str
+    ws.append([]); ws.append([]); ws.append(row_date); ws.append(row_wk); ws.append(row_shift)
+    header = []
+    for h in ["姓名", "目標", "實際", "狀態", "A數", "B數", "C數", "AB天", "BC天", "AC天", "ABC天", "全休"] + [loc for _, _, loc in cols]:
+        cell = WriteOnlyCell(ws, h); cell.fill = style['fill']; cell.alignment = style['center']
+        if style['font']: cell.font = style['font']
+        header.append(cell)
+    ws.append(header)
+
+    staff_list = list(engine.staff.items())
+    if theme.get('sort_staff_by_id'): staff_list.sort(key=lambda kv: str(kv[1]['id']))
+    placed, marks = [], {}
+    for d_str in dates:
+        for slot, workers in engine.schedule[d_str].items():
+            key = (d_str, *engine.layout.decode(slot))
+            for w in workers:
+                placed.append((w['name'], *key)); marks.setdefault(w['name'], set()).add(col_idx[key])
+    stats = compute_staff_stats(placed, [n for n, _ in staff_list], dates, engine.layout.shifts)
+    for i, (name, info) in enumerate(staff_list):
+        r = 7 + i
+        is_ft = info['type'] == 'FT'
+        target = info['target'] if is_ft or theme.get('pt_target') is None else theme['pt_target']
+        f_stat = f'=IF(C{r}>B{r}, "加班 +"&(C{r}-B{r}), IF(C{r}<B{r}, "欠班 "&(C{r}-B{r}), "正常"))' if is_ft else f'="{theme["pt_status"]}"&C{r}'
+        row = [name, target, None, f_stat] + [None] * 8
+        for col, c in STAT_COLUMNS.items(): row[c - 1] = int(stats.at[name, col])
+        on = marks.get(name, ())
+        ws.append(row + ["V" if j in on else None for j in range(len(cols))])
+
+
+def run_chunked(engine, out_path=None, chunk='month', csv_path=None, progress=None):
+    """
+    engine 需已 load_data()。固定班先全部排入 (與一般模式相同的公平性起點)，
+    之後逐段補位、寫出、釋放該段班表；跨段只帶著 assigned 與輪替序號。
+    結果與一般模式的底稿逐筆相同，輸出為每段一張排班表 + 一張完整底稿。
+    回傳輸出檔路徑 (未指定 out_path 時為暫存檔，由呼叫端負責刪除)。
+    csv_path：另外把底稿逐段附加到 CSV。
+    """
+    theme = engine.profile['theme']
+    style = {
+        'fill': PatternFill(start_color=theme['header_fill'], end_color=theme['header_fill'], fill_type='solid'),
+        'font': Font(color=theme['header_font'], bold=True) if theme.get('header_font') else None,
+        'center': Alignment(horizontal='center', vertical='center'),
+    }
+    if out_path is None:
+        fd, out_path = tempfile.mkstemp(prefix='schedule_', suffix='.xlsx'); os.close(fd)
+
+    engine.prepare()
+    if progress: progress('fixed')
+    engine.place_fixed()
+    wb = Workbook(write_only=True)
+    ws_raw = wb.create_sheet(RAW_SHEET); ws_raw.append(RAW_COLUMNS)
+    csv_file = open(csv_path, 'w', encoding='utf-8-sig', newline='') if csv_path else None
+    writer = csv.writer(csv_file) if csv_file else None
+    if writer: writer.writerow(RAW_COLUMNS)
+    try:
+        chunks = chunk_dates(engine.dates, chunk)
+        for k, (label, dates) in enumerate(chunks):
+            if progress: progress('fill', k / len(chunks))
+            for d_str in dates: engine.fill_day(d_str)
+            _write_chunk_sheet(wb, engine, label, dates, style)
+            for rec in engine.records(dates):
+                row = [rec[c] for c in RAW_COLUMNS]
+                ws_raw.append(row)
+                if writer: writer.writerow([v.strftime('%Y/%m/%d') if hasattr(v, 'strftime') else v for v in row])
+            engine.release(dates)
+        if progress: progress('write')
+        if engine.pair_goal and len(engine.pairs): engine.pairs.write_sheet(wb)
+        wb.save(out_path)
+    finally:
+        if csv_file: csv_file.close()
+    return out_path
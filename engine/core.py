@@ -0,0 +1,413 @@
+import io
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from engine.dashboard import compute_staff_stats, write_staff_stats
+from engine.intervals import ExceptionIndex
+from engine.layout import SiteLayout
+from engine.pairing import PAIR_SIGN, PairCounts
+from engine.raw_io import export_raw_files
+from engine.reimport import write_matrix_layout
+from engine.rest import RestIndex
+from engine.trace import DecisionTrace
+from engine.validate import UploadError, validate_workbook
+
+# ==========================================
+# ⚙️ 共用排班核心 (由部門 profile 驅動)
+# ==========================================
+WEEKDAY_CHARS = ['一', '二', '三', '四', '五', '六', '日']
+
+
+class ScheduleEngine:
+    """
+    規則驅動的排班核心。院區、職能分組、補位順序、輪替規則、分數權重與輸出樣式
+    都由 profile 描述；復健部 (engine.rehab) 與護理部 (engine.nurse) 只是兩份不同的 profile。
+    """
+
+    def __init__(self, profile, input_file, live_total=False, trace=False):
+        self.profile = profile
+        self.input_file = input_file
+        self.live_total = live_total  # 儀表板「實際」欄保留公式，其餘統計寫數值
+        self.trace = DecisionTrace() if trace else None  # 關閉時補位流程完全不產生紀錄
+
+        # 由 profile['loader'] 填入；layout 未由輸入表提供時，用 profile 的 shifts / locations
+        self.layout = None       # engine.layout.SiteLayout
+        self.staff = {}          # 姓名 -> {'id', 'type', 'role', 'target', 'rules': {週幾: 規則字串}}
+        self.dates = []          # 排序後的 'YYYY/MM/DD'
+        self.open_shifts = {}    # 日期 -> [營業時段]
+        self.requirements = {}   # (日期, 時段, 地點) -> {職能 (None 表示不分): 人數}
+        self.doctors = {}        # (日期, 時段, 地點) -> 醫師
+        self.exceptions = ExceptionIndex()
+        self.rest_config = None  # engine.rest.rest_config()；None 表示不做休息檢查
+        self.pair_goal = profile.get('pair_goal')  # 'rotation' / 'continuity' / None，loader 可依輸入表覆寫
+
+        # 運算狀態 (增量維護，候選人檢查不必掃整張班表)
+        self.schedule = {}       # 日期 -> slot 代碼 -> [worker]；只有排到人的 slot 才會建立
+        self.assigned = {}       # 姓名 -> 本月已排診數
+        self.day_load = {}       # (姓名, 日期) -> 當天診數
+        self.shift_busy = set()  # (姓名, 日期, 時段)
+        self.pairs = PairCounts()  # 姓名 × 醫師 搭配次數 (loader 可先帶入前幾個月)
+        self.occupancy = None    # 跨部門聯合排班時共用的佔用索引 (engine.joint.OccupancyIndex)
+        self.conflicts = []      # 聯合排班時因他部門已佔用而略過的固定班
+        self.rest = None         # engine.rest.RestIndex (有設定休息規則時)
+        self.date_index = {}
+        self.raw_files = {}
+        self._weekday = {}
+        self._ordinal = {}
+        self._groups = []
+
+    # ---------- 讀取 ----------
+    def load_data(self):
+        # 先以串流方式檢查大小、表頭與前幾列，格式不對就不進入完整解析
+        if self.profile.get('schema'):
+            try:
+                validate_workbook(self.input_file, self.profile['schema'])
+            except UploadError as e:
+                return False, str(e)
+        try:
+            self.profile['loader'](self, self.input_file)
+            if self.layout is None:
+                self.layout = SiteLayout(self.profile['shifts'], self.profile['locations'], self.profile['fill_locations'])
+            days = {d: datetime.strptime(d, '%Y/%m/%d') for d in self.dates}
+            self._weekday = {d: dt.weekday() for d, dt in days.items()}
+            self._ordinal = {d: dt.toordinal() for d, dt in days.items()}
+        except Exception as e:
+            return False, f"讀取失敗: {e}"
+        self.rest = RestIndex(**self.rest_config) if self.rest_config else None
+        self._groups = [(g, [n for n, info in self.staff.items() if self._matches(info, g.get('match', {}))])
+                        for g in self.profile['groups']]
+        return True, "資料讀取成功"
+
+    @staticmethod
+    def _matches(info, match):
+        return all(info.get(k) == v for k, v in match.items())
+
+    def weekday_of(self, d_str):
+        wk = self._weekday.get(d_str)
+        if wk is None: wk = self._weekday[d_str] = datetime.strptime(d_str, '%Y/%m/%d').weekday()
+        return wk
+
+    def ordinal_of(self, d_str):
+        day = self._ordinal.get(d_str)
+        if day is None: day = self._ordinal[d_str] = datetime.strptime(d_str, '%Y/%m/%d').toordinal()
+        return day
+
+    # ---------- 可排性 ----------
+    def _exception_state(self, name, d_str, shift):
+        """回傳 (是否 OFF, 是否 ON)；profile 決定重疊時的優先順序"""
+        on_kinds = self.profile['on_kinds']
+        if self.profile['exception_priority'] == 'latest':
+            kind = self.exceptions.get((name, d_str, shift), ordinal=self.ordinal_of(d_str))
+            return kind == 'OFF', kind in on_kinds
+        by_kind = self.exceptions.shifts_by_kind(name, d_str, ordinal=self.ordinal_of(d_str))
+        return shift in by_kind.get('OFF', ''), any(shift in by_kind.get(k, '') for k in on_kinds)
+
+    def unavailable_reason(self, name, d_str, shift):
+        """可排回傳 None，否則回傳原因 (例外請假 / PT 非可排時段 / 非固定時段)"""
+        info = self.staff.get(name)
+        if info is None: return "不在人員設定名單"
+        off, on = self._exception_state(name, d_str, shift)
+        if off: return "例外請假 OFF"
+        if on: return None
+        rule = info['rules'].get(self.weekday_of(d_str), '')
+        if info['type'] == 'PT':
+            return None if shift in rule else "PT 非可排時段"
+        if self.profile['ft_rule_restricts'] and rule and shift not in rule: return "非固定可排時段"
+        return None
+
+    def is_available(self, name, d_str, shift):
+        return self.unavailable_reason(name, d_str, shift) is None
+
+    def person_key(self, name):
+        """跨部門辨識同一人：優先用員工編號，沒有編號才用姓名"""
+        emp_id = self.staff[name]['id']
+        return name if emp_id in ('', 'NO_ID') else emp_id
+
+    def ineligible_reason(self, name, d_str, shift):
+        """補位時不能排的原因 (含當日診數、同時段已排、他部門已排)；可排回傳 None"""
+        max_day = self.profile.get('max_per_day')
+        if self.occupancy is not None:
+            key = self.person_key(name)
+            if self.occupancy.is_busy(key, d_str, shift): return "同時段已排 (含他部門)"
+            load = self.occupancy.day_count(key, d_str)
+        else:
+            load = self.day_load.get((name, d_str), 0)
+        if max_day and load >= max_day: return f"當日已排 {max_day} 診"
+        if (name, d_str, shift) in self.shift_busy: return "同時段已排"
+        reason = self.unavailable_reason(name, d_str, shift)
+        if reason or self.rest is None: return reason
+        return self.rest.violation(name, self.ordinal_of(d_str), shift)
+
+    def _eligible(self, name, d_str, shift):
+        return self.ineligible_reason(name, d_str, shift) is None
+
+    # ---------- 分數 ----------
+    def _rotation(self, day_idx):
+        """輪替規則：第 k 天由組內第 (k+j) 位拿到 patterns[j] 的時段加分"""
+        bonus = {}
+        for group, members in self._groups:
+            patterns = group.get('rotation')
+            if not patterns or len(members) < len(patterns): continue
+            for j, pat in enumerate(patterns):
+                bonus[members[(day_idx + j) % len(members)]] = pat
+        return bonus
+
+    def _score(self, name, group, d_str, shift, loc, bonus):
+        w = group['weights']; info = self.staff[name]
+        n = self.assigned.get(name, 0)
+        score = w.get('base', 0) + w.get('type', {}).get(info['type'], 0) + w.get('assigned', 0) * n
+        if w.get('under_target') and n < info['target']: score += w['under_target']
+        if w.get('rotation') and shift in bonus.get(name, ''): score += w['rotation']
+        if loc is not None: score += self._pair_weight(w) * self.pairs.get(name, self.doctors.get((d_str, shift, loc)))
+        return score
+
+    def _pair_weight(self, w):
+        """權重取絕對值，正負由搭配目標決定 (輪替扣分、延續加分)"""
+        return PAIR_SIGN.get(self.pair_goal, 0) * abs(w.get('pair', 0))
+
+    def _pool_pick(self, pool, group, d_str, shift, loc):
+        """'shift' 候選池依序取人；有搭配目標時，對這個地點的醫師加上搭配分數再挑最高分 (同分取前面)"""
+        weight = self._pair_weight(group['weights'])
+        if not weight or len(pool) == 1: return 0
+        doc = self.doctors.get((d_str, shift, loc))
+        return max(range(len(pool)), key=lambda i: (pool[i][0] + weight * self.pairs.get(pool[i][1], doc), -i))
+
+    def _scored(self, members, group, d_str, shift, loc, bonus, role=None, rejected=None):
+        """[(分數, 姓名)] 由高到低；傳入 rejected (list) 時順便記下 (原因, 姓名)，整理成字串留給決策紀錄讀取時做"""
+        cands = []
+        for name in members:
+            if role and self.staff[name]['role'] != role: continue
+            reason = self.ineligible_reason(name, d_str, shift)
+            if reason:
+                if rejected is not None: rejected.append((reason, name))
+                continue
+            cands.append((self._score(name, group, d_str, shift, loc, bonus), name))
+        cands.sort(key=lambda x: x[0], reverse=True)  # 穩定排序：同分依名單順序
+        return cands
+
+    # ---------- 排班 ----------
+    def workers(self, d_str, shift, loc):
+        return self.schedule[d_str].get(self.layout.slot(shift, loc), [])
+
+    def _assign(self, d_str, shift, loc, name, is_fixed=False):
+        info = self.staff[name]
+        self.schedule[d_str].setdefault(self.layout.slot(shift, loc), []).append({'name': name, 'type': info['type'], 'role': info['role'], 'is_fixed': is_fixed, 'id': info['id']})
+        self.assigned[name] = self.assigned.get(name, 0) + 1
+        self.day_load[(name, d_str)] = self.day_load.get((name, d_str), 0) + 1
+        self.shift_busy.add((name, d_str, shift))
+        if self.occupancy is not None: self.occupancy.occupy(self.person_key(name), d_str, shift)
+        if self.rest is not None: self.rest.add(name, self.ordinal_of(d_str), shift)
+        self.pairs.add(name, self.doctors.get((d_str, shift, loc)))
+
+    def _place_fixed(self):
+        """固定規則中帶地點的 (如 A甲)，直接排入；遇 OFF 略過"""
+        pattern = self.layout.rule_pattern
+        for d_str in self.dates:
+            wk = self.weekday_of(d_str)
+            for name, info in self.staff.items():
+                for part in info['rules'].get(wk, "").replace('，', ',').split(','):
+                    clean_part = part.strip().replace('(', '').replace(')', '').replace(' ', '')
+                    match = pattern.match(clean_part)
+                    if not match: continue
+                    s_code, l_code = match.groups()
+                    if self._exception_state(name, d_str, s_code)[0]: continue
+                    if not l_code: continue
+                    if (self.occupancy is not None and (name, d_str, s_code) not in self.shift_busy
+                            and self.occupancy.is_busy(self.person_key(name), d_str, s_code)):
+                        self.conflicts.append({'部門': self.profile['name'], '姓名': name, '日期': d_str, '時段': s_code, '地點': l_code})
+                        continue
+                    self._assign(d_str, s_code, l_code, name, is_fixed=True)
+                    if self.trace is not None: self.trace.record(d_str, s_code, l_code, '固定規則', (name,))
+
+    def _needed(self, d_str, shift, loc, step):
+        curr = self.workers(d_str, shift, loc)
+        req = self.requirements.get((d_str, shift, loc), {})
+        if step['need'] == 'role':
+            return int(req.get(step['role'], 0) - sum(1 for w in curr if w['role'] == step['role']))
+        return int(sum(req.values()) - len(curr))
+
+    def _fill_step(self, d_str, shift, loc, step, bonus, pools):
+        """依步驟補人；決策紀錄開啟時同一條流程另外收集未列入原因 (關閉時 rejected 為 None)"""
+        needed = self._needed(d_str, shift, loc, step)
+        if needed <= 0: return
+        rejected = [] if self.trace is not None else None
+        placed = []
+        if pools is not None:
+            # 'shift' 模式：整個時段共用一組依序的候選池 (先到先用，跨地點不重複)
+            while needed > 0:
+                group, pool = next(((g, p) for g, p in pools if p), (None, None))
+                if pool is None: break
+                _, name = pool.pop(self._pool_pick(pool, group, d_str, shift, loc)); placed.append(name)
+                self._assign(d_str, shift, loc, name); needed -= 1
+            scored = ()
+        else:
+            scored = []
+            for group, members in self._groups:
+                scored += self._scored(members, group, d_str, shift, loc, bonus, step.get('role'), rejected)
+                if len(scored) >= needed: break
+            accept = step.get('accept_type')
+            for _, name in scored[:needed]:
+                if accept and self.staff[name]['type'] != accept:
+                    if rejected is not None: rejected.append((f"僅 {accept} 跨界支援", name))
+                    continue
+                self._assign(d_str, shift, loc, name); placed.append(name)
+        if self.trace is not None: self.trace.record(d_str, shift, loc, step.get('label', step['need']), placed, scored, rejected)
+
+    def prepare(self):
+        self.schedule = {d: {} for d in self.dates}
+        self.date_index = {d: k for k, d in enumerate(self.dates)}
+
+    def place_fixed(self):
+        if self.profile.get('fixed_from_rules'): self._place_fixed()
+
+    def fill_day(self, d_str):
+        """補一天的所有營業時段；輪替以該日在本部門日期中的序號計算"""
+        bonus = self._rotation(self.date_index[d_str])
+        shift_pools = self.profile['pool_scope'] == 'shift'
+        for shift in self.open_shifts.get(d_str, []):
+            pools = None
+            if shift_pools:
+                # [(group, [(分數, 姓名)])]：分數保留給 _pool_pick 加上醫師搭配
+                pools = []
+                for group, members in self._groups:
+                    rejected = [] if self.trace is not None else None
+                    scored = self._scored(members, group, d_str, shift, None, bonus, rejected=rejected)
+                    if self.trace is not None: self.trace.record(d_str, shift, None, f"候選池 {group['key']}", (), scored, rejected)
+                    pools.append((group, scored))
+            for loc in self.layout.fill_locations:
+                for step in self.profile['fill_steps']:
+                    self._fill_step(d_str, shift, loc, step, bonus, pools)
+
+    def solve(self, progress=None):
+        """只排班不輸出 (風險模擬等分析用)"""
+        self.prepare()
+        if progress: progress('fixed')
+        self.place_fixed()
+        for k, d_str in enumerate(self.dates):
+            if progress: progress('fill', k / len(self.dates))
+            self.fill_day(d_str)
+
+    def release(self, dates):
+        """分段輸出後丟掉已寫出日期的班表與當日索引；跨段只保留公平性狀態 (assigned、輪替序號)"""
+        done = set(dates)
+        for d_str in done: self.schedule.pop(d_str, None)
+        self.day_load = {k: v for k, v in self.day_load.items() if k[1] not in done}
+        self.shift_busy = {k for k in self.shift_busy if k[1] not in done}
+        if self.rest is not None and done: self.rest.forget(max(self.ordinal_of(d) for d in done) + 1)
+
+    def run(self, raw_formats=(), progress=None):
+        self.solve(progress)
+        if progress: progress('write')
+        return self.generate_excel(raw_formats)
+
+    # ---------- 輸出 ----------
+    def records(self, dates=None):
+        as_datetime = self.profile['theme'].get('raw_dates') == 'datetime'
+        out = []
+        for d_str in (self.dates if dates is None else dates):
+            d_val = pd.Timestamp(d_str) if as_datetime else d_str
+            for slot in sorted(self.schedule[d_str]):
+                shift, loc = self.layout.decode(slot)
+                for w in self.schedule[d_str][slot]:
+                    out.append({'日期': d_val, '時段': shift, '地點': loc, '姓名': w['name'], '員工編號': w['id']})
+        return out
+
+    def active_slots(self):
+        """日期 -> 排序後的 slot：有需求或有排到人的 (時段, 地點) 才佔儀表板欄位"""
+        return {d: self.active_slots_for(d) for d in self.dates}
+
+    def active_slots_for(self, d_str):
+        active = set(self.schedule[d_str])
+        for shift in self.open_shifts.get(d_str, []):
+            for loc in self.layout.locations:
+                if sum(self.requirements.get((d_str, shift, loc), {}).values()) > 0: active.add(self.layout.slot(shift, loc))
+        return sorted(active)
+
+    def generate_excel(self, raw_formats=()):
+        theme = self.profile['theme']
+        wb = Workbook()
+        ws = wb.active; ws.title = "互動排班表"
+        ws_raw = wb.create_sheet("原始運算底稿")
+
+        fill_header = PatternFill(start_color=theme['header_fill'], end_color=theme['header_fill'], fill_type='solid')
+        fill_loc = PatternFill(start_color=theme['loc_fill'], end_color=theme['loc_fill'], fill_type='solid')
+        font_header = Font(color=theme['header_font'], bold=True) if theme.get('header_font') else None
+        thin = Side(style='thin'); border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        center = Alignment(horizontal='center', vertical='center')
+
+        headers = ["姓名", "目標", "實際", "狀態", "A數", "B數", "C數", "AB天", "BC天", "AC天", "ABC天", "全休"]
+        for i, h in enumerate(headers, 1):
+            cell = ws.cell(6, i, h); cell.fill = fill_header; cell.border = border; cell.alignment = center
+            if font_header: cell.font = font_header
+
+        staff_list = list(self.staff.items())
+        if theme.get('sort_staff_by_id'): staff_list.sort(key=lambda kv: str(kv[1]['id']))
+        row_map = {}
+        for i, (name, info) in enumerate(staff_list):
+            r = 7 + i
+            row_map[name] = r
+            ws.cell(r, 1, name).alignment = center
+            is_ft = info['type'] == 'FT'
+            target = info['target'] if is_ft or theme.get('pt_target') is None else theme['pt_target']
+            ws.cell(r, 2, target).alignment = center
+            c_cell, b_cell = f"C{r}", f"B{r}"
+            f_stat = f'=IF({c_cell}>{b_cell}, "加班 +"&({c_cell}-{b_cell}), IF({c_cell}<{b_cell}, "欠班 "&({c_cell}-{b_cell}), "正常"))' if is_ft else f'="{theme["pt_status"]}"&{c_cell}'
+            ws.cell(r, 4, f_stat).alignment = center
+            for c in range(1, 13): ws.cell(r, c).border = border
+
+        # 只輸出有需求或有排班的 (日期, 時段, 地點)；休息的院區不佔欄位
+        col = 13; col_map = {}
+        for d_str, slots in self.active_slots().items():
+            if not slots: continue
+            start_c = col
+            dt_obj = datetime.strptime(d_str, '%Y/%m/%d')
+            for slot in slots:
+                shift, loc = self.layout.decode(slot)
+                ws.cell(5, col, shift).alignment = center
+                ws.cell(6, col, loc).alignment = center; ws.cell(6, col).fill = fill_loc; ws.cell(6, col).border = border
+                col_map[(d_str, shift, loc)] = col
+                col += 1
+            end_c = col - 1
+            ws.merge_cells(start_row=3, start_column=start_c, end_row=3, end_column=end_c)
+            ws.cell(3, start_c, dt_obj.strftime('%m/%d')).alignment = center
+            if theme.get('weekday_row'):
+                ws.merge_cells(start_row=4, start_column=start_c, end_row=4, end_column=end_c)
+                ws.cell(4, start_c, WEEKDAY_CHARS[dt_obj.weekday()]).alignment = center
+
+        placed = []
+        for d_str in self.dates:
+            for slot, workers in self.schedule[d_str].items():
+                key = (d_str, *self.layout.decode(slot))
+                for w in workers:
+                    if w['name'] in row_map and key in col_map:
+                        r, c = row_map[w['name']], col_map[key]
+                        ws.cell(r, c, "V").alignment = center; ws.cell(r, c).border = border
+                        placed.append((w['name'], *key))
+
+        # 統計欄一次算完寫數值 (取代每列 COUNTIFS)
+        M_S, M_E = 13, max(col - 1, 13)
+        stats = compute_staff_stats(placed, row_map.keys(), self.dates, self.layout.shifts)
+        write_staff_stats(ws, [(7 + i, name) for i, (name, _) in enumerate(staff_list)], stats, center,
+                          live_total=self.live_total, mat_cols=(get_column_letter(M_S), get_column_letter(M_E)))
+
+        if theme.get('edit_validation'):
+            dv = DataValidation(type="list", formula1='"V,休, "', allow_blank=True)
+            ws.add_data_validation(dv)
+            dv.add(f"{get_column_letter(M_S)}7:{get_column_letter(M_E)}{7 + len(staff_list) - 1}")
+        ws.freeze_panes = "M7"
+        write_matrix_layout(wb, col_map, row_map, {name: info['id'] for name, info in self.staff.items()})
+        if self.pair_goal and len(self.pairs): self.pairs.write_sheet(wb)  # 累計次數 (含帶入的前幾個月)，可貼回下個月
+
+        records = self.records()
+        for row in dataframe_to_rows(pd.DataFrame(records), index=False, header=True): ws_raw.append(row)
+        if raw_formats: self.raw_files = export_raw_files(records, raw_formats)
+
+        output = io.BytesIO()
+        wb.save(output); output.seek(0)
+        return output
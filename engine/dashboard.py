@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 📊 互動排班表：每人統計一次算完，直接寫入數值
+# ==========================================
+# 儀表板第 3~12 欄 (C~L)，與頁面上的 headers 對應
+STAT_COLUMNS = {'實際': 3, 'A數': 5, 'B數': 6, 'C數': 7, 'AB天': 8, 'BC天': 9, 'AC天': 10, 'ABC天': 11, '全休': 12}
+# 「X數」為單一時段次數、「XY天」為當天剛好上這幾個時段；位元由配置的時段編出，配置沒有的時段該欄為 0
+SHIFT_COUNT_COLUMNS = ['A數', 'B數', 'C數']
+PATTERN_COLUMNS = ['AB天', 'BC天', 'AC天', 'ABC天']
+
+
+def compute_staff_stats(placed, names, dates, shifts):
+    """
+    placed: 已畫在矩陣上的 (姓名, 日期, 時段, 地點) 清單
+    names:  儀表板上的人員；dates: 儀表板上的日期 (全休天數的分母)
+    shifts: 配置的時段 (engine.layout.SiteLayout.shifts)；沒有統計欄的時段 (如 D) 仍計入實際與上班天數，
+            不在配置中的時段視為輸入錯誤 (ValueError)
+    回傳以姓名為 index、STAT_COLUMNS 為欄的 DataFrame
+    """
+    shift_bits = {s: 1 << i for i, s in enumerate(shifts)}
+    idx = pd.Index(pd.unique(pd.Series(list(names), dtype=object)))
+    stats = pd.DataFrame(0, index=idx, columns=list(STAT_COLUMNS), dtype=np.int64)
+    if len(idx) == 0: return stats
+
+    df = pd.DataFrame(list(placed), columns=['姓名', '日期', '時段', '地點'])
+    # 同一格只會有一個 V，重複紀錄不重複計算
+    df = df.drop_duplicates()
+    code = idx.get_indexer(df['姓名'])
+    unknown = sorted(set(df['時段']) - set(shift_bits))
+    if unknown: raise ValueError(f"排班紀錄有未設定的時段: {unknown}")
+    bits = df['時段'].map(shift_bits).to_numpy(dtype=np.int64)
+    keep = code >= 0
+    code, bits, df = code[keep], bits[keep], df[keep]
+    n = len(idx)
+
+    stats['實際'] = np.bincount(code, minlength=n)
+    for col in SHIFT_COUNT_COLUMNS:
+        b = shift_bits.get(col[:-1])
+        if b: stats[col] = np.bincount(code, weights=(bits == b), minlength=n).astype(np.int64)
+
+    # 每人每天的時段組合：同一 (人, 天, 時段) 去重後加總 bit 即為 OR
+    day = pd.DataFrame({'code': code, 'day': df['日期'].to_numpy(), 'bit': bits}).drop_duplicates()
+    mask = day.groupby(['code', 'day'], sort=False)['bit'].sum()
+    day_code = mask.index.get_level_values('code').to_numpy()
+    mask = mask.to_numpy()
+    for col in PATTERN_COLUMNS:
+        if any(s not in shift_bits for s in col[:-1]): continue
+        m = sum(shift_bits[s] for s in col[:-1])
+        stats[col] = np.bincount(day_code, weights=(mask == m), minlength=n).astype(np.int64)
+    worked_days = np.bincount(day_code, weights=(mask > 0), minlength=n).astype(np.int64)
+    stats['全休'] = len(pd.unique(pd.Series(list(dates), dtype=object))) - worked_days
+    return stats
+
+
+def write_staff_stats(ws, rows, stats, alignment, live_total=False, mat_cols=None):
+    """
+    rows: [(列號, 姓名)]；寫入數值，不再產生整列 COUNTIFS 公式。
+    live_total=True 時「實際」欄保留單一 COUNTIF，協調人員手動改 V/休 後狀態欄仍會即時更新；
+    需同時傳入 mat_cols=(矩陣起始欄字母, 結束欄字母)。
+    """
+    for r, name in rows:
+        vals = stats.loc[name] if name in stats.index else None
+        for col, c in STAT_COLUMNS.items():
+            v = int(vals[col]) if vals is not None else 0
+            if col == '實際' and live_total:
+                v = f'=COUNTIF({mat_cols[0]}{r}:{mat_cols[1]}{r}, "V")'
+            ws.cell(r, c, v).alignment = alignment
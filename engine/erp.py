@@ -0,0 +1,237 @@
+import hashlib
+import io
+import json
+
+import openpyxl
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+
+from engine.layout import shift_rank
+from engine.raw_io import read_raw_table
+from engine.validate import UploadError, check_upload_size
+
+# ==========================================
+# ⚙️ ERP 轉檔 (兩個部門共用，顏色由 profile['erp_theme'] 決定)
+# ==========================================
+WEEKDAY_MAP = {0: '一', 1: '二', 2: '三', 3: '四', 4: '五', 5: '六', 6: '日'}
+MANIFEST_SHEET = 'ERP指紋'
+MANIFEST_COLUMNS = ['員工編號', '姓名', '區塊指紋', '日期', '班別', '地點']   # 每位員工每天一列
+ERP_SHEET = 'ERP導入'
+ERP_HEADER = ['員工編號', '姓名', '星期']
+
+
+def group_by_employee(df_raw, shifts=()):
+    """
+    底稿 -> (排序後日期, {員工編號: {'name': 姓名, 'data': {日期: [{'shift', 'loc'}]}}})
+    shifts: 時段順序 (profile['shifts'])，每天的班依此排序；未列出的時段維持底稿順序排在最後
+    """
+    df_raw['日期'] = pd.to_datetime(df_raw['日期'])
+    staff_schedule = {}
+    all_dates = sorted(df_raw['日期'].unique())
+    for _, row in df_raw.iterrows():
+        emp_id = str(row['員工編號']).strip()
+        name = str(row['姓名']).strip()
+        if emp_id == 'nan' or not emp_id: emp_id = "NO_ID"
+        if emp_id not in staff_schedule: staff_schedule[emp_id] = {'name': name, 'data': {}}
+        d_str = row['日期'].strftime('%Y/%m/%d')
+        staff_schedule[emp_id]['data'].setdefault(d_str, []).append({'shift': row['時段'], 'loc': row['地點']})
+    rank = shift_rank(shifts)
+    for data in staff_schedule.values():
+        for items in data['data'].values(): items.sort(key=lambda x: rank(x['shift']))
+    return all_dates, staff_schedule
+
+
+def day_cells(items):
+    """一天的多筆班 (group_by_employee 已依時段排序) -> ('A,B', '丁,戊')"""
+    return ','.join(str(x['shift']) for x in items), ','.join(str(x['loc']) for x in items)
+
+
+def fingerprint(days):
+    """{日期: (時段, 地點)} -> 區塊指紋 (內容以 JSON 序列化，院區名稱含任何符號都不會混淆)"""
+    content = json.dumps(sorted((d, *v) for d, v in days.items()), ensure_ascii=False)
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def erp_manifest(staff_schedule):
+    """員工編號 -> (姓名, 區塊指紋, {日期: (時段, 地點)})"""
+    manifest = {}
+    for emp_id, data in staff_schedule.items():
+        days = {d_str: day_cells(items) for d_str, items in sorted(data['data'].items())}
+        manifest[emp_id] = (data['name'], fingerprint(days), days)
+    return manifest
+
+
+def _manifest_sheet(ws):
+    rows = ws.iter_rows(values_only=True)
+    if list(next(rows, ())) != MANIFEST_COLUMNS: return None  # 舊版指紋頁格式不同，改讀 ERP 表本身
+    manifest = {}
+    for r in rows:
+        if not r or not r[0]: continue
+        name, fp, days = manifest.setdefault(str(r[0]), (str(r[1] or ''), str(r[2]), {}))
+        if r[3]: days[str(r[3])] = (str(r[4] or ''), str(r[5] or ''))
+    return manifest
+
+
+def _cell_list(val):
+    return [] if val is None else [x.strip() for x in str(val).split(',') if x.strip()]
+
+
+def _erp_grid(ws, dates=()):
+    """
+    解析 ERP 導入表本身 (沒有指紋頁的舊版導入檔)：第 2 列為 'm/d' 日期，之後每 3 列一位員工 (班別 / 地點 / 備註)。
+    表頭沒有年份，依本次排班的日期 (dates) 補上；對不到的日期用本次的第一個年份。
+    """
+    rows = list(ws.iter_rows(values_only=True))
+    if not rows or [str(v).strip() if v is not None else '' for v in rows[0][:3]] != ERP_HEADER:
+        raise UploadError(f"「{ERP_SHEET}」前 3 欄應為 {'/'.join(ERP_HEADER)}，請確認上傳的是 ERP 導入檔")
+    if len(rows) < 2: return {}
+    full = {f"{dt.month}/{dt.day}": dt.strftime('%Y/%m/%d') for dt in dates}
+    year = dates[0].year if len(dates) else pd.Timestamp.now().year
+    cols = {}
+    for c, val in enumerate(rows[1][3:], 3):
+        if val is None: continue
+        md = str(val).strip()
+        if md in full: cols[c] = full[md]
+        else:
+            m, _, d = md.partition('/')
+            if m.isdigit() and d.isdigit(): cols[c] = f"{year}/{int(m):02d}/{int(d):02d}"
+    manifest = {}
+    for r in range(2, len(rows) - 1, 3):
+        emp_id, name = rows[r][0], rows[r][1]
+        if emp_id is None: continue
+        days = {}
+        for c, d_str in cols.items():
+            shifts = _cell_list(rows[r][c] if c < len(rows[r]) else None)
+            locs = _cell_list(rows[r + 1][c] if c < len(rows[r + 1]) else None)
+            if shifts: days[d_str] = (','.join(shifts), ','.join(locs))  # 格子內已依時段排序，與 day_cells 相同
+        if days: manifest[str(emp_id).strip()] = (str(name or '').strip(), fingerprint(days), dict(sorted(days.items())))
+    return manifest
+
+
+def read_manifest(input_file, dates=()):
+    """
+    上一版 ERP 導入檔：有指紋頁就讀指紋頁，沒有 (本功能之前匯出的檔) 就解析 ERP 表本身；
+    排班結果或底稿則現算。dates 為本次排班的日期，用來補上 ERP 表頭缺少的年份。
+    """
+    if hasattr(input_file, 'seek'): input_file.seek(0)
+    check_upload_size(input_file)
+    try:
+        wb = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+    except Exception:
+        wb = None  # CSV / Parquet 底稿
+    if wb is not None:
+        try:
+            manifest = _manifest_sheet(wb[MANIFEST_SHEET]) if MANIFEST_SHEET in wb.sheetnames else None
+            if manifest is None and ERP_SHEET in wb.sheetnames: manifest = _erp_grid(wb[ERP_SHEET], dates)
+        finally:
+            wb.close()
+        if manifest is not None: return manifest
+    if hasattr(input_file, 'seek'): input_file.seek(0)
+    return erp_manifest(group_by_employee(read_raw_table(input_file))[1])
+
+
+def _days(entry):
+    return {d: tuple(v) for d, v in entry[2].items()} if entry else {}
+
+
+def diff_manifest(old, new):
+    """比對兩版指紋：回傳 (有異動的員工編號, 已移除的 {員工編號: 姓名}, 異動明細 DataFrame)"""
+    changed, removed, rows = [], {}, []
+    for emp_id in sorted(set(old) | set(new)):
+        if emp_id in new and emp_id in old and new[emp_id][1] == old[emp_id][1]: continue
+        if emp_id not in new:
+            removed[emp_id] = old[emp_id][0]; status = '移除'
+        else:
+            changed.append(emp_id); status = '新增' if emp_id not in old else '修改'
+        before, after = _days(old.get(emp_id)), _days(new.get(emp_id))
+        days = sorted(d for d in set(before) | set(after) if before.get(d) != after.get(d))
+        name = (new.get(emp_id) or old[emp_id])[0]
+        rows.append([emp_id, name, status, len(days), '、'.join(d[5:] for d in days)])
+    return changed, removed, pd.DataFrame(rows, columns=['員工編號', '姓名', '狀態', '異動天數', '異動日期'])
+
+
+def build_erp_delta(df_raw, previous, theme, shifts=()):
+    """
+    previous: 上一版 ERP 導入檔 / 排班結果 / 底稿 (或已讀好的指紋 dict)。只輸出有異動的員工 (移除的員工輸出空白區塊)，
+    回傳 (BytesIO, 異動明細)；指紋頁寫完整的本版內容，可作為下一次比對的基準。
+    """
+    all_dates, staff_schedule = group_by_employee(df_raw, shifts)
+    manifest = erp_manifest(staff_schedule)
+    if not isinstance(previous, dict): previous = read_manifest(previous, [pd.Timestamp(d) for d in all_dates])
+    changed, removed, changes = diff_manifest(previous, manifest)
+    blocks = [(emp_id, staff_schedule[emp_id]) for emp_id in changed]
+    blocks += [(emp_id, {'name': name, 'data': {}}) for emp_id, name in removed.items()]
+    blocks.sort(key=lambda kv: kv[0])
+    return _write_erp(all_dates, blocks, manifest, theme), changes
+
+
+def build_erp_workbook(df_raw, theme, shifts=()):
+    all_dates, staff_schedule = group_by_employee(df_raw, shifts)
+    blocks = [(emp_id, staff_schedule[emp_id]) for emp_id in sorted(staff_schedule.keys())]
+    return _write_erp(all_dates, blocks, erp_manifest(staff_schedule), theme)
+
+
+def _write_erp(all_dates, blocks, manifest, theme):
+
+    wb_out = Workbook()
+    ws_out = wb_out.active; ws_out.title = ERP_SHEET
+
+    color_header = PatternFill(start_color=theme['header_fill'], end_color=theme['header_fill'], fill_type="solid")
+    color_id = PatternFill(start_color=theme['id_fill'], end_color=theme['id_fill'], fill_type="solid")
+    font_header = Font(color=theme['header_font'], bold=True) if theme.get('header_font') else Font(bold=True)
+    thin = Side(style='thin', color="000000"); thick = Side(style='thick', color="000000")
+    border_all = Border(left=thin, right=thin, top=thin, bottom=thin)
+    border_last = Border(left=thin, right=thin, top=thin, bottom=thick) if theme.get('thick_block_border') else border_all
+    center = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+    ws_out.merge_cells("A1:A2"); ws_out.merge_cells("B1:B2")
+    ws_out.cell(1, 1, "員工編號"); ws_out.cell(1, 2, "姓名"); ws_out.cell(1, 3, "星期"); ws_out.cell(2, 3, "日期")
+
+    for i, dt in enumerate(all_dates):
+        c = 4 + i
+        ws_out.cell(1, c, WEEKDAY_MAP[dt.weekday()])
+        ws_out.cell(2, c, f"{dt.month}/{dt.day}")
+
+    for r in [1, 2]:
+        for c in range(1, 4 + len(all_dates)):
+            cell = ws_out.cell(r, c); cell.fill = color_header; cell.alignment = center; cell.border = border_all; cell.font = font_header
+
+    curr_r = 3
+    for emp_id, data in blocks:
+        ws_out.merge_cells(start_row=curr_r, start_column=1, end_row=curr_r + 2, end_column=1)
+        ws_out.merge_cells(start_row=curr_r, start_column=2, end_row=curr_r + 2, end_column=2)
+        ws_out.cell(curr_r, 1, emp_id); ws_out.cell(curr_r, 2, data['name'])
+        ws_out.cell(curr_r, 3, "班別排班"); ws_out.cell(curr_r + 1, 3, "地點"); ws_out.cell(curr_r + 2, 3, "備註")
+
+        for i, dt in enumerate(all_dates):
+            d_str = dt.strftime('%Y/%m/%d')
+            c = 4 + i
+            if d_str in data['data']:
+                items = data['data'][d_str]
+                ws_out.cell(curr_r, c, ",\n".join([x['shift'] for x in items]))
+                ws_out.cell(curr_r + 1, c, ",\n".join([x['loc'] for x in items]))
+            ws_out.cell(curr_r + 2, c, "")
+
+        for r_idx in range(curr_r, curr_r + 3):
+            bd = border_last if r_idx == curr_r + 2 else border_all
+            for c_idx in range(1, 4 + len(all_dates)):
+                cell = ws_out.cell(r_idx, c_idx); cell.border = bd; cell.alignment = center
+                if c_idx == 1: cell.fill = color_id
+        curr_r += 3
+
+    ws_out.column_dimensions['A'].width = 15; ws_out.column_dimensions['B'].width = theme.get('name_width', 15); ws_out.column_dimensions['C'].width = 12
+    for c in range(4, 4 + len(all_dates)): ws_out.column_dimensions[get_column_letter(c)].width = 6
+
+    ws_fp = wb_out.create_sheet(MANIFEST_SHEET)
+    ws_fp.append(MANIFEST_COLUMNS)
+    for emp_id in sorted(manifest):
+        name, fp, days = manifest[emp_id]
+        for d_str, (shifts, locs) in days.items(): ws_fp.append([emp_id, name, fp, d_str, shifts, locs])
+    ws_fp.sheet_state = 'hidden'
+
+    output = io.BytesIO()
+    wb_out.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,113 @@
+from bisect import bisect_right
+from datetime import date, datetime
+
+import pandas as pd
+
+# ==========================================
+# 📅 例外請假：日期區間 + 每週重複，依人員建區間索引
+# ==========================================
+ALL_SHIFTS = 'ABC'
+WEEKDAY_CHARS = {'一': 0, '二': 1, '三': 2, '四': 3, '五': 4, '六': 5, '日': 6, '天': 6}
+_FAR_FUTURE = date(9999, 12, 31).toordinal()
+
+
+def to_ordinal(val):
+    """datetime / Timestamp / 'YYYY/MM/DD' 字串 -> 日序數；無法解析回傳 None"""
+    if val is None or (isinstance(val, float) and pd.isna(val)) or val is pd.NaT: return None
+    if isinstance(val, (datetime, date)): return val.toordinal()
+    s = str(val).strip().split(' ')[0].replace('-', '/')
+    if not s or s.lower() in ('nan', 'nat', 'none'): return None
+    try:
+        return datetime.strptime(s, '%Y/%m/%d').toordinal()
+    except ValueError:
+        return None
+
+
+def _filled(val):
+    return val is not None and not (isinstance(val, float) and pd.isna(val)) and bool(str(val).strip())
+
+
+def parse_weekdays(val):
+    """'一三五'、'每週一,三' -> bitmask；空白表示每天 (0b1111111)"""
+    s = '' if val is None or (isinstance(val, float) and pd.isna(val)) else str(val)
+    mask = 0
+    for ch in s:
+        if ch in WEEKDAY_CHARS: mask |= 1 << WEEKDAY_CHARS[ch]
+    return mask or 0b1111111
+
+
+class ExceptionIndex:
+    """
+    每位人員的例外 (OFF / ON / PT_OK) 區間索引。
+    依所有區間端點切成不重疊的區段，每段預先記錄生效中的例外，查詢只需一次二分搜尋。
+    get((姓名, 日期, 時段)) 與原本的 exceptions dict 用法相同：多筆重疊時以表中較後面的列為準。
+    expand_shifts=False 時時段需與查詢的單一時段完全相同 (復健部 V7.3 的寫法：空白、'AB' 都不生效)。
+    """
+
+    def __init__(self, all_shifts=ALL_SHIFTS, expand_shifts=True):
+        self.all_shifts = all_shifts  # 時段空白 = 整天 (expand_shifts)
+        self.expand_shifts = expand_shifts
+        self._entries = {}   # name -> [(start, end, weekday_mask, shifts, kind, seq)]
+        self._index = {}     # name -> (boundaries, segments)
+        self._seq = 0
+
+    def add(self, name, start, kind, shifts=None, end=None, weekdays=None):
+        # 日期欄也可直接寫區間：2026/03/02~2026/03/31
+        if not _filled(end) and isinstance(start, str) and '~' in start:
+            start, end = start.split('~', 1)
+        s = to_ordinal(start)
+        if s is None: return False
+        e = to_ordinal(end)
+        if e is None: e = _FAR_FUTURE if _filled(weekdays) else s  # pandas 讀到的空白是 NaN，不能當成「每週重複」
+        if e < s: s, e = e, s
+        if not _filled(shifts): shifts = self.all_shifts if self.expand_shifts else ''
+        else: shifts = str(shifts).strip().upper() if self.expand_shifts else str(shifts).strip()
+        self._entries.setdefault(name, []).append((s, e, parse_weekdays(weekdays), shifts, kind, self._seq))
+        self._seq += 1
+        self._index.pop(name, None)
+        return True
+
+    def _build(self, name):
+        entries = self._entries.get(name, [])
+        points = sorted({p for s, e, *_ in entries for p in (s, e + 1)})
+        segments = []
+        for i, p in enumerate(points[:-1]):
+            segments.append(tuple(x for x in entries if x[0] <= p and x[1] >= points[i + 1] - 1))
+        self._index[name] = (points, segments)
+        return self._index[name]
+
+    def _covers(self, x, shift):
+        return shift in x[3] if self.expand_shifts else shift == x[3]
+
+    def _active(self, name, ordinal):
+        if name not in self._entries: return ()
+        points, segments = self._index.get(name) or self._build(name)
+        i = bisect_right(points, ordinal) - 1
+        if i < 0 or i >= len(segments): return ()
+        wk_bit = 1 << date.fromordinal(ordinal).weekday()
+        return [x for x in segments[i] if x[2] & wk_bit]
+
+    def get(self, key, default=None, ordinal=None):
+        """key = (姓名, 日期, 時段)，回傳該時段生效的類型 (例如 'OFF' / 'ON')；ordinal 可直接給日序數 (引擎已快取)"""
+        name, day, shift = key
+        if name not in self._entries: return default
+        if ordinal is None: ordinal = to_ordinal(day)
+        if ordinal is None: return default
+        best = None
+        for x in self._active(name, ordinal):
+            if self._covers(x, shift) and (best is None or x[5] > best[5]): best = x
+        return best[4] if best else default
+
+    def shifts_by_kind(self, name, day, ordinal=None):
+        """回傳 {類型: 時段字串}，例如 {'OFF': 'AB', 'ON': 'C'}"""
+        out = {}
+        if name not in self._entries: return out
+        if ordinal is None: ordinal = to_ordinal(day)
+        if ordinal is None: return out
+        for x in sorted(self._active(name, ordinal), key=lambda x: x[5]):
+            if not self.expand_shifts and len(x[3]) != 1: continue
+            out[x[4]] = out.get(x[4], '') + x[3]
+        return out
+
+    def __len__(self):
+        return sum(len(v) for v in self._entries.values())
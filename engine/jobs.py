@@ -0,0 +1,136 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ==========================================
+# ⏳ 背景排班工作：共用執行緒池 + 進度回報 + 相同輸入合併
+# ==========================================
+# 階段 -> (起始進度, 佔比, 顯示文字)
+STAGES = {
+    'load':  (0.00, 0.15, '讀取輸入表'),
+    'fixed': (0.15, 0.10, '排入固定班'),
+    'fill':  (0.25, 0.55, '補位運算'),
+    'write': (0.80, 0.20, '產生結果檔'),
+}
+JOB_TTL = 3600        # 完成的工作保留秒數
+MAX_WORKERS = 2       # 同時運算的排班數，避免多人同時送出拖垮主機
+
+
+class ResultFile:
+    """寫在磁碟上的工作結果 (分段排班)；工作過期時一併刪除"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def read(self):
+        """整個檔案的 bytes (讀完即關檔)；已被刪除時回傳 None"""
+        try:
+            with open(self.path, 'rb') as f: return f.read()
+        except FileNotFoundError:
+            return None
+
+    def remove(self):
+        try: os.remove(self.path)
+        except OSError: pass
+
+
+class Job:
+    def __init__(self, job_id, kind):
+        self.id = job_id
+        self.kind = kind
+        self.status = 'queued'   # queued / running / done / error
+        self.stage = None
+        self.progress = 0.0
+        self.result = None
+        self.message = ''
+        self.created = time.time()
+        self.finished = None
+
+    def report(self, stage, fraction=0.0):
+        """引擎回報進度：stage 為 STAGES 的鍵，fraction 為該階段內完成比例 (0~1)"""
+        start, span, _ = STAGES.get(stage, (self.progress, 0.0, ''))
+        self.stage = stage
+        self.progress = min(1.0, max(self.progress, start + span * min(max(fraction, 0.0), 1.0)))
+
+    @property
+    def label(self):
+        if self.status == 'queued': return '排隊中'
+        return STAGES.get(self.stage, (0, 0, '運算中'))[2]
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+
+class JobManager:
+    def __init__(self, max_workers=MAX_WORKERS, ttl=JOB_TTL):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='schedule')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._ttl = ttl
+
+    @staticmethod
+    def job_key(kind, data, options):
+        h = hashlib.sha256(kind.encode('utf-8'))
+        h.update(repr(sorted(options.items())).encode('utf-8'))
+        for part in (data if isinstance(data, tuple) else (data,)):
+            h.update(len(part).to_bytes(8, 'big')); h.update(part)
+        return h.hexdigest()[:16]
+
+    def submit(self, kind, fn, data, **options):
+        """
+        fn(input_file, progress=..., **options) 在背景執行；回傳 job id。
+        data 可為多個檔案的 tuple (例如聯合排班)，此時依序傳入 fn(file1, file2, ...)。
+        相同 (kind, 檔案內容, options) 的請求共用同一個工作 (失敗的工作可重新送出)。
+        """
+        key = self.job_key(kind, data, options)
+        with self._lock:
+            self._evict()
+            job = self._jobs.get(key)
+            if job is not None and job.status != 'error': return key
+            job = Job(key, kind)
+            self._jobs[key] = job
+        self._executor.submit(self._run, job, fn, data, options)
+        return key
+
+    def _run(self, job, fn, data, options):
+        job.status = 'running'
+        try:
+            files = [io.BytesIO(part) for part in (data if isinstance(data, tuple) else (data,))]
+            job.result = fn(*files, progress=job.report, **options)
+            job.progress = 1.0
+            job.status = 'done'
+        except Exception as e:
+            job.message = f"排班失敗: {e}"
+            job.status = 'error'
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, j in self._jobs.items() if j.finished and now - j.finished > self._ttl]:
+            job = self._jobs.pop(key)
+            for part in (job.result if isinstance(job.result, tuple) else (job.result,)):
+                if isinstance(part, ResultFile): part.remove()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """整個行程共用一個工作管理器 (Streamlit 重新執行頁面時不會重建)"""
+    global _manager
+    with _manager_lock:
+        if _manager is None: _manager = JobManager()
+        return _manager
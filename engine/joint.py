@@ -0,0 +1,73 @@
+from engine.core import ScheduleEngine
+from engine.nurse import ClinicSchedulerNurse
+from engine.rehab import REHAB_PROFILE
+
+# ==========================================
+# 🤝 跨部門聯合排班：共用每人 (日期 × 時段) 佔用位元
+# ==========================================
+DEPARTMENTS = {
+    'rehab': lambda f, live_total=False: ScheduleEngine(REHAB_PROFILE, f, live_total=live_total),
+    'nurse': lambda f, live_total=False: ClinicSchedulerNurse(f, live_total=live_total),
+}
+
+
+class OccupancyIndex:
+    """人員 -> 日期 -> 時段 bitmask；檢查與登記都是 O(1)"""
+
+    def __init__(self, shifts=('A', 'B', 'C')):
+        self._bits = {s: 1 << i for i, s in enumerate(shifts)}
+        self._mask = {}
+
+    def _bit(self, shift):
+        bit = self._bits.get(shift)
+        if bit is None: bit = self._bits[shift] = 1 << len(self._bits)
+        return bit
+
+    def is_busy(self, key, d_str, shift):
+        return bool(self._mask.get(key, {}).get(d_str, 0) & self._bit(shift))
+
+    def day_count(self, key, d_str):
+        return bin(self._mask.get(key, {}).get(d_str, 0)).count('1')
+
+    def occupy(self, key, d_str, shift):
+        days = self._mask.setdefault(key, {})
+        days[d_str] = days.get(d_str, 0) | self._bit(shift)
+
+
+def run_joint_scheduler(inputs, live_total=False, progress=None):
+    """
+    inputs: [(部門代號, input_file)]，順序即每天的補位優先順序。
+    所有部門先排固定班，再逐日輪流補位，同一人 (員工編號) 不會在同一時段被兩個部門排到。
+    回傳 ({部門代號: 結果 BytesIO}, 衝突清單, 訊息)；讀取失敗時結果為 None。
+    """
+    if progress: progress('load')
+    occupancy = OccupancyIndex()
+    engines = []
+    for dept, input_file in inputs:
+        engine = DEPARTMENTS[dept](input_file, live_total=live_total)
+        success, msg = engine.load_data()
+        if not success: return None, [], f"❌ {engine.profile['name']}: {msg}"
+        engine.occupancy = occupancy
+        engine.prepare()
+        engines.append((dept, engine))
+
+    if progress: progress('fixed')
+    for _, engine in engines: engine.place_fixed()
+
+    all_dates = sorted(set().union(*(e.dates for _, e in engines)))
+    for i, d_str in enumerate(all_dates):
+        if progress: progress('fill', i / len(all_dates))
+        for _, engine in engines:
+            if d_str in engine.date_index: engine.fill_day(d_str)
+
+    if progress: progress('write')
+    outputs = {dept: engine.generate_excel() for dept, engine in engines}
+    conflicts = [c for _, engine in engines for c in engine.conflicts]
+    return outputs, conflicts, f"聯合排班成功 ({len(conflicts)} 筆固定班因跨部門衝突略過)"
+
+
+def joint_schedule_job(rehab_file, nurse_file, progress=None, live_total=False):
+    # 背景工作用 (engine.jobs)：結果轉成 bytes
+    outputs, conflicts, msg = run_joint_scheduler([('rehab', rehab_file), ('nurse', nurse_file)], live_total=live_total, progress=progress)
+    if outputs is None: return None, conflicts, msg
+    return {dept: out.getvalue() for dept, out in outputs.items()}, conflicts, msg
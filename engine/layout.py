@@ -0,0 +1,66 @@
+import re
+
+# ==========================================
+# 🗺️ 院區 / 時段配置：由輸入表讀取，編成整數代碼
+# ==========================================
+LAYOUT_SHEET = '5_院區設定'
+LOC_FIXED = '固定'
+LOC_FILL = '補位'
+
+
+class SiteLayout:
+    """
+    時段與地點編成整數代碼：slot = 時段代碼 × 地點數 + 地點代碼。
+    slot 由小到大即為 (時段, 地點) 的表列順序，班表、底稿與儀表板都依此排序。
+    時段限單一字元 (規則字串如 'AB'、例外時段 'AC' 都以字元判斷)；地點可為多字元。
+    """
+
+    def __init__(self, shifts, locations, fill_locations=None):
+        self.shifts = list(dict.fromkeys(str(s).strip().upper() for s in shifts if str(s).strip()))
+        self.locations = list(dict.fromkeys(str(l).strip() for l in locations if str(l).strip()))
+        bad = [s for s in self.shifts if len(s) != 1]
+        if bad: raise ValueError(f"時段代碼需為單一字元: {bad}")
+        if not self.shifts or not self.locations: raise ValueError("未設定任何時段或地點")
+        fill = self.locations if fill_locations is None else fill_locations
+        self.fill_locations = [l for l in self.locations if l in set(fill)]
+        self.shift_code = {s: i for i, s in enumerate(self.shifts)}
+        self.loc_code = {l: i for i, l in enumerate(self.locations)}
+        self.all_shifts = ''.join(self.shifts)
+        # 固定規則 'A甲'：長地點名優先比對，避免前綴相同的地點被截斷
+        locs = sorted(self.locations, key=len, reverse=True)
+        self.rule_pattern = re.compile(f"([{re.escape(self.all_shifts)}])({'|'.join(map(re.escape, locs))})?")
+
+    def slot(self, shift, loc):
+        return self.shift_code[shift] * len(self.locations) + self.loc_code[loc]
+
+    def decode(self, slot):
+        s, l = divmod(slot, len(self.locations))
+        return self.shifts[s], self.locations[l]
+
+
+def header_locations(headers, suffix):
+    """由表頭 (如 '丁院_醫師') 找出地點，依表頭順序"""
+    return [str(h)[:-len(suffix)] for h in headers if isinstance(h, str) and h.endswith(suffix) and len(h) > len(suffix)]
+
+
+def ordered_shifts(values, default):
+    """行事曆「時段」欄出現過的時段 (依首次出現順序)；沒有資料時用預設"""
+    found = [str(v).strip().upper() for v in values if v is not None and str(v).strip() and str(v).strip().lower() != 'nan']
+    return list(dict.fromkeys(found)) or list(default)
+
+
+def shift_rank(shifts):
+    """排序用 key：時段依配置順序；未列出的時段排在最後 (搭配穩定排序維持原順序)"""
+    rank = {s: i for i, s in enumerate(shifts)}
+    return lambda s: rank.get(s, len(rank))
+
+
+def read_layout_sheet(wb):
+    """選填的「5_院區設定」：回傳 (固定院區, 補位院區)；沒有這張表回傳 None"""
+    if LAYOUT_SHEET not in wb.sheetnames: return None
+    fixed, fill = [], []
+    for row in wb[LAYOUT_SHEET].iter_rows(min_row=2, values_only=True):
+        if not row or not row[0]: continue
+        kind = str(row[1]).strip() if len(row) > 1 and row[1] else LOC_FIXED
+        (fill if kind == LOC_FILL else fixed).append(str(row[0]).strip())
+    return fixed, fill
@@ -0,0 +1,319 @@
+import pandas as pd
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from engine.chunked import run_chunked
+from engine.core import ScheduleEngine
+from engine.erp import build_erp_delta, build_erp_workbook
+from engine.intervals import ExceptionIndex
+from engine.jobs import ResultFile
+from engine.layout import SiteLayout, header_locations, ordered_shifts
+from engine.pairing import PAIR_GOALS, PAIR_ITEM, PAIR_SHEET, PAIR_TEMPLATE_ROWS, read_pair_goal
+from engine.payload import calendar_rows, load_payload_exceptions, load_payload_pairs, load_payload_staff
+from engine.raw_io import read_raw_table
+from engine.reimport import import_dashboard
+from engine.rest import CONTROL_SHEET, REST_TEMPLATE_ROWS, TURNAROUND_ITEM, read_rest_settings, rest_config
+from engine.risk import risk_report
+from engine.templates import (TemplateStyle, WEEKDAY_CHARS, cached_template, load_roster, month_days, new_workbook, roster_rows,
+                              save_roster, save_workbook, value_cell, write_sheet)
+from engine.trace import TRACE_KEY
+from engine.validate import UploadError
+
+# ==========================================
+# ⚙️ 第一部分：產生模板 (修正版：恢復V10預設值與下拉選單)
+# ==========================================
+# 尚未排過班 (沒有保存的名單) 時使用的預設名單 (依照 V10 截圖)
+# 格式: [序號, 姓名, 員編, 身分, 職能, 目標, 備註, 固定休...]
+DEFAULT_STAFF = [
+    [1, '品', 'NS014', 'FT', 'Nurse', 38, '', '', '', '', '', '', ''],
+    [2, '智', 'NS028', 'FT', 'Nurse', 39, '', '', '', '', '', '', ''],
+    [3, '廖', 'NS031', 'FT', 'Nurse', 40, '', '', '', '', '', '', ''],
+    [4, '淑', 'FD043', 'FT', 'Admin', 40, '', '', '', '', '', '', ''],
+    [5, '喬', 'FD021', 'FT', 'Admin', 38, '', '', '', '', '', '', ''],
+    [6, '淇', 'FD032', 'FT', 'Admin', 40, '', '', '', '', '', '', ''],
+    [7, '芯', 'FD054', 'PT', 'Admin', 0,  '', '', '', '', '', '', ''],
+    [8, '??', 'FD053', 'PT', 'Admin', 0,  '', '', '', '', '', '', '']
+]
+
+def build_nurse_template(year, month, staff_rows):
+    wb = new_workbook()
+    style = TemplateStyle("7030A0")  # 紫色系
+
+    # Sheet 0: 全域控制台 (含休息規則，空白 = 不限)
+    control = [['年份', year, '設定排班年份'], ['月份', month, '設定排班月份']] + REST_TEMPLATE_ROWS + PAIR_TEMPLATE_ROWS
+    write_sheet(wb, CONTROL_SHEET, ['項目', '數值', '說明'], control, style, center=False,
+                validations=[(DataValidation(type="list", formula1='"是,否"', allow_blank=True), value_cell(control, TURNAROUND_ITEM)),
+                             (DataValidation(type="list", formula1=f'"{",".join(PAIR_GOALS)}"', allow_blank=True), value_cell(control, PAIR_ITEM))])
+
+    # Sheet 1: 行事曆 (維持六日不排班)
+    rows1 = []
+    for d in month_days(year, month):
+        if d.weekday() >= 5: continue
+        d_str = d.strftime('%Y/%m/%d'); wk = WEEKDAY_CHARS[d.weekday()]
+        for shift in ['A', 'B', 'C']:
+            doc_a = '劉醫師' if shift != 'C' else '莊醫師'
+            doc_b = '王醫師' if shift != 'B' else '薛醫師'
+            rows1.append([d_str, wk, shift, doc_a, doc_b, '營業'])
+    dv1 = [(DataValidation(type="list", formula1='"營業,休診"', allow_blank=False), f'F2:F{len(rows1) + 1}')] if rows1 else []
+    write_sheet(wb, "1_醫師班表與營業日", ['日期', '星期', '時段', '甲院_醫師', '乙院_醫師', '營業狀態'], rows1, style, validations=dv1)
+
+    # Sheet 2: 人員設定 (最近一次排班的名單；沒有時用預設名單)
+    headers2 = ['序號', '姓名', '員工編號', '身分 (下拉)', '職能 (下拉)', '本月個人目標 (數字)', '備註', '週一 (固定)', '週二 (固定)', '週三 (固定)', '週四 (固定)', '週五 (固定)', '週六 (固定)']
+    write_sheet(wb, "2_人員設定", headers2, staff_rows, style, validations=[
+        (DataValidation(type="list", formula1='"FT,PT"', allow_blank=True), 'D2:D100'),
+        (DataValidation(type="list", formula1='"Nurse,Admin"', allow_blank=True), 'E2:E100')])
+
+    # Sheet 3: 例外請假 (時段 / 類型下拉)
+    write_sheet(wb, "3_例外請假", ['姓名', '日期 (YYYY/MM/DD)', '時段 (下拉)', '類型 (下拉)', '備註', '結束日期 (選填)', '每週重複 (選填，如 一三五)'], [], style, center=False,
+                validations=[(DataValidation(type="list", formula1='"A,B,C,AB,AC,BC,ABC"', allow_blank=True), 'C2:C200'),
+                             (DataValidation(type="list", formula1='"OFF,ON,PT_OK"', allow_blank=True), 'D2:D200')])
+
+    # Sheet 4: 醫師人力規則
+    write_sheet(wb, "4_醫師人力規則", ['醫師姓名 (關鍵字)', '需配置人力'], [['劉醫師', 3], ['莊醫師', 2], ['薛醫師', 2], ['預設值', 2]], style, center=False)
+    return save_workbook(wb)
+
+def generate_nurse_template_bytes(year, month):
+    # 依 (年, 月, 名單) 快取在磁碟；名單取最近一次排班保存的人員設定
+    return cached_template('nurse', year, month, load_roster('nurse', DEFAULT_STAFF), build_nurse_template)
+
+# ==========================================
+# ⚙️ 第二部分：護理部 profile (N1/N2/N3 輪替 + N -> A -> PT 補位)
+# ==========================================
+NURSE_LOCATIONS = ['甲', '乙']
+WEEKDAY_COLS = {0: '週一', 1: '週二', 2: '週三', 3: '週四', 4: '週五', 5: '週六', 6: '週日'}
+
+def required_staff_count(doctor_load_map, doctor_name):
+    doc_str = str(doctor_name).strip()
+    if doc_str in ['nan', 'None', '', '無']: return 0
+    for k, v in doctor_load_map.items():
+        if k in doc_str: return int(v)
+    return doctor_load_map.get('預設值', 2)
+
+def _rule(val):
+    # 防呆：如果 Excel 表格裡沒有這一欄 (例如沒寫週六週日)，預設為空
+    rule = str(val).upper()
+    return '' if rule in ['NAN', '', '0'] else rule
+
+def load_nurse_inputs(engine, input_file):
+    df_calendar = pd.read_excel(input_file, sheet_name='1_醫師班表與營業日')
+    # 確保日期格式正確
+    df_calendar['日期'] = pd.to_datetime(df_calendar['日期']).dt.normalize()
+    # 院區取自表頭 (X院_醫師)，時段取自「時段」欄；新增院區只要在 Sheet 1 多加一欄
+    engine.layout = layout = SiteLayout(ordered_shifts(df_calendar['時段'], NURSE_PROFILE['shifts']),
+                                        header_locations(df_calendar.columns, '院_醫師') or NURSE_LOCATIONS)
+    engine.exceptions = ExceptionIndex(layout.all_shifts, engine.profile['exception_shifts'] == 'expand')
+
+    df_staff = pd.read_excel(input_file, sheet_name='2_人員設定')
+    df_staff['姓名'] = df_staff['姓名'].astype(str).str.replace(' ', '')
+    df_staff['員工編號'] = df_staff['員工編號'].astype(str).str.strip().replace('nan', 'NO_ID')
+    df_staff['本月個人目標 (數字)'] = df_staff['本月個人目標 (數字)'].fillna(0)
+    for s in df_staff.to_dict('records'):
+        engine.staff[s['姓名']] = {
+            'id': s['員工編號'], 'type': s['身分 (下拉)'], 'role': s['職能 (下拉)'],
+            'target': s['本月個人目標 (數字)'],
+            'rules': {wk: _rule(s.get(f"{col} (固定)", '')) for wk, col in WEEKDAY_COLS.items()}
+        }
+
+    df_wishes = pd.read_excel(input_file, sheet_name='3_例外請假')
+    for _, row in df_wishes.iterrows():
+        name = str(row['姓名']).strip()
+        w_type = row['類型 (下拉)']
+        if w_type not in ['OFF', 'ON', 'PT_OK']: continue
+        # 日期欄直接交給 ExceptionIndex (與復健部相同)：可為日期或「起~迄」區間字串
+        engine.exceptions.add(name, row['日期 (YYYY/MM/DD)'], w_type, shifts=row['時段 (下拉)'],
+                              end=row.get('結束日期 (選填)'), weekdays=row.get('每週重複 (選填，如 一三五)'))
+
+    try:
+        df_control = pd.read_excel(input_file, sheet_name=CONTROL_SHEET)
+        engine.rest_config = read_rest_settings(df_control.itertuples(index=False))
+        engine.pair_goal = read_pair_goal(df_control.itertuples(index=False), engine.pair_goal)
+    except ValueError:
+        pass  # 舊版輸入表沒有全域控制台：不做休息檢查
+    try:
+        engine.pairs.seed(pd.read_excel(input_file, sheet_name=PAIR_SHEET).itertuples(index=False))
+    except ValueError:
+        pass  # 選填：前幾個月的醫師搭配次數
+
+    df_rules = pd.read_excel(input_file, sheet_name='4_醫師人力規則')
+    engine.doctor_load_map = dict(zip(df_rules['醫師姓名 (關鍵字)'], df_rules['需配置人力']))
+
+    engine.dates = [d.strftime('%Y/%m/%d') for d in sorted(df_calendar['日期'].unique())]
+    # 每個 (日期, 時段) 取第一列，只有「營業」才排班
+    first_rows = df_calendar.drop_duplicates(['日期', '時段'], keep='first')
+    open_rows = {}
+    for row in first_rows.to_dict('records'):
+        if row['營業狀態'] != '營業': continue
+        d_str = row['日期'].strftime('%Y/%m/%d')
+        open_rows[(d_str, str(row['時段']).strip().upper())] = row
+    for d_str in engine.dates:
+        engine.open_shifts[d_str] = []
+        for shift in layout.shifts:
+            row = open_rows.get((d_str, shift))
+            if row is None: continue
+            engine.open_shifts[d_str].append(shift)
+            for loc in layout.locations:
+                doc = row[f'{loc}院_醫師']
+                engine.doctors[(d_str, shift, loc)] = doc
+                engine.requirements[(d_str, shift, loc)] = {None: required_staff_count(engine.doctor_load_map, doc)}
+
+def load_nurse_payload(engine, payload):
+    # JSON 版 (engine.payload)：sites 可直接給 need，未給時依 doctor_load 換算
+    # 結構檢查 (check_payload) 已在 engine.api 入口做過一次，這裡不重複
+    rows = calendar_rows(payload)
+    engine.layout = layout = SiteLayout(ordered_shifts([s for _, s, *_ in rows], NURSE_PROFILE['shifts']),
+                                        list(dict.fromkeys(loc for *_, sites, _ in rows for loc in sites)) or NURSE_LOCATIONS)
+    engine.staff = load_payload_staff(payload)
+    for info in engine.staff.values(): info['rules'] = {wk: _rule(rule) for wk, rule in info['rules'].items()}
+    engine.exceptions = load_payload_exceptions(payload, layout.all_shifts, engine.profile['exception_shifts'] == 'expand')
+    engine.doctor_load_map = dict(payload.get('doctor_load') or {})
+    engine.rest_config = rest_config(payload.get('rest'))
+    load_payload_pairs(engine, payload)
+    engine.dates = sorted({d_str for d_str, *_ in rows})
+    open_rows = {}
+    for d_str, shift, sites, is_open in rows:
+        if (d_str, shift) not in open_rows: open_rows[(d_str, shift)] = sites if is_open else None
+    for d_str in engine.dates:
+        engine.open_shifts[d_str] = []
+        for shift in layout.shifts:
+            sites = open_rows.get((d_str, shift))
+            if sites is None: continue
+            engine.open_shifts[d_str].append(shift)
+            for loc in layout.locations:
+                site = sites.get(loc) or {}
+                doc = site.get('doctor')
+                engine.doctors[(d_str, shift, loc)] = doc
+                need = site.get('need')
+                engine.requirements[(d_str, shift, loc)] = {None: int(need) if need is not None else required_staff_count(engine.doctor_load_map, doc)}
+
+NURSE_SCHEMA = {
+    '1_醫師班表與營業日': {'columns': ['日期', '時段', '營業狀態'], 'header_suffix': '院_醫師', 'max_rows': 5000,
+                    'types': {'日期': 'date', '時段': 'shift'}},
+    '2_人員設定': {'columns': ['姓名', '員工編號', '身分 (下拉)', '職能 (下拉)', '本月個人目標 (數字)'], 'max_rows': 1000,
+               'types': {'本月個人目標 (數字)': 'number'}},
+    '3_例外請假': {'columns': ['姓名', '日期 (YYYY/MM/DD)', '時段 (下拉)', '類型 (下拉)'], 'max_rows': 10000,
+               'types': {'日期 (YYYY/MM/DD)': 'date', '時段 (下拉)': 'shifts', '結束日期 (選填)': 'date'}},
+    '4_醫師人力規則': {'columns': ['醫師姓名 (關鍵字)', '需配置人力'], 'max_rows': 500, 'types': {'需配置人力': 'number'}},
+}
+
+# 每個時段建一次候選池：護理師 (輪值 > 欠班 > 其他) -> 行政 (今日優先 > 欠班) -> PT，依表頭順序補滿各院 (預設甲 -> 乙)
+NURSE_PROFILE = {
+    'name': '護理部',
+    'loader': load_nurse_inputs,
+    'schema': NURSE_SCHEMA,
+    'shifts': ['A', 'B', 'C'],
+    'locations': NURSE_LOCATIONS,
+    'fill_locations': NURSE_LOCATIONS,
+    'fixed_from_rules': False,
+    'max_per_day': None,
+    'pair_goal': None,                  # 醫師搭配預設不考慮；全域控制台可改為輪替 / 延續
+    'exception_priority': 'off_first',  # OFF 優先於 ON / PT_OK
+    'exception_shifts': 'expand',       # 時段空白 = 整天，'AB' = A 與 B
+    'on_kinds': ('ON', 'PT_OK'),
+    'ft_rule_restricts': True,          # FT 有填固定欄時只排該時段
+    'pool_scope': 'shift',
+    'groups': [
+        {'key': 'N', 'match': {'type': 'FT', 'role': 'Nurse'}, 'rotation': ['AB', 'BC', 'AC'],
+         'weights': {'base': 100, 'rotation': 500, 'under_target': 50, 'pair': 10}},
+        {'key': 'A', 'match': {'type': 'FT', 'role': 'Admin'}, 'rotation': ['ABC'],
+         'weights': {'base': 50, 'rotation': 100, 'under_target': 50, 'pair': 10}},
+        {'key': 'PT', 'match': {'type': 'PT'}, 'weights': {'base': 10, 'pair': 10}},
+    ],
+    'fill_steps': [{'need': 'total', 'label': '依序補滿'}],
+    'theme': {
+        'header_fill': '7030A0', 'header_font': 'FFFFFF', 'loc_fill': 'E4DFEC', 'weekday_row': False,
+        'edit_validation': False, 'sort_staff_by_id': False, 'pt_target': None, 'pt_status': 'PT: ',
+        'raw_dates': 'datetime',
+    },
+    'erp_theme': {'header_fill': '7030A0', 'header_font': 'FFFFFF', 'id_fill': 'E4DFEC', 'thick_block_border': False, 'name_width': 12},
+}
+
+# JSON 請求 (engine.api) 不經 xlsx
+NURSE_PAYLOAD_PROFILE = dict(NURSE_PROFILE, loader=load_nurse_payload, schema=None)
+
+class ClinicSchedulerNurse(ScheduleEngine):
+    def __init__(self, input_file, live_total=False, trace=False):
+        super().__init__(NURSE_PROFILE, input_file, live_total=live_total, trace=trace)
+        self.doctor_load_map = {}
+
+    def get_required_staff_count(self, doctor_name):
+        return required_staff_count(self.doctor_load_map, doctor_name)
+
+def run_nurse_scheduler(input_file, raw_out=None, live_total=False, progress=None, trace=False):
+    # raw_out: 傳入 dict 時，另外輸出欄式底稿 {'csv': BytesIO, 'parquet': BytesIO}
+    # progress: 進度回報 progress(stage, fraction)，stage 為 load / fill / write
+    # trace: 記錄排班決策 (候選池分數與未列入原因)；有 raw_out 時另外放入 raw_out['trace'] (CSV)
+    scheduler = ClinicSchedulerNurse(input_file, live_total=live_total, trace=trace)
+    if progress: progress('load')
+    success, msg = scheduler.load_data()
+    if not success: return None, msg
+    save_roster('nurse', roster_rows(scheduler.staff, 6))  # 下個月的模板預填這份名單
+    output = scheduler.run(raw_formats=('csv', 'parquet') if raw_out is not None else (), progress=progress)
+    if raw_out is not None:
+        raw_out.update(scheduler.raw_files)
+        if scheduler.trace is not None: raw_out[TRACE_KEY] = scheduler.trace.to_csv()
+    return output, "排班成功"
+
+def nurse_schedule_job(input_file, progress=None, live_total=False, trace=False):
+    # 背景工作用：結果轉成 bytes 供多個 session 共用
+    raw_files = {}
+    output, msg = run_nurse_scheduler(input_file, raw_out=raw_files, live_total=live_total, progress=progress, trace=trace)
+    return (output.getvalue() if output else None), {k: v.getvalue() for k, v in raw_files.items()}, msg
+
+def run_nurse_chunked(input_file, out_path=None, chunk='month', progress=None):
+    # 整年 / 多院區：逐月 (或逐週) 排班並直接寫到磁碟
+    scheduler = ClinicSchedulerNurse(input_file)
+    if progress: progress('load')
+    success, msg = scheduler.load_data()
+    if not success: return None, msg
+    save_roster('nurse', roster_rows(scheduler.staff, 6))
+    return run_chunked(scheduler, out_path, chunk, progress=progress), "分段排班成功"
+
+def nurse_chunked_job(input_file, progress=None, chunk='month'):
+    path, msg = run_nurse_chunked(input_file, chunk=chunk, progress=progress)
+    return (ResultFile(path) if path else None), {}, msg
+
+def nurse_risk_report(input_file, result_file=None, n_scenarios=10000, absence_rate=0.05, seed=None):
+    # 需求人數依「4_醫師人力規則」(get_required_staff_count)
+    return risk_report(ClinicSchedulerNurse(input_file), input_file, result_file, n_scenarios, absence_rate, seed)
+
+# ==========================================
+# 🔁 匯入手動修改 (互動排班表 -> 底稿)
+# ==========================================
+def import_nurse_dashboard(result_file, input_file=None):
+    availability = None
+    if input_file is not None:
+        scheduler = ClinicSchedulerNurse(input_file)
+        success, msg = scheduler.load_data()
+        if not success: return None, msg
+        availability = scheduler.unavailable_reason
+    try:
+        # 護理部引擎本身沒有單日診數上限，這裡只檢查同時段重複與可排性
+        records, changes, issues = import_dashboard(result_file, availability, max_per_day=NURSE_PROFILE['max_per_day'])
+    except Exception as e:
+        return None, f"❌ 匯入失敗: {e}"
+    return (records, changes, issues), f"已讀取 {len(changes)} 筆修改，{len(issues)} 筆需要確認"
+
+# ==========================================
+# ⚙️ 第三部分：ERP 轉檔
+# ==========================================
+def convert_nurse_erp(input_file):
+    # 接受排班結果 xlsx，或排班時一併輸出的 CSV / Parquet 底稿
+    try:
+        df_raw = read_raw_table(input_file)
+    except UploadError as e: return None, f"❌ {e}"
+    except: return None, "❌ 找不到底稿"
+    
+    if '員工編號' not in df_raw.columns: return None, "❌ 缺少員編"
+    return build_erp_workbook(df_raw, NURSE_PROFILE['erp_theme'], NURSE_PROFILE['shifts']), "轉檔成功"
+
+def convert_nurse_erp_delta(input_file, previous_file):
+    # 只輸出與上一版相比有異動的員工
+    try:
+        df_raw = read_raw_table(input_file)
+    except UploadError as e: return None, f"❌ {e}"
+    except: return None, "❌ 找不到底稿"
+    if '員工編號' not in df_raw.columns: return None, "❌ 缺少員編"
+    try:
+        output, changes = build_erp_delta(df_raw, previous_file, NURSE_PROFILE['erp_theme'], NURSE_PROFILE['shifts'])
+    except Exception as e: return None, f"❌ 上一版讀取失敗: {e}"
+    if changes.empty: return None, "ℹ️ 與上一版相同，沒有異動"
+    return (output, changes), f"異動轉檔成功 ({len(changes)} 人)"
@@ -0,0 +1,89 @@
+import pandas as pd
+
+# ==========================================
+# 🩺 醫師搭配：人員 × 醫師 稀疏計數 (每次排入補位院區就 +1)
+# ==========================================
+# 目標來自「0_全域控制台」的「醫師搭配目標」或 JSON 的 "pair_goal"：
+#   輪替 (rotation)   -> 搭配過越多次分數越低，分散給不同醫師
+#   延續 (continuity) -> 搭配過越多次分數越高，盡量跟熟悉的醫師
+# 前幾個月的次數可由選填的「7_醫師搭配紀錄」(姓名 / 醫師 / 次數) 帶入；結果檔的「醫師搭配」頁可直接貼回下個月
+PAIR_SHEET = '7_醫師搭配紀錄'
+PAIR_RESULT_SHEET = '醫師搭配'
+PAIR_COLUMNS = ['姓名', '醫師', '次數']
+PAIR_ITEM = '醫師搭配目標'
+PAIR_GOALS = {'輪替': 'rotation', '延續': 'continuity', '不考慮': None}
+PAIR_SIGN = {'rotation': -1, 'continuity': 1}
+PAIR_TEMPLATE_ROWS = [[PAIR_ITEM, None, '輪替 / 延續 / 不考慮 (空白 = 部門預設)']]
+NO_DOCTOR = ('', 'nan', 'None', '無')
+
+
+def doctor_key(doc):
+    """醫師欄位 -> 計數用的名稱；空白 / 無 回傳 None (不計)"""
+    if doc is None or (isinstance(doc, float) and pd.isna(doc)): return None
+    s = str(doc).strip()
+    return None if s in NO_DOCTOR else s
+
+
+def read_pair_goal(rows, default=None):
+    """全域控制台 (項目, 數值, ...) 列 -> 'rotation' / 'continuity' / None；沒填時用部門預設"""
+    for row in rows:
+        if not row or row[0] is None or str(row[0]).strip() != PAIR_ITEM or len(row) < 2: continue
+        val = doctor_key(row[1])
+        if val is None: return default
+        return PAIR_GOALS.get(val, val if val in PAIR_SIGN else default)
+    return default
+
+
+class PairCounts:
+    """
+    稀疏計數：人員 -> {醫師代碼: 次數}，醫師名稱只在第一次出現時編號。
+    數百位人員 × 數十位醫師也只存實際搭配過的格子；查詢 / 累加都是兩次 dict 存取。
+    """
+
+    def __init__(self):
+        self._doc_ids = {}
+        self._doctors = []
+        self._rows = {}
+
+    def _doc(self, doc, create=False):
+        key = doctor_key(doc)
+        if key is None: return None
+        i = self._doc_ids.get(key)
+        if i is None and create:
+            i = self._doc_ids[key] = len(self._doctors); self._doctors.append(key)
+        return i
+
+    def get(self, name, doc):
+        i = self._doc(doc)
+        return 0 if i is None else self._rows.get(name, {}).get(i, 0)
+
+    def add(self, name, doc, n=1):
+        i = self._doc(doc, create=True)
+        if i is None or not n: return
+        row = self._rows.setdefault(name, {})
+        row[i] = row.get(i, 0) + n
+
+    def seed(self, rows):
+        """(姓名, 醫師, 次數) 列 (前幾個月的紀錄)；次數不是數字的列略過"""
+        for row in rows:
+            if not row or len(row) < 3 or row[0] is None: continue
+            try:
+                n = int(float(row[2]))
+            except (TypeError, ValueError):
+                continue
+            self.add(str(row[0]).strip(), row[1], n)
+
+    def __len__(self):
+        return sum(len(r) for r in self._rows.values())
+
+    def rows(self):
+        return [[name, self._doctors[i], n] for name in sorted(self._rows) for i, n in sorted(self._rows[name].items())]
+
+    def to_frame(self):
+        return pd.DataFrame(self.rows(), columns=PAIR_COLUMNS)
+
+    def write_sheet(self, wb):
+        ws = wb.create_sheet(PAIR_RESULT_SHEET)
+        ws.append(PAIR_COLUMNS)
+        for row in self.rows(): ws.append(row)
+        return ws
@@ -0,0 +1,141 @@
+from datetime import date
+from numbers import Number
+
+from engine.intervals import ExceptionIndex, WEEKDAY_CHARS, to_ordinal
+
+# ==========================================
+# 🧾 JSON 輸入：人事系統直接送名單 / 請假 / 醫師班表，不經 xlsx
+# ==========================================
+# 與輸入表同一份資料，只是改用英文鍵 (engine.api 的 /schedule、/validate 使用)：
+# {
+#   "dept": "rehab",
+#   "calendar":   [{"date": "2026/03/02", "shift": "A", "closed": false,
+#                   "sites": {"丁": {"doctor": "劉醫師", "PT": 5, "OT": 0}}}],   護理部: {"doctor": "劉醫師", "need": 3 (選填)}
+#   "staff":      [{"name": "林振明", "id": "PTA005", "type": "FT", "role": "PT(物治)", "target": 40,
+#                   "rules": {"一": "A甲", "三": "B甲,C甲"}}],                  週幾可寫 一..日 或 0..6
+#   "exceptions": [{"name": "林振明", "date": "2026/03/05", "shifts": "AB", "kind": "OFF",
+#                   "end": "2026/03/06", "weekdays": "一三五"}],                 shifts / end / weekdays 選填
+#   "fixed_locations": ["甲", "乙", "丙"],     復健部選填，等同「5_院區設定」的固定院區
+#   "doctor_load": {"劉醫師": 3, "預設值": 2}   護理部，等同「4_醫師人力規則」
+#   "rest": {"max_per_window": 9, "max_consecutive": 5, "no_turnaround": true}   選填，等同全域控制台的休息規則
+#   "pair_goal": "rotation",                    選填 rotation / continuity / none，等同「醫師搭配目標」
+#   "pairs": [["林振明", "劉醫師", 12]]          選填，前幾個月的醫師搭配次數 (/schedule 回傳的 pairs 可直接帶入)
+# }
+MAX_ERRORS = 50
+MAX_RESULT_ROWS = 200000   # /erp 的 rows 上限 (與 xlsx 底稿相同)
+
+
+def payload_date(val):
+    """'2026/03/02' / '2026-03-02' -> 'YYYY/MM/DD'；無法解析回傳 None"""
+    ordinal = to_ordinal(val)
+    if ordinal is None: return None
+    return date.fromordinal(ordinal).strftime('%Y/%m/%d')
+
+
+def payload_weekday(key):
+    """週幾鍵：'一'..'日' 或 0..6 (字串亦可)；無法辨識回傳 None"""
+    s = str(key).strip()
+    if s in WEEKDAY_CHARS: return WEEKDAY_CHARS[s]
+    return int(s) if s.isdigit() and int(s) < 7 else None
+
+
+def check_payload(payload, site_numbers=(), exception_kinds=('OFF', 'ON')):
+    """
+    結構檢查 (不排班)：回傳錯誤訊息清單，最多 MAX_ERRORS 筆。
+    site_numbers: 院區欄位中必須為數字的鍵 (復健部 PT / OT，護理部 need)
+    """
+    errors = []
+    def err(msg):
+        if len(errors) < MAX_ERRORS: errors.append(msg)
+    if not isinstance(payload, dict): return ["❌ 請求內容需為 JSON 物件"]
+    for key in ('calendar', 'staff'):
+        if not isinstance(payload.get(key), list) or not payload[key]: err(f"❌ 缺少「{key}」或內容為空")
+    if errors: return errors
+
+    for i, row in enumerate(payload['calendar']):
+        if not isinstance(row, dict): err(f"❌ calendar[{i}] 需為物件"); continue
+        if payload_date(row.get('date')) is None: err(f"❌ calendar[{i}].date 無法解析: {row.get('date')!r}")
+        shift = str(row.get('shift') or '').strip()
+        if len(shift) != 1: err(f"❌ calendar[{i}].shift 需為單一字元: {row.get('shift')!r}")
+        sites = row.get('sites', {})
+        if not isinstance(sites, dict): err(f"❌ calendar[{i}].sites 需為物件"); continue
+        for loc, site in sites.items():
+            if not isinstance(site, dict): err(f"❌ calendar[{i}].sites.{loc} 需為物件"); continue
+            for k in site_numbers:
+                v = site.get(k)
+                if v is not None and (not isinstance(v, Number) or isinstance(v, bool) or v < 0):
+                    err(f"❌ calendar[{i}].sites.{loc}.{k} 需為非負數字: {v!r}")
+
+    if payload.get('rest') is not None and not isinstance(payload['rest'], dict): err("❌ rest 需為物件")
+    if payload.get('pair_goal') not in (None, 'rotation', 'continuity', 'none'): err(f"❌ pair_goal 需為 rotation/continuity/none: {payload['pair_goal']!r}")
+    if payload.get('pairs') is not None and not isinstance(payload['pairs'], list): err("❌ pairs 需為 [姓名, 醫師, 次數] 的 list")
+
+    names = set()
+    for i, s in enumerate(payload['staff']):
+        if not isinstance(s, dict) or not str(s.get('name') or '').strip(): err(f"❌ staff[{i}] 缺少 name"); continue
+        name = str(s['name']).strip()
+        if name in names: err(f"❌ staff[{i}] 姓名重複: {name}")
+        names.add(name)
+        if s.get('target') is not None and not isinstance(s['target'], Number): err(f"❌ staff[{i}].target 需為數字: {s['target']!r}")
+        rules = s.get('rules', {})
+        if not isinstance(rules, dict): err(f"❌ staff[{i}].rules 需為物件 (週幾 -> 規則)"); continue
+        bad = [k for k in rules if payload_weekday(k) is None]
+        if bad: err(f"❌ staff[{i}].rules 週幾無法辨識: {bad}")
+
+    for i, x in enumerate(payload.get('exceptions') or []):
+        if not isinstance(x, dict): err(f"❌ exceptions[{i}] 需為物件"); continue
+        if str(x.get('name') or '').strip() not in names: err(f"❌ exceptions[{i}] 不在人員名單: {x.get('name')!r}")
+        if payload_date(str(x.get('date') or '').split('~')[0]) is None: err(f"❌ exceptions[{i}].date 無法解析: {x.get('date')!r}")
+        if x.get('kind') not in exception_kinds: err(f"❌ exceptions[{i}].kind 需為 {'/'.join(exception_kinds)}: {x.get('kind')!r}")
+    return errors
+
+
+def check_result_rows(rows, previous=None):
+    """/erp 的 rows ([日期, 時段, 地點, 姓名, 員工編號]) 與 previous (上一版 manifest) 結構檢查；回傳錯誤訊息清單"""
+    errors = []
+    def err(msg):
+        if len(errors) < MAX_ERRORS: errors.append(msg)
+    if not isinstance(rows, list) or not rows: return ["❌ 缺少「rows」或內容為空"]
+    if len(rows) > MAX_RESULT_ROWS: return [f"❌ rows 有 {len(rows)} 列，超過上限 {MAX_RESULT_ROWS} 列"]
+    for i, row in enumerate(rows):
+        if not isinstance(row, list) or len(row) != 5: err(f"❌ rows[{i}] 需為 [日期, 時段, 地點, 姓名, 員工編號]"); continue
+        if payload_date(row[0]) is None: err(f"❌ rows[{i}] 日期無法解析: {row[0]!r}")
+        if not str(row[3] or '').strip(): err(f"❌ rows[{i}] 缺少姓名")
+    if previous is not None:
+        if not isinstance(previous, dict): err("❌ previous 需為 /erp 回傳的 manifest 物件")
+        else:
+            for emp_id, v in previous.items():
+                if not isinstance(v, list) or len(v) != 3 or not isinstance(v[2], dict):
+                    err(f"❌ previous.{emp_id} 需為 [姓名, 指紋, {{日期: [時段, 地點]}}]"); break
+    return errors
+
+
+def calendar_rows(payload):
+    """[(日期, 時段, 院區 dict, 是否營業)]，依請求順序"""
+    return [(payload_date(row['date']), str(row['shift']).strip().upper(), row.get('sites') or {}, not row.get('closed'))
+            for row in payload['calendar']]
+
+
+def load_payload_staff(payload):
+    staff = {}
+    for s in payload['staff']:
+        rules = {payload_weekday(k): str(v).strip().upper() if v else '' for k, v in (s.get('rules') or {}).items()}
+        staff[str(s['name']).strip()] = {
+            'id': str(s.get('id') or '').strip() or 'NO_ID', 'type': s.get('type', 'FT'), 'role': s.get('role'),
+            'target': s.get('target') or 0, 'rules': rules,
+        }
+    return staff
+
+
+def load_payload_exceptions(payload, all_shifts, expand_shifts=True):
+    exceptions = ExceptionIndex(all_shifts, expand_shifts)
+    for x in payload.get('exceptions') or []:
+        exceptions.add(str(x['name']).strip(), x['date'], x['kind'], shifts=x.get('shifts'), end=x.get('end'), weekdays=x.get('weekdays'))
+    return exceptions
+
+
+def load_payload_pairs(engine, payload):
+    goal = payload.get('pair_goal')
+    if goal is not None: engine.pair_goal = None if goal == 'none' else goal
+    engine.pairs.seed(payload.get('pairs') or [])
+
@@ -0,0 +1,100 @@
+import io
+import os
+
+import pandas as pd
+
+from engine.validate import UploadError, check_upload_size, validate_workbook
+
+# ==========================================
+# 📦 原始運算底稿：欄式輸出 (CSV / Parquet) 與讀取
+# ==========================================
+RAW_SHEET = '原始運算底稿'
+RAW_COLUMNS = ['日期', '時段', '地點', '姓名', '員工編號']
+CATEGORY_COLUMNS = ['日期', '時段', '地點', '員工編號']
+RAW_MAX_ROWS = 200000   # 整年多院區的底稿約數萬列
+RAW_SCHEMA = {RAW_SHEET: {'columns': RAW_COLUMNS, 'max_rows': RAW_MAX_ROWS, 'types': {'日期': 'date', '時段': 'shift'}}}
+
+RAW_MIME = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def parquet_available():
+    """Parquet 需要 pyarrow 或 fastparquet，未安裝時只輸出 CSV"""
+    for mod in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(mod)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+def compact_raw_frame(records):
+    """把排班紀錄 (list of dict 或 DataFrame) 轉成欄式輸出用的精簡表格"""
+    df = pd.DataFrame(records, columns=RAW_COLUMNS)
+    # 日期統一為 YYYY/MM/DD 字串，與 xlsx 底稿及 ERP 轉檔的解析方式一致
+    dates = pd.to_datetime(df['日期'])
+    df['日期'] = dates.dt.strftime('%Y/%m/%d')
+    df['員工編號'] = df['員工編號'].fillna('NO_ID').astype(str)
+    df['姓名'] = df['姓名'].astype(str)
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype('category')
+    return df
+
+
+def export_raw_files(records, formats=('csv', 'parquet')):
+    """回傳 {格式: BytesIO}；Parquet 無可用套件時略過"""
+    df = compact_raw_frame(records)
+    files = {}
+    for fmt in formats:
+        output = io.BytesIO()
+        if fmt == 'csv':
+            # 加 BOM 讓 Excel 直接開啟時中文不亂碼
+            df.to_csv(output, index=False, encoding='utf-8-sig')
+        elif fmt == 'parquet':
+            if not parquet_available(): continue
+            df.to_parquet(output, index=False)
+        else:
+            raise ValueError(f"不支援的底稿格式: {fmt}")
+        output.seek(0)
+        files[fmt] = output
+    return files
+
+
+def _sniff(input_file):
+    """以檔頭判斷格式：xlsx 為 zip (PK)，Parquet 為 PAR1，其餘視為 CSV"""
+    if isinstance(input_file, (str, os.PathLike)):
+        with open(input_file, 'rb') as fh: head = fh.read(4)
+    else:
+        pos = input_file.tell()
+        head = input_file.read(4)
+        input_file.seek(pos)
+    if head.startswith(b'PK'): return 'xlsx'
+    if head == b'PAR1': return 'parquet'
+    return 'csv'
+
+
+def read_raw_table(input_file):
+    """讀取排班結果檔 (xlsx 底稿頁、CSV 或 Parquet)，回傳原始運算底稿 DataFrame；格式不符拋出 UploadError"""
+    check_upload_size(input_file)
+    fmt = _sniff(input_file)
+    if fmt == 'xlsx':
+        # 先串流檢查底稿頁與表頭，再整張讀入
+        validate_workbook(input_file, RAW_SCHEMA)
+        return pd.read_excel(input_file, sheet_name=RAW_SHEET)
+    try:
+        if fmt == 'parquet':
+            df = pd.read_parquet(input_file)
+        else:
+            df = pd.read_csv(input_file, encoding='utf-8-sig', dtype={'員工編號': str})
+    except (ValueError, UnicodeDecodeError) as e:
+        raise UploadError(f"無法讀取底稿 ({fmt.upper()}): {e}")
+    missing = [c for c in RAW_COLUMNS if c not in df.columns]
+    if missing: raise UploadError(f"底稿缺少欄位: {'、'.join(missing)}")
+    if len(df) > RAW_MAX_ROWS: raise UploadError(f"底稿有 {len(df)} 列，超過上限 {RAW_MAX_ROWS} 列")
+    # 類別欄還原為一般欄位，後續 ERP 邏輯與 xlsx 來源完全相同
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype): df[col] = df[col].astype(object)
+    return df
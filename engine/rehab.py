@@ -0,0 +1,359 @@
+from datetime import datetime
+
+import openpyxl
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from engine.chunked import run_chunked
+from engine.core import ScheduleEngine
+from engine.erp import build_erp_delta, build_erp_workbook
+from engine.intervals import ExceptionIndex
+from engine.jobs import ResultFile
+from engine.layout import LAYOUT_SHEET, LOC_FILL, LOC_FIXED, SiteLayout, header_locations, ordered_shifts, read_layout_sheet
+from engine.pairing import PAIR_GOALS, PAIR_ITEM, PAIR_SHEET, PAIR_TEMPLATE_ROWS, read_pair_goal
+from engine.payload import calendar_rows, load_payload_exceptions, load_payload_pairs, load_payload_staff
+from engine.raw_io import read_raw_table
+from engine.reimport import import_dashboard
+from engine.rest import CONTROL_SHEET, REST_TEMPLATE_ROWS, TURNAROUND_ITEM, read_rest_settings, rest_config
+from engine.risk import risk_report
+from engine.templates import (TemplateStyle, WEEKDAY_CHARS, cached_template, load_roster, month_days, new_workbook, roster_rows,
+                              save_roster, save_workbook, value_cell, write_sheet)
+from engine.trace import TRACE_KEY
+from engine.validate import UploadError
+
+# ==========================================
+# ⚙️ 第一部分：產生模板邏輯 (V5 + 真實資料預填)
+# ==========================================
+# ★★★ 真實醫師班表設定 (依照圖一) ★★★
+# 格式: '班別': {'d_doc': 丁醫, 'w_doc': 戊醫, 'd_pt': 丁P, 'd_ot': 丁O, 'w_pt': 戊P, 'w_ot': 戊O}
+WEEKLY_TEMPLATE = {
+    0: { # 週一
+        'A': {'d_doc': '劉醫師', 'w_doc': '薛醫師', 'd_pt': 5, 'd_ot': 0, 'w_pt': 4, 'w_ot': 0},
+        'B': {'d_doc': '莊醫師', 'w_doc': '劉醫師', 'd_pt': 4, 'd_ot': 0, 'w_pt': 3, 'w_ot': 1},
+        'C': {'d_doc': '劉醫師', 'w_doc': '莊醫師', 'd_pt': 4, 'd_ot': 0, 'w_pt': 3, 'w_ot': 1},
+    },
+    1: { # 週二
+        'A': {'d_doc': '莊醫師', 'w_doc': '薛醫師', 'd_pt': 4, 'd_ot': 0, 'w_pt': 4, 'w_ot': 0},
+        'B': {'d_doc': '劉醫師', 'w_doc': '王醫師', 'd_pt': 4, 'd_ot': 0, 'w_pt': 4, 'w_ot': 0},
+        'C': {'d_doc': '薛醫師', 'w_doc': '王醫師', 'd_pt': 3, 'd_ot': 0, 'w_pt': 4, 'w_ot': 0},
+    },
+    2: { # 週三
+        'A': {'d_doc': '薛醫師', 'w_doc': '劉醫師', 'd_pt': 4, 'd_ot': 0, 'w_pt': 3, 'w_ot': 1},
+        'B': {'d_doc': '莊醫師', 'w_doc': '王醫師', 'd_pt': 3, 'd_ot': 0, 'w_pt': 4, 'w_ot': 0},
+        'C': {'d_doc': '王醫師', 'w_doc': '莊醫師', 'd_pt': 3, 'd_ot': 0, 'w_pt': 3, 'w_ot': 1},
+    },
+    3: { # 週四
+        'A': {'d_doc': '莊醫師', 'w_doc': '劉醫師', 'd_pt': 4, 'd_ot': 0, 'w_pt': 3, 'w_ot': 1},
+        'B': {'d_doc': '王醫師', 'w_doc': '無',     'd_pt': 4, 'd_ot': 0, 'w_pt': 3, 'w_ot': 0},
+        'C': {'d_doc': '王醫師', 'w_doc': '劉醫師', 'd_pt': 4, 'd_ot': 0, 'w_pt': 3, 'w_ot': 1},
+    },
+    4: { # 週五
+        'A': {'d_doc': '劉醫師', 'w_doc': '薛醫師', 'd_pt': 5, 'd_ot': 0, 'w_pt': 4, 'w_ot': 0},
+        'B': {'d_doc': '無',     'w_doc': '莊醫師', 'd_pt': 3, 'd_ot': 0, 'w_pt': 3, 'w_ot': 1},
+        'C': {'d_doc': '莊醫師', 'w_doc': '劉醫師', 'd_pt': 3, 'd_ot': 0, 'w_pt': 3, 'w_ot': 1},
+    }
+}
+
+# 尚未排過班 (沒有保存的名單) 時使用的預設名單 (依照圖二)
+REAL_STAFF_DATA = [
+    [1, '林振明', 'PTA005', 'FT', 'PT(物治)', 40, '', '', '', '', 'A甲', ''],
+    [2, '張雅惠', 'A002', 'FT', 'PT(物治)', 40, '', '', 'B甲', 'A甲', '', ''],
+    [3, '曾詩婷', 'PT022', 'FT', 'PT(物治)', 40, '', '', 'C甲', 'C甲', '', ''],
+    [4, '葉宜甫', 'PT037', 'FT', 'PT(物治)', 40, '', '', '', '', 'C甲', ''],
+    [5, '吳星霈', 'PT044', 'FT', 'PT(物治)', 40, '', 'B甲', '', '', '', ''],
+    [6, '廖姿雅', 'PT031', 'FT', 'PT(物治)', 40, '', 'C甲', '', '', '', ''],
+    [7, '林艾炘', 'PT043', 'FT', 'PT(物治)', 40, '', '', '', '', '', 'B甲'],
+    [8, '鄭詠心', 'PTP116', 'FT', 'PT(物治)', 40, '', '', '', '', '', 'C甲'],
+    [9, '鄧雅曼', 'OT022', 'FT', 'OT(職治)', 40, '', 'B戊 C戊', '', 'A戊 C戊', 'A戊 C戊', 'B戊,C戊'],
+    [10, '古姿麟', 'PT034', 'FT', 'PT(物治)', 40, '', '', '', 'B甲', 'B甲', ''],
+    [11, '簡廷宇', 'PT048', 'FT', 'PT(物治)', 40, '', '', '', 'B甲', '', ''],
+    [12, '何沛錡', 'PT049', 'FT', 'PT(物治)', 40, '', 'C乙', 'B乙', 'C丙', 'A丙', 'C丙'],
+    [13, '戴幸儀', 'OTP020', 'PT', 'OT(職治)', 40, '', '', '', '', '', ''],
+    [14, '徐麗姿', 'PTP123', 'PT', 'PT(物治)', 0, '', '', '', '', '', ''],
+    [15, '伍庭瑩', 'PTP125', 'PT', 'PT(物治)', 0, '', '', '', '', '', ''],
+    [16, '朗振崴', 'PTP126', 'PT', 'PT(物治)', 0, '', '', 'A甲', '', '', ''],
+    [17, '康宜姍', 'PTP114', 'PT', 'PT(物治)', 0, '', '', '', '', '', ''],
+    [18, '蔡宗霖', 'PTP1127', 'PT', 'PT(物治)', 0, '', '', '', '', '', ''],
+    [19, '馬奕凱', 'PTA003', 'FT', 'PT(物治)', 40, '', 'A甲,C戊', 'A戊,B戊', 'B戊,C戊', 'A戊,C戊', 'A戊,B戊'],
+    [20, '林玉晴', 'PT003', 'FT', 'PT(物治)', 40, '', 'A戊,B戊', 'B戊,C戊', 'A戊,C戊', 'A戊,B戊', 'A甲,C戊']
+]
+
+def build_template(year, month, staff_rows):
+    wb = new_workbook()
+    style = TemplateStyle("2F75B5")
+
+    # Sheet 0: 全域控制台 (含休息規則，空白 = 不限)
+    control = [['年份', year, '設定排班年份'], ['月份', month, '設定排班月份']] + REST_TEMPLATE_ROWS + PAIR_TEMPLATE_ROWS
+    write_sheet(wb, CONTROL_SHEET, ['項目', '數值', '說明'], control, style, center=False,
+                validations=[(DataValidation(type="list", formula1='"是,否"', allow_blank=True), value_cell(control, TURNAROUND_ITEM)),
+                             (DataValidation(type="list", formula1=f'"{",".join(PAIR_GOALS)}"', allow_blank=True), value_cell(control, PAIR_ITEM))])
+
+    # Sheet 1: 行事曆與醫師 (真實醫師預填，跳過六日)
+    rows1 = []
+    for d in month_days(year, month):
+        if d.weekday() >= 5: continue
+        d_str = d.strftime('%Y/%m/%d'); wk = WEEKDAY_CHARS[d.weekday()]
+        daily_plan = WEEKLY_TEMPLATE.get(d.weekday(), {})
+        for shift in ['A', 'B', 'C']:
+            sp = daily_plan.get(shift, {})
+            rows1.append([d_str, wk, shift, sp.get('d_doc',''), sp.get('w_doc',''), sp.get('d_pt',3), sp.get('d_ot',0), sp.get('w_pt',3), sp.get('w_ot',0), '營業'])
+    headers1 = ['日期', '星期', '時段', '丁院_醫師', '戊院_醫師', '丁_PT需求', '丁_OT需求', '戊_PT需求', '戊_OT需求', '營業狀態']
+    dv1 = [(DataValidation(type="list", formula1='"營業,休診"', allow_blank=False), f'J2:J{len(rows1) + 1}')] if rows1 else []
+    write_sheet(wb, "1_行事曆與醫師", headers1, rows1, style, validations=dv1)
+
+    # Sheet 2: 人員設定 (最近一次排班的名單；沒有時用預設名單)
+    headers2 = ['序號', '姓名', '員工編號', '身分 (下拉)', '職能 (下拉)', '本月目標診數', '備註', '週一 (固定/可排)', '週二 (固定/可排)', '週三 (固定/可排)', '週四 (固定/可排)', '週五 (固定/可排)']
+    write_sheet(wb, "2_人員設定", headers2, staff_rows, style, validations=[
+        (DataValidation(type="list", formula1='"FT,PT"', allow_blank=True), 'D2:D100'),
+        (DataValidation(type="list", formula1='"PT(物治),OT(職治)"', allow_blank=True), 'E2:E100')])
+
+    # Sheet 3: 例外請假
+    write_sheet(wb, "3_例外請假", ['姓名', '日期 (YYYY/MM/DD)', '時段', '類型 (下拉)', '備註', '結束日期 (選填)', '每週重複 (選填，如 一三五)'], [], style, center=False,
+                validations=[(DataValidation(type="list", formula1='"OFF,ON"', allow_blank=True), 'D2:D200')])
+
+    # Sheet 5: 院區設定 (固定院區只出現在人員固定規則；補位院區需在 Sheet 1 有「X院_醫師 / X_PT需求 / X_OT需求」欄)
+    rows5 = [[loc, LOC_FIXED, '固定班院區'] for loc in FIXED_LOCATIONS] + [[loc, LOC_FILL, '依醫師班表補位'] for loc in DYNAMIC_LOCATIONS]
+    write_sheet(wb, LAYOUT_SHEET, ['地點', '類型 (下拉)', '說明'], rows5, style, center=False,
+                validations=[(DataValidation(type="list", formula1=f'"{LOC_FIXED},{LOC_FILL}"', allow_blank=True), 'B2:B50')])
+    return save_workbook(wb)
+
+def generate_template_bytes(year, month):
+    # 依 (年, 月, 名單) 快取在磁碟；名單取最近一次排班保存的人員設定
+    return cached_template('rehab', year, month, load_roster('rehab', REAL_STAFF_DATA), build_template)
+
+# ==========================================
+# ⚙️ 第二部分：復健部 profile (V7.3 瀑布流)
+# ==========================================
+FIXED_LOCATIONS = ['甲', '乙', '丙']
+DYNAMIC_LOCATIONS = ['丁', '戊']
+ALL_LOCATIONS = FIXED_LOCATIONS + DYNAMIC_LOCATIONS
+ROLE_PT = 'PT(物治)'
+ROLE_OT = 'OT(職治)'
+
+def load_staff_db(wb):
+    ws2 = wb['2_人員設定']
+    staff_db = {}
+    for row in ws2.iter_rows(min_row=2, values_only=True):
+        if not row[1]: continue 
+        name = str(row[1]).strip()
+        emp_id = str(row[2]).strip() if row[2] else "NO_ID"
+        rules = {}
+        for i in range(5): 
+            val = row[7+i]; rules[i] = str(val).strip() if val else ""
+        staff_db[name] = {
+            'id': emp_id, 'type': str(row[3]).strip(), 'role': str(row[4]).strip(),
+            'target': row[5] if isinstance(row[5], (int, float)) else 0,
+            'rules': rules
+        }
+    return staff_db
+
+def load_exceptions(wb, all_shifts='ABC', expand_shifts=False):
+    # 一列可為單日，或 (結束日期) 區間、(每週重複) 週幾；時段需為單一時段 (expand_shifts 時空白 = 整天、'AB' = A 與 B)
+    ws3 = wb['3_例外請假']
+    exceptions = ExceptionIndex(all_shifts, expand_shifts)
+    for row in ws3.iter_rows(min_row=2, values_only=True):
+        if not row[0] or not row[1]: continue
+        end_val = row[5] if len(row) > 5 else None
+        weekdays = row[6] if len(row) > 6 else None
+        exceptions.add(str(row[0]).strip(), row[1], row[3], shifts=row[2], end=end_val, weekdays=weekdays)
+    return exceptions
+
+def load_rehab_layout(wb, headers, shift_values):
+    """補位院區取自 Sheet 1 表頭 (X院_醫師)；固定院區取自「5_院區設定」，沒有這張表時沿用預設"""
+    fill = header_locations(headers, '院_醫師')
+    configured = read_layout_sheet(wb)
+    fixed = FIXED_LOCATIONS if configured is None else configured[0]
+    if configured is not None:
+        missing = [loc for loc in configured[1] if loc not in fill]
+        if missing: raise ValueError(f"補位院區 {missing} 在「1_行事曆與醫師」缺少「院_醫師」欄")
+    return SiteLayout(ordered_shifts(shift_values, REHAB_PROFILE['shifts']), fixed + fill, fill)
+
+def load_rehab_inputs(engine, input_file):
+    wb = openpyxl.load_workbook(input_file, read_only=True, data_only=True)  # 串流讀取，不建立整本的 cell 物件
+    ws1 = wb['1_行事曆與醫師']
+    rows = ws1.iter_rows(values_only=True)
+    headers = list(next(rows, ()))
+    col = {h: i for i, h in enumerate(headers) if h}
+    rows = [row for row in rows if row and row[0]]
+    engine.layout = layout = load_rehab_layout(wb, headers, [row[col['時段']] for row in rows])
+    # 每個補位院區的 (醫師欄, PT 需求欄, OT 需求欄)
+    loc_cols = [(loc, col[f'{loc}院_醫師'], col.get(f'{loc}_PT需求'), col.get(f'{loc}_OT需求')) for loc in layout.fill_locations]
+    shifts = {}
+    for row in rows:
+        date_val, shift, status = row[col['日期']], str(row[col['時段']]).strip().upper(), row[col['營業狀態']]
+        if status == '休診': continue
+        d_str = date_val.strftime('%Y/%m/%d') if isinstance(date_val, datetime) else str(date_val).split(' ')[0]
+        shifts.setdefault(d_str, set()).add(shift)
+        for loc, c_doc, c_pt, c_ot in loc_cols:
+            engine.doctors[(d_str, shift, loc)] = row[c_doc]
+            engine.requirements[(d_str, shift, loc)] = {ROLE_PT: (row[c_pt] if c_pt is not None else 0) or 0,
+                                                        ROLE_OT: (row[c_ot] if c_ot is not None else 0) or 0}
+    engine.dates = sorted(shifts)
+    engine.open_shifts = {d: sorted(s, key=layout.shift_code.get) for d, s in shifts.items()}
+    engine.staff = load_staff_db(wb)
+    engine.exceptions = load_exceptions(wb, layout.all_shifts, engine.profile['exception_shifts'] == 'expand')
+    if CONTROL_SHEET in wb.sheetnames:
+        engine.rest_config = read_rest_settings(wb[CONTROL_SHEET].iter_rows(min_row=2, values_only=True))
+        engine.pair_goal = read_pair_goal(wb[CONTROL_SHEET].iter_rows(min_row=2, values_only=True), engine.pair_goal)
+    if PAIR_SHEET in wb.sheetnames: engine.pairs.seed(wb[PAIR_SHEET].iter_rows(min_row=2, values_only=True))
+    wb.close()
+
+def load_rehab_payload(engine, payload):
+    # JSON 版 (engine.payload)：補位院區取自 calendar 的 sites，固定院區取自 fixed_locations
+    # 結構檢查 (check_payload) 已在 engine.api 入口做過一次，這裡不重複
+    rows = calendar_rows(payload)
+    fill = list(dict.fromkeys(loc for *_, sites, _ in rows for loc in sites))
+    fixed = [loc for loc in (payload.get('fixed_locations') or FIXED_LOCATIONS) if loc not in fill]
+    engine.layout = layout = SiteLayout(ordered_shifts([s for _, s, *_ in rows], REHAB_PROFILE['shifts']), fixed + fill, fill)
+    shifts = {}
+    for d_str, shift, sites, is_open in rows:
+        if not is_open: continue
+        shifts.setdefault(d_str, set()).add(shift)
+        for loc in fill:
+            site = sites.get(loc) or {}
+            engine.doctors[(d_str, shift, loc)] = site.get('doctor')
+            engine.requirements[(d_str, shift, loc)] = {ROLE_PT: site.get('PT') or 0, ROLE_OT: site.get('OT') or 0}
+    engine.dates = sorted(shifts)
+    engine.open_shifts = {d: sorted(s, key=layout.shift_code.get) for d, s in shifts.items()}
+    engine.staff = load_payload_staff(payload)
+    engine.exceptions = load_payload_exceptions(payload, layout.all_shifts, engine.profile['exception_shifts'] == 'expand')
+    engine.rest_config = rest_config(payload.get('rest'))
+    load_payload_pairs(engine, payload)
+
+# 上傳檢查：人員設定 / 例外請假在載入時依欄位位置讀取，表頭必須在原位置
+REHAB_SCHEMA = {
+    '1_行事曆與醫師': {'columns': ['日期', '時段', '營業狀態'], 'header_suffix': '院_醫師', 'max_rows': 5000,
+                  'types': {'日期': 'date', '時段': 'shift', '*_PT需求': 'number', '*_OT需求': 'number'}},
+    '2_人員設定': {'columns': ['序號', '姓名', '員工編號', '身分 (下拉)', '職能 (下拉)', '本月目標診數', '備註',
+                          '週一 (固定/可排)', '週二 (固定/可排)', '週三 (固定/可排)', '週四 (固定/可排)', '週五 (固定/可排)'],
+               'positional': True, 'max_rows': 1000, 'types': {'本月目標診數': 'number'}},
+    '3_例外請假': {'columns': ['姓名', '日期 (YYYY/MM/DD)', '時段', '類型 (下拉)'], 'positional': True, 'max_rows': 10000,
+               'types': {'日期 (YYYY/MM/DD)': 'date', '時段': 'shifts', '結束日期 (選填)': 'date'}},
+}
+
+# 瀑布流：固定班 (A甲) 先排入，補位院區 (預設丁/戊) 依序補 OT 需求 -> PT 補滿總數 -> FT 的 OT 跨界支援
+# shifts / locations 為預設值，實際配置由輸入表讀取 (engine.layout)
+REHAB_PROFILE = {
+    'name': '復健部',
+    'loader': load_rehab_inputs,
+    'schema': REHAB_SCHEMA,
+    'shifts': ['A', 'B', 'C'],
+    'locations': ALL_LOCATIONS,
+    'fill_locations': DYNAMIC_LOCATIONS,
+    'fixed_from_rules': True,
+    'max_per_day': 2,
+    'pair_goal': None,                  # 醫師搭配預設不考慮 (與 V7.3 相同)；全域控制台可改為輪替 / 延續 (groups 的 'pair' 為權重)
+    'exception_priority': 'latest',     # 同一時段多筆例外，以表中較後面的列為準
+    'exception_shifts': 'exact',        # 例外時段需為單一時段 (空白 / AB 不生效，與 V7.3 相同)；'expand' 改為空白 = 整天、AB = A+B
+    'on_kinds': ('ON',),
+    'ft_rule_restricts': False,         # FT 的規則是固定班，不限制可排時段
+    'pool_scope': 'step',               # 每個補位步驟依當下診數重新排序
+    'groups': [
+        {'key': 'all', 'match': {}, 'weights': {'type': {'FT': 1000}, 'assigned': -10, 'pair': -1}},
+    ],
+    'fill_steps': [
+        {'need': 'role', 'role': ROLE_OT, 'label': '補 OT 需求'},
+        {'need': 'total', 'role': ROLE_PT, 'label': 'PT 補滿總數'},
+        {'need': 'total', 'role': ROLE_OT, 'accept_type': 'FT', 'label': 'OT 跨界支援'},
+    ],
+    'theme': {
+        'header_fill': 'E2EFDA', 'loc_fill': 'D9E1F2', 'weekday_row': True, 'edit_validation': True,
+        'sort_staff_by_id': True, 'pt_target': '-', 'pt_status': 'PT總診數: ',
+        'raw_dates': 'str',
+    },
+    'erp_theme': {'header_fill': 'C6E0B4', 'id_fill': 'E2EFDA', 'thick_block_border': True, 'name_width': 15},
+}
+
+# JSON 請求 (engine.api) 不經 xlsx：換掉 loader，不做上傳檔檢查
+REHAB_PAYLOAD_PROFILE = dict(REHAB_PROFILE, loader=load_rehab_payload, schema=None)
+
+def run_scheduler_bytes(input_file, raw_out=None, live_total=False, progress=None, trace=False):
+    # raw_out: 傳入 dict 時，另外輸出欄式底稿 {'csv': BytesIO, 'parquet': BytesIO}
+    # live_total: 儀表板「實際」欄保留公式 (手動改班後即時更新)，其餘統計一律寫數值
+    # progress: 進度回報 progress(stage, fraction)，stage 為 load / fixed / fill / write
+    # trace: 記錄排班決策 (每個補位的候選分數與未列入原因)；有 raw_out 時另外放入 raw_out['trace'] (CSV)
+    if progress: progress('load')
+    engine = ScheduleEngine(REHAB_PROFILE, input_file, live_total=live_total, trace=trace)
+    success, msg = engine.load_data()
+    if not success: return None, f"❌ 無法讀取 Excel 檔案，請確認格式正確。({msg})"
+    save_roster('rehab', roster_rows(engine.staff, 5))  # 下個月的模板預填這份名單
+    output = engine.run(raw_formats=('csv', 'parquet') if raw_out is not None else (), progress=progress)
+    if raw_out is not None:
+        raw_out.update(engine.raw_files)
+        if engine.trace is not None: raw_out[TRACE_KEY] = engine.trace.to_csv()
+    return output, "排班成功！儀表板已生成。"
+
+def schedule_job(input_file, progress=None, live_total=False, trace=False):
+    """背景工作用：結果轉成 bytes，多位協調人員共用同一份結果時不會互相移動讀取位置"""
+    raw_files = {}
+    output, msg = run_scheduler_bytes(input_file, raw_out=raw_files, live_total=live_total, progress=progress, trace=trace)
+    return (output.getvalue() if output else None), {k: v.getvalue() for k, v in raw_files.items()}, msg
+
+def run_scheduler_chunked(input_file, out_path=None, chunk='month', progress=None):
+    # 整年 / 多院區：逐月 (或逐週) 排班並直接寫到磁碟，回傳 (檔案路徑, 訊息)
+    if progress: progress('load')
+    engine = ScheduleEngine(REHAB_PROFILE, input_file)
+    success, msg = engine.load_data()
+    if not success: return None, f"❌ 無法讀取 Excel 檔案，請確認格式正確。({msg})"
+    save_roster('rehab', roster_rows(engine.staff, 5))
+    path = run_chunked(engine, out_path, chunk, progress=progress)
+    return path, f"分段排班成功！共 {len(engine.dates)} 天，每{'月' if chunk == 'month' else '週'}一張排班表。"
+
+def chunked_schedule_job(input_file, progress=None, chunk='month'):
+    path, msg = run_scheduler_chunked(input_file, chunk=chunk, progress=progress)
+    return (ResultFile(path) if path else None), {}, msg
+
+def rehab_risk_report(input_file, result_file=None, n_scenarios=10000, absence_rate=0.05, seed=None):
+    # result_file 可傳入已排好 (含手動修改) 的結果；未傳入時依輸入表重新排班後模擬
+    return risk_report(ScheduleEngine(REHAB_PROFILE, input_file), input_file, result_file, n_scenarios, absence_rate, seed)
+
+# ==========================================
+# 🔁 匯入手動修改 (互動排班表 -> 底稿)
+# ==========================================
+def rehab_availability(input_file):
+    """由原始輸入表建立可排性檢查：例外請假 OFF、PT 只能排固定/可排時段或 ON"""
+    engine = ScheduleEngine(REHAB_PROFILE, input_file)
+    success, msg = engine.load_data()
+    if not success: raise ValueError(msg)
+    return engine.unavailable_reason
+
+def import_edited_dashboard(result_file, input_file=None):
+    try:
+        availability = rehab_availability(input_file) if input_file is not None else None
+    except:
+        return None, "❌ 無法讀取輸入表，請確認上傳的是 Step 1 的檔案。"
+    try:
+        records, changes, issues = import_dashboard(result_file, availability, max_per_day=REHAB_PROFILE['max_per_day'])
+    except Exception as e:
+        return None, f"❌ 匯入失敗: {e}"
+    return (records, changes, issues), f"已讀取 {len(changes)} 筆修改，{len(issues)} 筆需要確認。"
+
+# ==========================================
+# ⚙️ 第三部分：ERP 轉檔邏輯 (V10)
+# ==========================================
+def convert_erp_bytes(input_file):
+    # 接受排班結果 xlsx，或排班時一併輸出的 CSV / Parquet 底稿
+    try:
+        df_raw = read_raw_table(input_file)
+    except UploadError as e:
+        return None, f"❌ {e}"
+    except:
+        return None, "❌ 找不到「原始運算底稿」，請確認上傳的是排班結果檔。"
+    
+    if '員工編號' not in df_raw.columns: return None, "❌ 底稿中缺少「員工編號」，請重新執行排班。"
+    return build_erp_workbook(df_raw, REHAB_PROFILE['erp_theme'], REHAB_PROFILE['shifts']), "ERP 轉檔成功！"
+
+def convert_erp_delta(input_file, previous_file):
+    # 只輸出與上一版 (ERP 導入檔 / 排班結果 / 底稿) 相比有異動的員工；回傳 ((BytesIO, 異動明細), 訊息)
+    try:
+        df_raw = read_raw_table(input_file)
+    except UploadError as e:
+        return None, f"❌ {e}"
+    except:
+        return None, "❌ 找不到「原始運算底稿」，請確認上傳的是排班結果檔。"
+    if '員工編號' not in df_raw.columns: return None, "❌ 底稿中缺少「員工編號」，請重新執行排班。"
+    try:
+        output, changes = build_erp_delta(df_raw, previous_file, REHAB_PROFILE['erp_theme'], REHAB_PROFILE['shifts'])
+    except Exception as e:
+        return None, f"❌ 無法讀取上一版檔案: {e}"
+    if changes.empty: return None, "ℹ️ 與上一版相同，沒有需要重新導入的員工。"
+    return (output, changes), f"ERP 異動轉檔成功！共 {len(changes)} 位員工有異動。"
@@ -0,0 +1,151 @@
+from collections import Counter
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+
+from engine.raw_io import RAW_COLUMNS, RAW_MAX_ROWS, RAW_SHEET
+from engine.validate import validate_workbook
+
+# ==========================================
+# 🔁 匯入手動修改後的互動排班表 (只讀矩陣區，只驗證有變動的格子)
+# ==========================================
+DASH_SHEET = '互動排班表'
+LAYOUT_COL_SHEET = '矩陣欄位'   # 隱藏頁：欄號 -> (日期, 時段, 地點)
+LAYOUT_ROW_SHEET = '矩陣人員'   # 隱藏頁：列號 -> (姓名, 員工編號)
+MATRIX_START_ROW = 7
+MATRIX_START_COL = 13
+# 互動排班表的表頭在第 6 列，這裡只要求工作表存在；底稿與配置頁檢查表頭
+DASHBOARD_SCHEMA = {
+    DASH_SHEET: {'columns': []},
+    RAW_SHEET: {'columns': RAW_COLUMNS, 'max_rows': RAW_MAX_ROWS},
+    LAYOUT_COL_SHEET: {'columns': ['欄', '日期', '時段', '地點'], 'optional': True},
+    LAYOUT_ROW_SHEET: {'columns': ['列', '姓名', '員工編號'], 'optional': True},
+}
+
+
+def _d_str(val):
+    if isinstance(val, datetime): return val.strftime('%Y/%m/%d')
+    return str(val).split(' ')[0].replace('-', '/')
+
+
+def write_matrix_layout(wb, col_map, row_map, staff_ids):
+    """排班時一併寫入矩陣配置，匯入時不必解析合併儲存格或猜年份"""
+    ws_c = wb.create_sheet(LAYOUT_COL_SHEET); ws_c.sheet_state = 'hidden'
+    ws_c.append(['欄', '日期', '時段', '地點'])
+    for (d, shift, loc), c in sorted(col_map.items(), key=lambda kv: kv[1]):
+        ws_c.append([c, _d_str(d), shift, loc])
+    ws_r = wb.create_sheet(LAYOUT_ROW_SHEET); ws_r.sheet_state = 'hidden'
+    ws_r.append(['列', '姓名', '員工編號'])
+    for name, r in sorted(row_map.items(), key=lambda kv: kv[1]):
+        ws_r.append([r, name, staff_ids.get(name, 'NO_ID')])
+
+
+def _read_raw(wb):
+    cells = set(); ids = {}
+    rows = wb[RAW_SHEET].iter_rows(values_only=True)
+    header = next(rows, None)
+    if not header: return cells, ids
+    pos = {h: i for i, h in enumerate(header)}
+    if any(h not in pos for h in RAW_COLUMNS): raise ValueError("底稿欄位不完整")
+    for row in rows:
+        if row[pos['姓名']] is None: continue
+        name = str(row[pos['姓名']]).strip()
+        cells.add((name, _d_str(row[pos['日期']]), str(row[pos['時段']]), str(row[pos['地點']])))
+        eid = row[pos['員工編號']]
+        if eid not in (None, '', 'nan'): ids[name] = str(eid).strip()
+    return cells, ids
+
+
+def _infer_layout(ws, raw_cells):
+    """舊版結果檔沒有配置頁：由第 3/5/6 列表頭推回欄位，年份取自底稿"""
+    years = sorted({d[:4] for _, d, _, _ in raw_cells})
+    if not years: raise ValueError("舊版結果檔且底稿為空，無法判斷年份")
+    col_map = {}; cur_date = None
+    hdr = list(ws.iter_rows(min_row=3, max_row=6, min_col=MATRIX_START_COL, values_only=True))
+    for i, (d_val, shift, loc) in enumerate(zip(hdr[0], hdr[2], hdr[3])):
+        if d_val: cur_date = f"{years[0]}/{d_val}" if isinstance(d_val, str) else _d_str(d_val)
+        if cur_date and shift and loc: col_map[MATRIX_START_COL + i] = (cur_date, str(shift), str(loc))
+    return col_map
+
+
+def read_dashboard(input_file):
+    """
+    回傳 (edited, original, ids, column)：
+    edited / original 為 {(姓名, 日期, 時段, 地點)} 集合，ids 為 姓名 -> 員工編號，
+    column(cell) 為該格在矩陣上的欄號，沒畫在矩陣上回傳 None (矩陣外的底稿紀錄原樣保留)
+    """
+    validate_workbook(input_file, DASHBOARD_SCHEMA)  # 大小、工作表與表頭；不符拋出 UploadError
+    wb = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+    original, ids = _read_raw(wb)
+    ws = wb[DASH_SHEET]
+
+    if LAYOUT_COL_SHEET in wb.sheetnames:
+        col_map = {int(c): (_d_str(d), str(s), str(l))
+                   for c, d, s, l in wb[LAYOUT_COL_SHEET].iter_rows(min_row=2, values_only=True) if c}
+        for r, name, eid in wb[LAYOUT_ROW_SHEET].iter_rows(min_row=2, values_only=True):
+            if name and eid not in (None, '', 'NO_ID'): ids.setdefault(str(name), str(eid))
+    else:
+        col_map = _infer_layout(ws, original)
+
+    edited = set(); names = set()
+    if col_map:
+        max_col = max(col_map)
+        for row in ws.iter_rows(min_row=MATRIX_START_ROW, max_col=max_col, values_only=True):
+            if not row or row[0] is None: continue
+            name = str(row[0]).strip()
+            names.add(name)
+            for j in range(MATRIX_START_COL - 1, len(row)):
+                v = row[j]
+                if v is not None and str(v).strip().upper() == 'V' and (j + 1) in col_map:
+                    edited.add((name, *col_map[j + 1]))
+    wb.close()
+    columns = {slot: c for c, slot in col_map.items()}
+    return edited, original, ids, lambda cell: columns.get(cell[1:]) if cell[0] in names else None
+
+
+def validate_changes(added, edited, availability=None, max_per_day=2):
+    """
+    只檢查新增的格子：同時段重複、單日診數上限、可排性。
+    availability(name, d_str, shift) 回傳 None 表示可排，否則回傳原因字串。
+    """
+    touched = {(n, d) for n, d, _, _ in added}
+    day_load = Counter(); shift_load = Counter()
+    for n, d, s, _ in edited:
+        if (n, d) in touched:
+            day_load[(n, d)] += 1; shift_load[(n, d, s)] += 1
+    issues = []
+    for n, d, s, l in sorted(added):
+        reasons = []
+        if shift_load[(n, d, s)] > 1: reasons.append("同時段重複排班")
+        if max_per_day and day_load[(n, d)] > max_per_day: reasons.append(f"單日超過 {max_per_day} 診")
+        if availability:
+            why = availability(n, d, s)
+            if why: reasons.append(why)
+        if reasons: issues.append({'姓名': n, '日期': d, '時段': s, '地點': l, '問題': '、'.join(reasons)})
+    return pd.DataFrame(issues, columns=['姓名', '日期', '時段', '地點', '問題'])
+
+
+def _record_order(cell, column):
+    """底稿順序同排班輸出：日期，再依矩陣欄 (即配置的 時段 × 地點 順序)；矩陣外的紀錄排在當天最後"""
+    c = column(cell)
+    return (cell[1], c is None, c or 0, cell[2], cell[3], cell[0])
+
+
+def import_dashboard(input_file, availability=None, max_per_day=2):
+    """
+    回傳 (records, changes, issues)：
+    records 為修改後的底稿紀錄 (可直接交給 export_raw_files / ERP 轉檔)，
+    changes 為差異清單，issues 為新增格子的驗證問題。
+    """
+    edited, original, ids, column = read_dashboard(input_file)
+    outside = {c for c in original if column(c) is None}
+    added = edited - original; removed = original - edited - outside
+    edited |= outside
+    issues = validate_changes(added, edited, availability, max_per_day)
+
+    changes = [{'姓名': n, '日期': d, '時段': s, '地點': l, '變更': '新增'} for n, d, s, l in sorted(added)]
+    changes += [{'姓名': n, '日期': d, '時段': s, '地點': l, '變更': '移除'} for n, d, s, l in sorted(removed)]
+    records = [{'日期': d, '時段': s, '地點': l, '姓名': n, '員工編號': ids.get(n, 'NO_ID')}
+               for n, d, s, l in sorted(edited, key=lambda c: _record_order(c, column))]
+    return records, pd.DataFrame(changes, columns=['姓名', '日期', '時段', '地點', '變更']), issues
@@ -0,0 +1,97 @@
+import pandas as pd
+
+# ==========================================
+# 😴 休息規則：滾動 N 日上限、連續上班天數、晚班接早班
+# ==========================================
+# 設定來自「0_全域控制台」(項目 / 數值) 或 JSON 請求的 "rest"；空白 = 不限制
+CONTROL_SHEET = '0_全域控制台'
+TURNAROUND_ITEM = '禁止晚接早 (C→A)'
+REST_ITEMS = {
+    '7天內最多診數': 'max_per_window',
+    '最多連續上班天數': 'max_consecutive',
+    TURNAROUND_ITEM: 'no_turnaround',
+}
+REST_TEMPLATE_ROWS = [
+    ['7天內最多診數', None, '任意連續 7 天的診數上限 (空白 = 不限)'],
+    ['最多連續上班天數', None, '有排班的連續天數上限 (空白 = 不限)'],
+    [TURNAROUND_ITEM, '否', '是：C 班隔天不排 A 班'],
+]
+WINDOW_DAYS = 7
+TURNAROUND = ('C', 'A')
+
+
+def _number(val):
+    if val is None or (isinstance(val, float) and pd.isna(val)) or isinstance(val, bool): return None
+    try:
+        n = int(float(val))
+    except (TypeError, ValueError):
+        return None
+    return n if n > 0 else None
+
+
+def read_rest_settings(rows):
+    """(項目, 數值, ...) 列 -> {'max_per_window', 'max_consecutive', 'no_turnaround'}；沒有任何限制回傳 None"""
+    cfg = {}
+    for row in rows:
+        if not row or row[0] is None: continue
+        key = REST_ITEMS.get(str(row[0]).strip())
+        if key is None or len(row) < 2: continue
+        cfg[key] = str(row[1]).strip() in ('是', 'Y', 'YES', 'TRUE', '1') if key == 'no_turnaround' else _number(row[1])
+    return rest_config(cfg)
+
+
+def rest_config(cfg):
+    """整理設定 (JSON 亦用)：全部為空時回傳 None，引擎就完全不做休息檢查"""
+    if not cfg: return None
+    out = {'max_per_window': _number(cfg.get('max_per_window')), 'window_days': _number(cfg.get('window_days')) or WINDOW_DAYS,
+           'max_consecutive': _number(cfg.get('max_consecutive')), 'no_turnaround': bool(cfg.get('no_turnaround'))}
+    return out if out['max_per_window'] or out['max_consecutive'] or out['no_turnaround'] else None
+
+
+class RestIndex:
+    """
+    每人增量維護的休息計數，日期以日序數表示；檢查與登記都是常數時間：
+    - window[(人, s)] = 以 s 為起點的 N 日內診數；排在 d 只影響 s ∈ [d-N+1, d] 這 N 個視窗
+    - 連續上班以「段」表示，段長只記在兩端；排在 d 時接上 d-1 結尾、d+1 開頭的段
+    - 晚接早只看前一天 / 後一天同一人的時段
+    """
+
+    def __init__(self, max_per_window=None, window_days=WINDOW_DAYS, max_consecutive=None, no_turnaround=False):
+        self.max_per_window = max_per_window
+        self.window_days = window_days
+        self.max_consecutive = max_consecutive
+        self.turnaround = TURNAROUND if no_turnaround else None
+        self._window = {}   # (人, 起始日) -> 診數
+        self._run = {}      # (人, 日) -> 所在連續段長度 (只保證段的兩端正確)
+        self._shifts = {}   # (人, 日) -> 當天已排時段字串
+
+    def violation(self, key, day, shift):
+        """可排回傳 None，否則回傳原因"""
+        if self.max_per_window:
+            n = self.window_days
+            worst = max(self._window.get((key, s), 0) for s in range(day - n + 1, day + 1))
+            if worst >= self.max_per_window: return f"{n}天內已排 {self.max_per_window} 診"
+        if self.max_consecutive and (key, day) not in self._shifts:
+            run = self._run.get((key, day - 1), 0) + 1 + self._run.get((key, day + 1), 0)
+            if run > self.max_consecutive: return f"連續上班超過 {self.max_consecutive} 天"
+        if self.turnaround:
+            late, early = self.turnaround
+            if shift == early and late in self._shifts.get((key, day - 1), ''): return f"前一天 {late} 班，不接 {early} 班"
+            if shift == late and early in self._shifts.get((key, day + 1), ''): return f"隔天 {early} 班，不排 {late} 班"
+        return None
+
+    def add(self, key, day, shift):
+        for s in range(day - self.window_days + 1, day + 1):
+            self._window[(key, s)] = self._window.get((key, s), 0) + 1
+        if (key, day) not in self._shifts:
+            left = self._run.get((key, day - 1), 0); right = self._run.get((key, day + 1), 0)
+            total = left + 1 + right
+            self._run[(key, day - left)] = self._run[(key, day + right)] = self._run[(key, day)] = total
+        self._shifts[(key, day)] = self._shifts.get((key, day), '') + shift
+
+    def forget(self, before):
+        """分段輸出用：丟掉 before 之前、已不會再被查到的日期"""
+        keep = before - self.window_days
+        self._window = {k: v for k, v in self._window.items() if k[1] >= keep}
+        self._run = {k: v for k, v in self._run.items() if k[1] >= keep}
+        self._shifts = {k: v for k, v in self._shifts.items() if k[1] >= keep}
@@ -0,0 +1,114 @@
+import io
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+from engine.raw_io import read_raw_table
+
+# ==========================================
+# 🎲 缺勤風險模擬：批次抽樣缺勤情境，逐 (日期, 時段, 地點) 檢查人力
+# ==========================================
+RATE_SHEET = '6_歷史缺勤率'
+RISK_COLUMNS = ['日期', '時段', '地點', '需求', '排定', '缺人機率', '平均缺口']
+CELL_BUDGET = 1_000_000   # 每批 情境數 × 指派數 的上限，整年輸入時自動縮小批次
+
+
+def read_absence_rates(input_file):
+    """輸入表選填的「6_歷史缺勤率」(姓名 / 缺勤率 0~1)；沒有這張表回傳 {}"""
+    if hasattr(input_file, 'seek'): input_file.seek(0)
+    wb = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+    rates = {}
+    if RATE_SHEET in wb.sheetnames:
+        for row in wb[RATE_SHEET].iter_rows(min_row=2, values_only=True):
+            if not row or not row[0] or not isinstance(row[1], (int, float)): continue
+            rate = float(row[1])
+            rates[str(row[0]).strip()] = rate / 100 if rate > 1 else rate  # 也接受百分比 (5 = 5%)
+    wb.close()
+    return rates
+
+
+def load_scheduled_month(engine, result_file):
+    """以排班結果 (xlsx / CSV / Parquet 底稿，可含手動修改) 取代引擎自己的排班結果"""
+    df = read_raw_table(result_file)
+    engine.prepare()
+    dates = pd.to_datetime(df['日期']).dt.strftime('%Y/%m/%d')
+    layout = engine.layout
+    for d_str, shift, loc, name, emp_id in zip(dates, df['時段'].astype(str), df['地點'].astype(str), df['姓名'].astype(str), df['員工編號']):
+        if d_str not in engine.schedule or shift not in layout.shift_code or loc not in layout.loc_code: continue
+        engine.schedule[d_str].setdefault(layout.slot(shift, loc), []).append({'name': name, 'id': emp_id})
+
+
+def simulate_staffing_risk(engine, n_scenarios=10000, absence_rate=0.05, rates=None, seed=None, batch=2000):
+    """
+    engine 需已排好班 (solve() 或 load_scheduled_month)。
+    每個情境中，每人每天以其缺勤率獨立抽樣是否請假 (請假即當天所有時段都缺)；
+    需求為各 slot 需求總數 (復健部 PT+OT、護理部依醫師人力規則)。
+    回傳每個 slot 一列的 DataFrame，依缺人機率由高到低排序。
+    """
+    rates = rates or {}
+    slot_rows, cells = [], []  # cells: (slot 序號, 人-天 key)
+    for d_str, slots in engine.active_slots().items():
+        for slot in slots:
+            shift, loc = engine.layout.decode(slot)
+            workers = engine.schedule[d_str].get(slot, [])
+            need = int(sum(engine.requirements.get((d_str, shift, loc), {}).values()))
+            for w in workers: cells.append((len(slot_rows), (w['name'], d_str)))
+            slot_rows.append((d_str, shift, loc, need, len(workers)))
+    if not slot_rows: return pd.DataFrame(columns=RISK_COLUMNS)
+
+    person_days = list(dict.fromkeys(key for _, key in cells))
+    pd_index = {key: i for i, key in enumerate(person_days)}
+    p = np.array([rates.get(name, absence_rate) for name, _ in person_days], dtype=np.float32)
+    # 只存實際的 (人-天, slot) 指派對 (稀疏)；整年多院區時稠密的 人-天 × slot 矩陣會到數百 MB
+    cell_pd = np.array([pd_index[key] for _, key in cells], dtype=np.int64)
+    cell_slot = np.array([s_idx for s_idx, _ in cells], dtype=np.int64)
+    n_slots = len(slot_rows)
+    need = np.array([r[3] for r in slot_rows], dtype=np.float32)
+    staffed = np.array([r[4] for r in slot_rows], dtype=np.float32)
+    batch = max(1, min(batch, CELL_BUDGET // max(len(cells), 1)))
+
+    rng = np.random.default_rng(seed)
+    short_hits = np.zeros(n_slots, dtype=np.int64); gap_sum = np.zeros(n_slots, dtype=np.float64)
+    for start in range(0, n_scenarios, batch):
+        b = min(batch, n_scenarios - start)
+        absent = rng.random((b, len(person_days)), dtype=np.float32) < p
+        # 每個情境每個 slot 少了幾人：依 (情境, slot) 攤平後一次 bincount
+        flat = (np.arange(b, dtype=np.int64)[:, None] * n_slots + cell_slot).ravel()
+        lost = np.bincount(flat, weights=absent[:, cell_pd].ravel(), minlength=b * n_slots).reshape(b, n_slots)
+        gap = np.maximum(need - (staffed - lost), 0)
+        short_hits += (gap > 0).sum(axis=0); gap_sum += gap.sum(axis=0)
+
+    df = pd.DataFrame(slot_rows, columns=RISK_COLUMNS[:5])
+    df['缺人機率'] = (short_hits / max(n_scenarios, 1)).round(4)
+    df['平均缺口'] = (gap_sum / max(n_scenarios, 1)).round(3)
+    return df.sort_values(['缺人機率', '平均缺口'], ascending=False, kind='stable').reset_index(drop=True)
+
+
+def risk_report(engine, input_file, result_file=None, n_scenarios=10000, absence_rate=0.05, seed=None):
+    """讀取輸入表 -> 排班 (或讀入已排好的結果) -> 模擬；回傳 (xlsx BytesIO, 風險表, 訊息)"""
+    success, msg = engine.load_data()
+    if not success: return None, None, f"❌ 無法讀取輸入表 ({msg})"
+    try:
+        if result_file is not None: load_scheduled_month(engine, result_file)
+        else: engine.solve()
+        rates = read_absence_rates(input_file)
+    except Exception as e:
+        return None, None, f"❌ 模擬失敗: {e}"
+    df = simulate_staffing_risk(engine, n_scenarios, absence_rate, rates, seed)
+
+    theme = engine.profile['theme']
+    wb = Workbook(); ws = wb.active; ws.title = "缺勤風險"
+    for row in dataframe_to_rows(df, index=False, header=True): ws.append(row)
+    fill = PatternFill(start_color=theme['header_fill'], end_color=theme['header_fill'], fill_type='solid')
+    for cell in ws[1]:
+        cell.fill = fill; cell.alignment = Alignment(horizontal='center')
+        if theme.get('header_font'): cell.font = Font(color=theme['header_font'], bold=True)
+    ws.column_dimensions['A'].width = 12
+    ws.freeze_panes = "A2"
+    output = io.BytesIO(); wb.save(output); output.seek(0)
+    risky = int((df['缺人機率'] >= 0.2).sum())
+    return output, df, f"已模擬 {n_scenarios} 種缺勤情境 ({len(rates)} 人使用歷史缺勤率，其餘 {absence_rate:.0%})，{risky} 個時段缺人機率 ≥ 20%"
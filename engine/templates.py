@@ -0,0 +1,143 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from calendar import monthrange
+from datetime import date
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+
+# ==========================================
+# 🗂️ 輸入表模板：write-only 產生、依 (部門, 年, 月, 名單) 快取在磁碟
+# ==========================================
+DATA_DIR = os.environ.get('SCHEDULE_DATA_DIR', os.path.join(os.path.expanduser('~'), '.ian_schedule'))
+CACHE_DIR = os.path.join(DATA_DIR, 'templates')
+TEMPLATE_VERSION = 3   # 模板格式有變動時調高，舊快取自動失效
+MAX_CACHED = 48
+WEEKDAY_CHARS = ['一', '二', '三', '四', '五', '六', '日']
+
+LOCK_STRIPES = 16     # 同一 key 一定落在同一把鎖；鎖的數量固定，不隨快取過的 key 成長
+_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+class TemplateStyle:
+    def __init__(self, header_color):
+        self.font = Font(bold=True, color="FFFFFF")
+        self.fill = PatternFill(start_color=header_color, end_color=header_color, fill_type="solid")
+        self.center = Alignment(horizontal='center', vertical='center')
+
+
+def month_days(year, month):
+    """該月每一天 (date)，取代 pd.date_range"""
+    return [date(year, month, d) for d in range(1, monthrange(year, month)[1] + 1)]
+
+
+def write_sheet(wb, title, headers, rows, style, center=True, validations=()):
+    """write-only 工作表：表頭上色、逐列寫入；validations = [(DataValidation, 範圍)]"""
+    ws = wb.create_sheet(title)
+    header = []
+    for h in headers:
+        cell = WriteOnlyCell(ws, h); cell.font = style.font; cell.fill = style.fill
+        if center: cell.alignment = style.center
+        header.append(cell)
+    ws.append(header)
+    for row in rows: ws.append(row)
+    for dv, sqref in validations:
+        dv.add(sqref); ws.data_validations.append(dv)
+    return ws
+
+
+def value_cell(rows, item, col='B'):
+    """write_sheet 寫入的 (項目, 數值, ...) 列中，該項目的數值儲存格 (表頭佔第 1 列)"""
+    return f"{col}{2 + next(i for i, row in enumerate(rows) if row[0] == item)}"
+
+
+def new_workbook():
+    return Workbook(write_only=True)
+
+
+def save_workbook(wb):
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+# ---------- 名單：最近一次排班用的人員設定 ----------
+def _roster_path(dept):
+    return os.path.join(DATA_DIR, f'roster_{dept}.json')
+
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as fh: fh.write(data)
+    os.replace(tmp, path)
+
+
+def _plain(v):
+    if v is None: return ''
+    if hasattr(v, 'item'): v = v.item()  # numpy 數值
+    if isinstance(v, float): return int(v) if v.is_integer() else v
+    return v if isinstance(v, (int, str)) else str(v)
+
+
+def save_roster(dept, rows):
+    """保存人員設定列 (模板 Sheet 2 的格式)；磁碟無法寫入時略過，不影響排班"""
+    try:
+        _atomic_write(_roster_path(dept), json.dumps([[_plain(v) for v in row] for row in rows], ensure_ascii=False).encode('utf-8'))
+    except OSError:
+        pass
+
+
+def load_roster(dept, default):
+    try:
+        with open(_roster_path(dept), encoding='utf-8') as fh: rows = json.load(fh)
+        return rows or default
+    except (OSError, ValueError):
+        return default
+
+
+def roster_rows(staff, weekdays):
+    """engine.staff -> 模板 Sheet 2 的列：[序號, 姓名, 員工編號, 身分, 職能, 目標, 備註, 各週幾規則...]"""
+    rows = []
+    for i, (name, info) in enumerate(staff.items(), 1):
+        emp_id = '' if info['id'] in ('', 'NO_ID') else info['id']
+        rows.append([i, name, emp_id, info['type'], info['role'], info['target'], ''] + [info['rules'].get(wk, '') for wk in range(weekdays)])
+    return rows
+
+
+# ---------- 磁碟快取 ----------
+def _evict():
+    try:
+        files = [os.path.join(CACHE_DIR, f) for f in os.listdir(CACHE_DIR) if f.endswith('.xlsx')]
+    except OSError:
+        return
+    files.sort(key=lambda p: os.path.getmtime(p), reverse=True)
+    for path in files[MAX_CACHED:]:
+        try: os.remove(path)
+        except OSError: pass
+
+
+def cached_template(dept, year, month, roster, build):
+    """
+    build(year, month, roster) -> xlsx bytes。同一 (部門, 年, 月, 名單) 只產生一次，
+    月初大家同時下載時，後到的請求等第一個產生完直接讀檔；超過 MAX_CACHED 個檔案時刪掉最久沒用的。
+    """
+    key = hashlib.sha256(json.dumps([dept, int(year), int(month), TEMPLATE_VERSION, roster], ensure_ascii=False, default=str).encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f"{dept}_{int(year)}{int(month):02d}_{key}.xlsx")
+    with _locks[int(key, 16) % LOCK_STRIPES]:
+        try:
+            with open(path, 'rb') as fh: data = fh.read()
+            os.utime(path)
+            return io.BytesIO(data)
+        except OSError:
+            pass
+        data = build(int(year), int(month), roster)
+        try:
+            _atomic_write(path, data); _evict()
+        except OSError:
+            pass
+    return io.BytesIO(data)
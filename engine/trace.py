@@ -0,0 +1,63 @@
+import csv
+import io
+from collections import deque
+
+import pandas as pd
+
+# ==========================================
+# 🔍 排班決策紀錄：每個補位保留前 k 名分數與未列入原因 (環形緩衝，讀取時才組字串)
+# ==========================================
+TRACE_KEY = 'trace'   # 排班工作附加檔 (raw_out) 中決策紀錄 CSV 的鍵
+TRACE_COLUMNS = ['日期', '時段', '地點', '步驟', '排入', '候選 (分數)', '未列入原因']
+SAMPLE_K = 3   # 每個未列入原因顯示的姓名數
+
+
+def _reasons(rejected):
+    """[(原因, 姓名)] → 「原因 N 人: 前 SAMPLE_K 個姓名…」"""
+    grouped = {}
+    for reason, name in rejected: grouped.setdefault(reason, []).append(name)
+    return '；'.join(f"{reason} {len(names)} 人: {'、'.join(names[:SAMPLE_K])}{'…' if len(names) > SAMPLE_K else ''}"
+                     for reason, names in grouped.items())
+
+
+class DecisionTrace:
+    """
+    只在開啟時由引擎寫入；紀錄為 tuple，超過 maxlen 時自動丟掉最舊的紀錄。
+    每筆只保留 top_k 名候選；未列入原因是補位迴圈順手 append 的 (原因, 姓名)，單筆最多為該步驟掃過的人數，
+    整體上限為 maxlen 筆。寫入時只存參考，分組、取樣與顯示字串都在 rows() 才做。
+    """
+
+    def __init__(self, maxlen=20000, top_k=5):
+        self.top_k = top_k
+        self._buf = deque(maxlen=maxlen)
+        self.recorded = 0
+
+    @property
+    def dropped(self):
+        return self.recorded - len(self._buf)
+
+    def record(self, d_str, shift, loc, step, picked=(), scored=(), rejected=None):
+        self.recorded += 1
+        self._buf.append((d_str, shift, loc, step, picked, scored[:self.top_k], rejected))
+
+    def __len__(self):
+        return len(self._buf)
+
+    def rows(self):
+        """讀取紀錄時才組出顯示用字串"""
+        for d_str, shift, loc, step, picked, scored, rejected in self._buf:
+            yield [d_str, shift, loc or '', step, '、'.join(picked),
+                   '、'.join(f"{name} ({score:g})" for score, name in scored),
+                   _reasons(rejected or ())]
+
+    def to_frame(self):
+        return pd.DataFrame(list(self.rows()), columns=TRACE_COLUMNS)
+
+    def to_csv(self):
+        """決策紀錄 CSV (BytesIO)；不寫進結果活頁簿，數百列的工作表存檔比排班本身還慢"""
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(TRACE_COLUMNS)
+        writer.writerows(self.rows())
+        if self.dropped: writer.writerow([f"(較早的 {self.dropped} 筆紀錄已超出緩衝上限)"])
+        return io.BytesIO(text.getvalue().encode('utf-8-sig'))  # 加 BOM 讓 Excel 直接開啟時中文不亂碼
@@ -0,0 +1,116 @@
+import os
+from datetime import datetime
+
+import openpyxl
+
+from engine.intervals import to_ordinal
+
+# ==========================================
+# 🛡️ 上傳檢查：先看大小與每張表的表頭 / 前幾列，格式不對立即退回
+# ==========================================
+MAX_UPLOAD_MB = float(os.environ.get('SCHEDULE_MAX_UPLOAD_MB', 10))
+SAMPLE_ROWS = 20   # 每張表只檢查前幾列資料型態
+
+
+class UploadError(ValueError):
+    """上傳檔案不符合格式；訊息可直接顯示給使用者"""
+
+
+def upload_size(input_file):
+    if isinstance(input_file, (str, os.PathLike)): return os.path.getsize(input_file)
+    if hasattr(input_file, 'size') and isinstance(input_file.size, int): return input_file.size  # Streamlit UploadedFile
+    if hasattr(input_file, 'getbuffer'): return input_file.getbuffer().nbytes
+    pos = input_file.tell(); input_file.seek(0, os.SEEK_END); size = input_file.tell(); input_file.seek(pos)
+    return size
+
+
+def check_upload_size(input_file, max_mb=None):
+    max_mb = MAX_UPLOAD_MB if max_mb is None else max_mb
+    size = upload_size(input_file)
+    if size > max_mb * 2**20: raise UploadError(f"檔案 {size / 2**20:.1f} MB 超過上限 {max_mb:g} MB")
+    if size == 0: raise UploadError("檔案是空的")
+
+
+# ---------- 欄位型態檢查 (None 表示空白，一律允許) ----------
+def _is_date(v):
+    return isinstance(v, datetime) or to_ordinal(v) is not None or ('~' in str(v) and all(to_ordinal(p) for p in str(v).split('~', 1)))
+
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+CHECKS = {
+    'date': (_is_date, "不是日期 (YYYY/MM/DD)"),
+    'number': (_is_number, "不是數字"),
+    'shift': (lambda v: len(str(v).strip()) == 1, "時段需為單一字元 (如 A / B / C)"),
+    'shifts': (lambda v: str(v).strip().upper().isalpha(), "時段需為英文字母 (如 A、AB、ABC)"),
+}
+
+
+def _check_sheet(wb, sheet, spec, errors):
+    found = len(errors)   # errors 跨工作表共用，只看本表新增的
+    if sheet not in wb.sheetnames:
+        if not spec.get('optional'): errors.append(f"缺少工作表「{sheet}」")
+        return
+    ws = wb[sheet]
+    rows = ws.iter_rows(values_only=True)
+    header = [str(h).strip() if h is not None else '' for h in next(rows, ())]
+    # positional：載入時依欄位位置讀取的表，必須在原位置；其餘只要求欄名存在
+    if spec.get('positional'):
+        for i, name in enumerate(spec['columns']):
+            if i >= len(header) or header[i] != name:
+                errors.append(f"「{sheet}」第 {i + 1} 欄應為「{name}」，目前是「{header[i] if i < len(header) else '(空白)'}」")
+                break  # 之後的欄通常只是跟著位移，只報第一個
+    else:
+        missing = [c for c in spec['columns'] if c not in header]
+        if missing: errors.append(f"「{sheet}」缺少欄位: {'、'.join(missing)}")
+    if spec.get('header_suffix') and not any(h.endswith(spec['header_suffix']) for h in header):
+        errors.append(f"「{sheet}」至少需要一個「…{spec['header_suffix']}」欄")
+    if len(errors) > found: return
+
+    col = {h: i for i, h in enumerate(header) if h}
+    # '*_PT需求' 表示所有以 _PT需求 結尾的欄
+    types = []
+    for name, kind in spec.get('types', {}).items():
+        names = [h for h in header if h.endswith(name[1:])] if name.startswith('*') else [name]
+        types += [(n, col.get(n), kind) for n in names]
+    max_rows = spec.get('max_rows')
+    # read-only 模式的 max_row 來自 dimension 標記，不必讀完整張表；
+    # 空白但有格式的列也會算進去，所以遠超上限 (4 倍) 才直接退回，其餘逐列計數
+    declared = ws.max_row
+    if max_rows and declared and declared - 1 > max_rows * 4:
+        errors.append(f"「{sheet}」有 {declared - 1} 列，超過上限 {max_rows} 列"); return
+    n = 0
+    for r, row in enumerate(rows, start=2):
+        if not row or all(v is None for v in row): continue
+        n += 1
+        if max_rows and n > max_rows:
+            errors.append(f"「{sheet}」資料超過上限 {max_rows} 列"); return
+        if n > SAMPLE_ROWS: continue
+        for name, i, kind in types:
+            v = row[i] if i is not None and i < len(row) else None
+            if v is None or (isinstance(v, str) and not v.strip()): continue
+            ok, why = CHECKS[kind]
+            if not ok(v): errors.append(f"「{sheet}」第 {r} 列「{name}」{why}: {v}")
+        if len(errors) >= 10: return
+
+
+def validate_workbook(input_file, schema, max_mb=None):
+    """
+    schema: {工作表: {'columns': [...], 'positional': bool, 'types': {欄: 型態}, 'max_rows': n, 'optional': bool}}
+    通過時不回傳；不通過時拋出 UploadError (列出前幾個問題)。檢查完會把檔案位置移回開頭。
+    """
+    check_upload_size(input_file, max_mb)
+    if not isinstance(input_file, (str, os.PathLike)): input_file.seek(0)
+    try:
+        wb = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+    except Exception:
+        raise UploadError("無法開啟，請確認上傳的是 .xlsx 檔")
+    errors = []
+    try:
+        for sheet, spec in schema.items():
+            _check_sheet(wb, sheet, spec, errors)
+            if len(errors) >= 10: break
+    finally:
+        wb.close()
+        if not isinstance(input_file, (str, os.PathLike)): input_file.seek(0)
+    if errors: raise UploadError("；".join(errors[:10]))
@@ -0,0 +1,59 @@
+import streamlit as st
+import time
+
+import pandas as pd
+
+from auth import require_login
+from engine.jobs import get_job_manager
+from engine.joint import joint_schedule_job
+
+# 🚨 登入檢查 (共用 auth.py)：如果沒通過，程式就停在這裡
+require_login()
+
+# ==========================================
+# 👇 只有登入成功後，才會執行下面的程式碼
+# ==========================================
+
+# ==========================================
+# 📱 介面：跨部門聯合排班
+# ==========================================
+st.set_page_config(page_title="晉安毅安跨部門聯合排班", layout="wide", page_icon="🤝")
+
+st.markdown("""
+    <style>
+    .main-title { font-size: 36px; font-weight: bold; color: #375623; text-align: center; margin-bottom: 20px; }
+    .sub-title { font-size: 20px; color: #555; text-align: center; margin-bottom: 30px; }
+    </style>
+    <div class="main-title">🤝 跨部門聯合排班</div>
+    <div class="sub-title">同時上傳復健部與護理部輸入表，同一員工編號不會在同一時段被兩個部門排到</div>
+""", unsafe_allow_html=True)
+
+c1, c2 = st.columns(2)
+with c1: f_rehab = st.file_uploader("復健部輸入表", type=['xlsx'], key='joint_rehab')
+with c2: f_nurse = st.file_uploader("護理部輸入表", type=['xlsx'], key='joint_nurse')
+live_total = st.checkbox("儀表板「實際」欄保留公式 (手動改班後即時更新)", value=False)
+
+jobs = get_job_manager()
+if f_rehab and f_nurse and st.button("⚡ 開始聯合排班", type="primary"):
+    st.session_state.pop('joint_result', None)
+    st.session_state['joint_job'] = jobs.submit('joint', joint_schedule_job, (f_rehab.getvalue(), f_nurse.getvalue()), live_total=live_total)
+
+job_id = st.session_state.get('joint_job')
+if job_id:
+    job = jobs.get(job_id)
+    if job is None: del st.session_state['joint_job']; st.warning("排班工作已過期，請重新執行")
+    elif job.active:
+        st.progress(job.progress, text=f"⏳ {job.label}... ({job.progress:.0%})")
+        time.sleep(0.5); st.rerun()
+    else:
+        del st.session_state['joint_job']
+        st.session_state['joint_result'] = job.result if job.status == 'done' else (None, [], f"❌ {job.message}")
+
+if 'joint_result' in st.session_state:
+    outputs, conflicts, msg = st.session_state['joint_result']
+    if outputs:
+        st.success(msg)
+        st.download_button("📥 下載復健部結果", outputs['rehab'], "【復健部排班結果】聯合排班.xlsx", key='joint_out_rehab')
+        st.download_button("📥 下載護理部結果", outputs['nurse'], "【護理師排班結果】聯合排班.xlsx", key='joint_out_nurse')
+        if conflicts: st.warning("以下固定班與其他部門衝突，已略過："); st.dataframe(pd.DataFrame(conflicts), use_container_width=True)
+    else: st.error(msg)
@@ -0,0 +1,30 @@
+import io
+import os
+import sys
+import tempfile
+
+# 模板快取與名單寫到暫存目錄，不影響正式資料 (需在 import engine 之前設定)
+os.environ.setdefault('SCHEDULE_DATA_DIR', tempfile.mkdtemp(prefix='schedule_tests_'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+import pytest
+
+from engine import nurse, rehab
+
+
+def template_workbook(dept, year=2026, month=3):
+    """部門模板 (預設名單) 的 openpyxl 活頁簿，測試再自行加請假 / 設定"""
+    if dept == 'rehab': data = rehab.build_template(year, month, rehab.REAL_STAFF_DATA)
+    else: data = nurse.build_nurse_template(year, month, nurse.DEFAULT_STAFF)
+    return openpyxl.load_workbook(io.BytesIO(data))
+
+
+def to_bytes(wb):
+    out = io.BytesIO(); wb.save(out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def workbook():
+    return template_workbook
@@ -0,0 +1,74 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from conftest import template_workbook, to_bytes
+from engine import api
+from tools.difftest import workbook_payload
+
+
+@pytest.fixture(scope='module')
+def payload():
+    return workbook_payload('rehab', to_bytes(template_workbook('rehab')))
+
+
+@pytest.fixture(scope='module')
+def server():
+    api.ScheduleAPIHandler.quiet = True
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), api.ScheduleAPIHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown(); httpd.server_close()
+
+
+def _post(url, body):
+    req = urllib.request.Request(url, data=body if isinstance(body, bytes) else json.dumps(body).encode('utf-8'), method='POST')
+    try:
+        with urllib.request.urlopen(req) as resp: return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_schedule_returns_rows(payload):
+    res = api.handle('/schedule', payload)
+    assert res['ok'] and res['columns'] == api.ROW_COLUMNS and res['rows']
+    assert all(len(r) == len(api.ROW_COLUMNS) for r in res['rows'])
+    assert set(res['staff']) == {s['name'] for s in payload['staff']}
+
+
+def test_validate_summarises_without_scheduling(payload):
+    res = api.handle('/validate', payload)
+    assert res['ok'] and res['errors'] == [] and res['summary']['staff'] == len(payload['staff'])
+
+
+def test_bad_payload_lists_errors():
+    res = api.handle('/schedule', {'dept': 'rehab', 'calendar': [{'date': 'x', 'shift': 'AB'}], 'staff': [{'id': 'E1'}]})
+    assert not res['ok'] and len(res['errors']) == 3 and res['msg'] == "❌ 共 3 項錯誤"
+    res = api.handle('/validate', {'dept': 'rehab', 'calendar': [], 'staff': []})
+    assert not res['ok'] and res['errors'] and all(e.startswith('❌') for e in res['errors'])
+    assert not api.handle('/schedule', {'dept': 'xx'})['ok']
+
+
+def test_validate_checks_payload_once(payload, monkeypatch):
+    calls = []
+    check = api.check_payload
+    monkeypatch.setattr(api, 'check_payload', lambda *a: calls.append(1) or check(*a))
+    assert api.handle('/validate', payload)['ok']
+    assert len(calls) == 1
+
+
+def test_http_status_codes(server, payload):
+    status, res = _post(server + '/schedule', payload)
+    assert status == 200 and res['ok']
+    status, res = _post(server + '/schedule', {'dept': 'rehab'})
+    assert status == 400 and not res['ok']
+    status, res = _post(server + '/schedule', b'{not json')
+    assert status == 400 and 'JSON' in res['msg']
+    status, res = _post(server + '/nope', payload)
+    assert status == 404 and not res['ok']
+    status, res = _post(server + '/validate', [payload, {'dept': 'rehab'}])
+    assert status == 200 and [r['ok'] for r in res] == [True, False]
@@ -0,0 +1,37 @@
+import glob
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from engine import nurse
+from engine.core import ScheduleEngine
+from engine.raw_io import RAW_COLUMNS
+from engine.rehab import REHAB_PROFILE
+
+# 輸入表與預期底稿都由 baseline (db25a31，pages/app.py 與 pages/nurseapp.py) 產生：
+# 該版的模板 + 隨機休診 / 需求 / 請假 (含空白與 AB 時段) / 固定班變動，底稿日期統一為 YYYY/MM/DD
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data', 'baseline')
+CASES = sorted(os.path.basename(p)[:-len('_input.xlsx')] for p in glob.glob(os.path.join(DATA_DIR, '*_input.xlsx')))
+
+
+def _input(case):
+    with open(os.path.join(DATA_DIR, f"{case}_input.xlsx"), 'rb') as f: return f.read()
+
+
+def _records(engine):
+    df = pd.DataFrame(engine.records(), columns=RAW_COLUMNS)
+    df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y/%m/%d')
+    return df.astype(str)
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_engine_matches_pre_refactor_raw_table(case):
+    data = io.BytesIO(_input(case))
+    engine = ScheduleEngine(REHAB_PROFILE, data) if case.startswith('rehab') else nurse.ClinicSchedulerNurse(data)
+    success, msg = engine.load_data()
+    assert success, msg
+    engine.solve()
+    expected = pd.read_csv(os.path.join(DATA_DIR, f"{case}_raw.csv"), dtype=str, keep_default_na=False)
+    pd.testing.assert_frame_equal(_records(engine), expected[RAW_COLUMNS])
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+from engine.dashboard import STAT_COLUMNS, compute_staff_stats
+
+DATES = ['2026/03/02', '2026/03/03', '2026/03/04']
+
+
+def _naive(placed, names, dates):
+    """逐人逐天重算，作為向量化版本的對照"""
+    placed = set(placed)
+    out = {}
+    for n in dict.fromkeys(names):
+        mine = [p for p in placed if p[0] == n]
+        days = {}
+        for _, d, s, _ in mine:
+            if s in 'ABC': days.setdefault(d, set()).add(s)
+        row = {'實際': len(mine), 'A數': sum(p[2] == 'A' for p in mine), 'B數': sum(p[2] == 'B' for p in mine), 'C數': sum(p[2] == 'C' for p in mine)}
+        for col, combo in (('AB天', {'A', 'B'}), ('BC天', {'B', 'C'}), ('AC天', {'A', 'C'}), ('ABC天', {'A', 'B', 'C'})):
+            row[col] = sum(v == combo for v in days.values())
+        row['全休'] = len(set(dates)) - len(days)
+        out[n] = row
+    return pd.DataFrame.from_dict(out, orient='index')[list(STAT_COLUMNS)]
+
+
+def test_counts_shifts_patterns_and_days_off():
+    placed = [
+        ('甲', DATES[0], 'A', '晉安'), ('甲', DATES[0], 'B', '晉安'),
+        ('甲', DATES[1], 'A', '晉安'), ('甲', DATES[1], 'B', '毅安'), ('甲', DATES[1], 'C', '晉安'),
+        ('乙', DATES[2], 'C', '毅安'),
+        ('甲', DATES[0], 'A', '晉安'),   # 重複紀錄不重複計算
+        ('丙', DATES[0], 'A', '晉安'),   # 不在儀表板上的人略過
+    ]
+    stats = compute_staff_stats(placed, ['甲', '乙', '丁'], DATES, 'ABC')
+    assert list(stats.columns) == list(STAT_COLUMNS)
+    assert stats.loc['甲'].to_dict() == {'實際': 5, 'A數': 2, 'B數': 2, 'C數': 1, 'AB天': 1, 'BC天': 0, 'AC天': 0, 'ABC天': 1, '全休': 1}
+    assert stats.loc['乙', 'C數'] == 1 and stats.loc['乙', '全休'] == 2
+    assert stats.loc['丁'].sum() == len(DATES)   # 全部為 0，只有全休
+    pd.testing.assert_frame_equal(stats, _naive(placed[:-1], ['甲', '乙', '丁'], DATES), check_dtype=False)
+
+
+def test_matches_naive_on_random_month():
+    import random
+    rng = random.Random(7)
+    names = [f'員{i}' for i in range(12)]
+    dates = [f'2026/03/{d:02d}' for d in range(1, 32)]
+    placed = [(rng.choice(names), rng.choice(dates), rng.choice('ABC'), rng.choice(['晉安', '毅安'])) for _ in range(400)]
+    stats = compute_staff_stats(placed, names, dates, 'ABC')
+    pd.testing.assert_frame_equal(stats, _naive(placed, names, dates), check_dtype=False)
+
+
+def test_empty_inputs():
+    assert compute_staff_stats([], [], DATES, 'ABC').empty
+    stats = compute_staff_stats([], ['甲'], DATES, 'ABC')
+    assert stats.loc['甲', '全休'] == len(DATES) and stats.loc['甲', '實際'] == 0
+
+
+def test_shift_bits_follow_layout():
+    # 配置多一個 D 時段：沒有 D數 欄，但計入實際與上班天數；AB天 不受 D 影響
+    placed = [('甲', DATES[0], 'D', '晉安'), ('甲', DATES[1], 'A', '晉安'), ('甲', DATES[1], 'B', '晉安'), ('甲', DATES[2], 'A', '晉安'), ('甲', DATES[2], 'D', '晉安')]
+    stats = compute_staff_stats(placed, ['甲'], DATES, ['D', 'A', 'B', 'C'])
+    assert stats.loc['甲'].to_dict() == {'實際': 5, 'A數': 2, 'B數': 1, 'C數': 0, 'AB天': 1, 'BC天': 0, 'AC天': 0, 'ABC天': 0, '全休': 0}
+    # 只有 A / B 兩個時段的配置：含 C 的欄位一律為 0
+    stats = compute_staff_stats(placed[1:3], ['甲'], DATES, 'AB')
+    assert stats.loc['甲', 'AB天'] == 1 and stats.loc['甲', 'C數'] == 0 and stats.loc['甲', '全休'] == 2
+
+
+def test_unknown_shift_rejected():
+    with pytest.raises(ValueError, match='D'):
+        compute_staff_stats([('甲', DATES[0], 'D', '晉安')], ['甲'], DATES, 'ABC')
@@ -0,0 +1,62 @@
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import template_workbook, to_bytes
+from tools import difftest
+
+# 差異測試的保證：決策紀錄 / 分段 / JSON 模式與一般排班逐格相同 (輸入表共用 baseline 語料)
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data', 'baseline')
+CASES = sorted(os.path.basename(p)[:-len('_input.xlsx')] for p in glob.glob(os.path.join(DATA_DIR, '*_input.xlsx')))
+
+
+def _input(case):
+    with open(os.path.join(DATA_DIR, f"{case}_input.xlsx"), 'rb') as f: return f.read()
+
+
+@pytest.mark.parametrize('mode', list(difftest.MODES))
+@pytest.mark.parametrize('case', CASES)
+def test_alternative_modes_match_reference(case, mode):
+    dept = case.split('_')[0]
+    ref = difftest.run_reference(dept, _input(case))
+    alt = difftest.MODES[mode](dept, _input(case))
+    assert difftest.compare(ref, alt) == {}
+
+
+def _long_horizon(dept, months, max_consecutive=3):
+    """多個月份的行事曆接成一張輸入表，並開啟連續上班天數與晚接早限制"""
+    wb = template_workbook(dept, month=months[0]); calendar = wb[wb.sheetnames[1]]
+    for month in months[1:]:
+        extra = template_workbook(dept, month=month)
+        for row in extra[extra.sheetnames[1]].iter_rows(min_row=2, values_only=True): calendar.append(row)
+    for row in wb['0_全域控制台'].iter_rows(min_row=2):
+        if row[0].value == '最多連續上班天數': row[1].value = max_consecutive
+        if row[0].value == '禁止晚接早 (C→A)': row[1].value = '是'
+    return to_bytes(wb)
+
+
+def _rest_violations(raw, max_consecutive):
+    """超過連續上班天數，或 C 班隔天排 A 班的 (姓名, 日期)"""
+    days = raw.assign(day=pd.to_datetime(raw['日期']).map(lambda d: d.toordinal()))
+    bad = []
+    for name, g in days.groupby('姓名'):
+        shifts = g.groupby('day')['時段'].agg(set).to_dict()
+        for day in shifts:
+            if all(day - k in shifts for k in range(1, max_consecutive + 1)): bad.append((name, day))
+            if 'C' in shifts.get(day - 1, ()) and 'A' in shifts[day]: bad.append((name, day))
+    return bad
+
+
+@pytest.mark.parametrize('dept', ['rehab', 'nurse'])
+def test_chunked_long_horizon_with_rest_rules(dept):
+    # 休息規則跨越分段邊界 (月底連上、C 班接下個月 1 號的 A 班) 時，分段排班仍需與一次排完相同
+    data = _long_horizon(dept, [3, 4, 5, 6])
+    ref = difftest.run_reference(dept, data)
+    assert pd.to_datetime(ref[0]['日期']).dt.month.nunique() == 4
+    for chunk in ('month', 'week'):
+        alt = difftest.run_chunked(dept, data, chunk)
+        assert difftest.compare(ref, alt) == {}, chunk
+    # 護理部沒有固定規則 (固定規則不受休息限制)，結果應完全符合設定
+    if dept == 'nurse': assert _rest_violations(alt[0], 3) == []
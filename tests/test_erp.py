@@ -0,0 +1,89 @@
+import io
+
+import openpyxl
+import pandas as pd
+
+from engine.erp import ERP_SHEET, MANIFEST_SHEET, build_erp_delta, build_erp_workbook, diff_manifest, erp_manifest, group_by_employee, read_manifest
+from engine.raw_io import RAW_COLUMNS
+
+THEME = {'header_fill': 'C6E0B4', 'id_fill': 'E2EFDA'}
+
+
+def raw(rows):
+    return pd.DataFrame(rows, columns=RAW_COLUMNS)
+
+
+BASE = [
+    ['2026/03/02', 'A', '丁', '甲', 'E01'],
+    ['2026/03/02', 'C', '戊', '甲', 'E01'],
+    ['2026/03/03', 'B', '丁', '乙', 'E02'],
+]
+
+
+def manifest_of(rows):
+    return erp_manifest(group_by_employee(raw(rows))[1])
+
+
+def test_manifest_keeps_days_as_columns():
+    m = manifest_of(BASE)
+    assert m['E01'][0] == '甲'
+    assert m['E01'][2] == {'2026/03/02': ('A,C', '丁,戊')}
+    assert m['E02'][2] == {'2026/03/03': ('B', '丁')}
+
+
+def test_diff_manifest_statuses():
+    old = manifest_of(BASE)
+    new = manifest_of([BASE[0], ['2026/03/04', 'A', '丁', '丙', 'E03']])
+    changed, removed, changes = diff_manifest(old, new)
+    assert changed == ['E01', 'E03']
+    assert removed == {'E02': '乙'}
+    assert changes.set_index('員工編號')['狀態'].to_dict() == {'E01': '修改', 'E02': '移除', 'E03': '新增'}
+    assert changes.set_index('員工編號').loc['E01', '異動日期'] == '03/02'
+    assert diff_manifest(old, old)[2].empty
+
+
+def test_location_names_with_separator_characters():
+    # 舊格式以 'd=shift@loc;…' 串接，院區名稱含這些符號會解析錯誤
+    odd = [['2026/03/02', 'A', '丁;=@', '甲', 'E01']]
+    wb_bytes = build_erp_workbook(raw(odd), THEME).getvalue()
+    m = read_manifest(io.BytesIO(wb_bytes))
+    assert m['E01'][2] == {'2026/03/02': ('A', '丁;=@')}
+    _, changes = build_erp_delta(raw([['2026/03/02', 'A', '丁;=@', '甲', 'E01'], ['2026/03/03', 'A', '戊', '甲', 'E01']]), io.BytesIO(wb_bytes), THEME)
+    assert changes.values.tolist() == [['E01', '甲', '修改', 1, '03/03']]
+
+
+def test_previous_export_without_manifest_sheet_reads_erp_grid():
+    # 本功能之前匯出的 ERP 導入檔只有 ERP 表，沒有指紋頁
+    wb = openpyxl.load_workbook(io.BytesIO(build_erp_workbook(raw(BASE), THEME).getvalue()))
+    del wb[MANIFEST_SHEET]
+    out = io.BytesIO(); wb.save(out)
+    assert wb.sheetnames == [ERP_SHEET]
+    assert read_manifest(io.BytesIO(out.getvalue()), [pd.Timestamp('2026-03-02')]) == manifest_of(BASE)
+    _, changes = build_erp_delta(raw(BASE), io.BytesIO(out.getvalue()), THEME)
+    assert changes.empty
+    _, changes = build_erp_delta(raw(BASE[:1] + BASE[2:]), io.BytesIO(out.getvalue()), THEME)
+    assert changes.values.tolist() == [['E01', '甲', '修改', 1, '03/02']]
+
+
+def test_delta_export_manifest_is_full_baseline():
+    # 異動檔只含有異動的員工區塊，但指紋頁是完整的本版內容
+    first = build_erp_workbook(raw(BASE), THEME)
+    edited = BASE[:1] + [['2026/03/03', 'C', '丁', '乙', 'E02']]
+    delta, changes = build_erp_delta(raw(edited), first, THEME)
+    assert changes['員工編號'].tolist() == ['E01', 'E02']
+    assert read_manifest(io.BytesIO(delta.getvalue())) == manifest_of(edited)
+    assert build_erp_delta(raw(edited), io.BytesIO(delta.getvalue()), THEME)[1].empty
+
+
+def test_raw_table_as_previous():
+    first = raw(BASE)
+    buf = io.BytesIO(first.to_csv(index=False).encode('utf-8-sig')); buf.name = 'prev.csv'
+    assert read_manifest(buf) == manifest_of(BASE)
+
+
+def test_day_order_follows_profile_shifts():
+    rows = [['2026/03/02', 'D', '己', '甲', 'E01'], ['2026/03/02', 'C', '戊', '甲', 'E01'], ['2026/03/02', 'A', '丁', '甲', 'E01']]
+    days = erp_manifest(group_by_employee(raw(rows), 'ABC')[1])['E01'][2]
+    assert days == {'2026/03/02': ('A,C,D', '丁,戊,己')}   # 不在 profile 的時段排最後
+    wb = openpyxl.load_workbook(io.BytesIO(build_erp_workbook(raw(rows), THEME, 'ABC').getvalue()))
+    assert wb[ERP_SHEET].cell(3, 4).value == 'A,\nC,\nD'
@@ -0,0 +1,133 @@
+import io
+
+import pandas as pd
+import pytest
+
+from conftest import template_workbook, to_bytes
+from engine import nurse
+from engine.core import ScheduleEngine
+from engine.intervals import ExceptionIndex, parse_weekdays, to_ordinal
+from engine.rehab import REHAB_PROFILE
+
+
+def test_to_ordinal_accepts_strings_and_datetimes():
+    expected = pd.Timestamp('2026-03-02').toordinal()
+    assert to_ordinal('2026/03/02') == expected
+    assert to_ordinal('2026-03-02 00:00:00') == expected
+    assert to_ordinal(pd.Timestamp('2026-03-02 08:30')) == expected
+    for blank in (None, float('nan'), pd.NaT, '', 'nan', '2026/13/40'):
+        assert to_ordinal(blank) is None
+
+
+def test_parse_weekdays():
+    assert parse_weekdays('一三五') == 0b10101
+    assert parse_weekdays('每週六,日') == 0b1100000
+    assert parse_weekdays(None) == parse_weekdays(float('nan')) == 0b1111111
+
+
+def test_single_day_and_whole_day_default():
+    idx = ExceptionIndex('ABC')
+    idx.add('甲', '2026/03/05', 'OFF')
+    assert [idx.get(('甲', '2026/03/05', s)) for s in 'ABC'] == ['OFF'] * 3
+    assert idx.get(('甲', '2026/03/04', 'A')) is None
+    assert idx.get(('甲', '2026/03/06', 'A')) is None
+
+
+def test_range_in_date_cell_and_end_column():
+    idx = ExceptionIndex('ABC')
+    idx.add('甲', '2026/03/02~2026/03/04', 'OFF', shifts='A')
+    idx.add('乙', '2026/03/10', 'OFF', end='2026/03/08')  # 起迄顛倒也接受
+    assert [idx.get(('甲', f'2026/03/0{d}', 'A')) for d in range(1, 6)] == [None, 'OFF', 'OFF', 'OFF', None]
+    assert idx.get(('甲', '2026/03/03', 'B')) is None
+    assert [idx.get(('乙', f'2026/03/{d:02d}', 'C')) for d in (7, 8, 10, 11)] == [None, 'OFF', 'OFF', None]
+
+
+def test_weekly_recurrence_with_and_without_end():
+    idx = ExceptionIndex('ABC')
+    idx.add('甲', '2026/03/02', 'OFF', shifts='C', weekdays='一三')          # 2026/03/02 是週一，沒有結束日 = 一直重複
+    idx.add('乙', '2026/03/02', 'ON', end='2026/03/15', weekdays='五')
+    assert idx.get(('甲', '2026/03/04', 'C')) == 'OFF'
+    assert idx.get(('甲', '2026/03/05', 'C')) is None
+    assert idx.get(('甲', '2027/01/04', 'C')) == 'OFF'
+    assert idx.get(('甲', '2026/02/23', 'C')) is None                       # 起始日之前不生效
+    assert [idx.get(('乙', d, 'A')) for d in ('2026/03/06', '2026/03/13', '2026/03/20')] == ['ON', 'ON', None]
+
+
+def test_blank_weekday_cell_is_not_recurrence():
+    # pandas 讀到的空白是 NaN，不能當成「每週重複」
+    idx = ExceptionIndex('ABC')
+    idx.add('甲', '2026/03/02', 'OFF', end=float('nan'), weekdays=float('nan'))
+    assert idx.get(('甲', '2026/03/02', 'A')) == 'OFF'
+    assert idx.get(('甲', '2026/03/09', 'A')) is None
+
+
+def test_later_row_wins_and_shifts_by_kind_collects_all():
+    idx = ExceptionIndex('ABC')
+    idx.add('甲', '2026/03/01~2026/03/31', 'OFF')
+    idx.add('甲', '2026/03/10', 'ON', shifts='B')
+    assert idx.get(('甲', '2026/03/10', 'B')) == 'ON'
+    assert idx.get(('甲', '2026/03/10', 'A')) == 'OFF'
+    assert idx.shifts_by_kind('甲', '2026/03/10') == {'OFF': 'ABC', 'ON': 'B'}
+    assert idx.shifts_by_kind('甲', '2026/04/01') == {}
+
+
+def test_precomputed_ordinal_and_unknown_name():
+    idx = ExceptionIndex('ABC')
+    idx.add('甲', '2026/03/05', 'OFF')
+    ordinal = to_ordinal('2026/03/05')
+    assert idx.get(('甲', 'ignored', 'A'), ordinal=ordinal) == 'OFF'
+    assert idx.shifts_by_kind('甲', 'ignored', ordinal=ordinal) == {'OFF': 'ABC'}
+    # 沒有例外的人員不解析日期 (不合法的日期字串也不會出錯)
+    assert idx.get(('乙', 'not a date', 'A'), 'X') == 'X'
+    assert idx.shifts_by_kind('乙', 'not a date') == {}
+    assert len(idx) == 1
+    assert idx.add('甲', 'not a date', 'OFF') is False
+
+
+# ---------- 兩個部門的輸入表都接受「起~迄」區間 ----------
+def _with_range_leave(dept):
+    wb = template_workbook(dept)
+    name = wb['2_人員設定'].cell(row=2, column=2).value
+    wb['3_例外請假'].append([name, '2026/03/02~2026/03/05', 'A', 'OFF'])
+    return name, to_bytes(wb)
+
+
+@pytest.mark.parametrize('dept', ['rehab', 'nurse'])
+def test_loader_accepts_date_range_cell(dept):
+    name, data = _with_range_leave(dept)
+    engine = ScheduleEngine(REHAB_PROFILE, io.BytesIO(data)) if dept == 'rehab' else nurse.ClinicSchedulerNurse(io.BytesIO(data))
+    success, msg = engine.load_data()
+    assert success, msg
+    for d in ('2026/03/02', '2026/03/05'):
+        assert engine.exceptions.get((name, d, 'A')) == 'OFF'
+    assert engine.exceptions.get((name, '2026/03/06', 'A')) is None
+    engine.solve()
+    assert not [r for r in engine.records() if r['姓名'] == name and r['時段'] == 'A' and '2026/03/02' <= str(r['日期'])[:10].replace('-', '/') <= '2026/03/05']
+
+
+# ---------- 時段空白 / 多時段：復健部沿用 V7.3 (不生效)，'expand' 才展開 ----------
+def test_exact_shift_matching():
+    idx = ExceptionIndex('ABC', expand_shifts=False)
+    idx.add('甲', '2026/03/05', 'OFF')
+    idx.add('甲', '2026/03/06', 'OFF', shifts='AB')
+    idx.add('甲', '2026/03/07', 'OFF', shifts=' B ')
+    assert [idx.get(('甲', '2026/03/05', s)) for s in 'ABC'] == [None] * 3
+    assert [idx.get(('甲', '2026/03/06', s)) for s in 'ABC'] == [None] * 3
+    assert [idx.get(('甲', '2026/03/07', s)) for s in 'ABC'] == [None, 'OFF', None]
+    assert idx.shifts_by_kind('甲', '2026/03/06') == {} and idx.shifts_by_kind('甲', '2026/03/07') == {'OFF': 'B'}
+
+
+def test_rehab_blank_and_multi_shift_leave_before_and_after():
+    wb = template_workbook('rehab')
+    name = wb['2_人員設定'].cell(row=2, column=2).value
+    wb['3_例外請假'].append([name, '2026/03/02', None, 'OFF'])
+    wb['3_例外請假'].append([name, '2026/03/03', 'AB', 'OFF'])
+    data = to_bytes(wb)
+    results = {}
+    for mode in ('exact', 'expand'):
+        engine = ScheduleEngine(dict(REHAB_PROFILE, exception_shifts=mode), io.BytesIO(data))
+        assert engine.load_data()[0]
+        results[mode] = [engine.exceptions.get((name, d, s)) for d in ('2026/03/02', '2026/03/03') for s in 'ABC']
+    assert REHAB_PROFILE['exception_shifts'] == 'exact'
+    assert results['exact'] == [None] * 6
+    assert results['expand'] == ['OFF'] * 3 + ['OFF', 'OFF', None]
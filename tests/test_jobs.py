@@ -0,0 +1,78 @@
+import os
+import tempfile
+import threading
+import time
+
+from engine.jobs import JobManager, ResultFile
+
+
+def _wait(manager, job_id, timeout=5):
+    end = time.time() + timeout
+    while manager.get(job_id).active:
+        assert time.time() < end, "工作逾時"
+        time.sleep(0.01)
+    return manager.get(job_id)
+
+
+def test_identical_submissions_share_one_run():
+    manager = JobManager(max_workers=2)
+    release = threading.Event(); calls = []
+
+    def fn(f, progress=None, trace=False):
+        calls.append(f.read()); release.wait(5)
+        progress('fill', 0.5)
+        return 'ok'
+
+    first = manager.submit('rehab', fn, b'input', trace=False)
+    assert manager.submit('rehab', fn, b'input', trace=False) == first
+    other = manager.submit('rehab', fn, b'input', trace=True)   # 選項不同就是不同工作
+    assert other != first
+    release.set()
+    job = _wait(manager, first)
+    _wait(manager, other)
+    assert calls == [b'input', b'input']
+    assert job.status == 'done' and job.result == 'ok' and job.progress == 1.0
+
+
+def test_failed_job_can_be_resubmitted():
+    manager = JobManager()
+    outcomes = iter([ValueError('壞檔'), 'ok'])
+
+    def fn(f, progress=None):
+        out = next(outcomes)
+        if isinstance(out, Exception): raise out
+        return out
+
+    job_id = manager.submit('nurse', fn, b'x')
+    job = _wait(manager, job_id)
+    assert job.status == 'error' and job.message == '排班失敗: 壞檔'
+    assert manager.submit('nurse', fn, b'x') == job_id
+    assert _wait(manager, job_id).result == 'ok'
+
+
+def test_expired_job_removes_result_file():
+    manager = JobManager(ttl=0)
+    fd, path = tempfile.mkstemp(suffix='.xlsx'); os.close(fd)
+    job_id = manager.submit('rehab_chunked', lambda f, progress=None: (ResultFile(path), {}, 'ok'), b'year')
+    assert _wait(manager, job_id).result[0].read() == b''
+    time.sleep(0.01)
+    manager.submit('rehab_chunked', lambda f, progress=None: None, b'other')   # 送出新工作時清掉過期的
+    assert manager.get(job_id) is None
+    assert not os.path.exists(path)
+    assert ResultFile(path).read() is None
+
+
+def test_progress_only_moves_forward():
+    manager = JobManager()
+    seen = []
+
+    def fn(f, progress=None):
+        job = manager.get(job_id)
+        for stage, frac in (('load', 0), ('fill', 0.5), ('fixed', 0), ('write', 2)):
+            progress(stage, frac); seen.append(round(job.progress, 3))
+        return None
+
+    job_id = JobManager.job_key('rehab', b'p', {})
+    assert manager.submit('rehab', fn, b'p') == job_id
+    _wait(manager, job_id)
+    assert seen == [0.0, 0.525, 0.525, 1.0]
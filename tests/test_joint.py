@@ -0,0 +1,44 @@
+import io
+
+import pandas as pd
+
+from conftest import template_workbook, to_bytes
+from engine import nurse, rehab
+from engine.joint import OccupancyIndex, run_joint_scheduler
+from engine.raw_io import read_raw_table
+
+
+def _slots(output):
+    """{(員工編號, 日期, 時段)} (同一時段兩個地點也只算一次)"""
+    df = read_raw_table(io.BytesIO(output.getvalue()))
+    dates = pd.to_datetime(df['日期']).dt.strftime('%Y/%m/%d')   # 護理部底稿的日期是 datetime
+    return set(zip(df['員工編號'].astype(str), dates, df['時段'].astype(str)))
+
+
+def test_occupancy_bits():
+    occ = OccupancyIndex()
+    occ.occupy('P1', '2026/03/02', 'A'); occ.occupy('P1', '2026/03/02', 'C')
+    assert occ.is_busy('P1', '2026/03/02', 'A') and not occ.is_busy('P1', '2026/03/02', 'B')
+    assert occ.day_count('P1', '2026/03/02') == 2 and occ.day_count('P1', '2026/03/03') == 0
+    occ.occupy('P1', '2026/03/02', 'D')   # 未列出的時段自動配一個新位元
+    assert occ.is_busy('P1', '2026/03/02', 'D') and occ.day_count('P1', '2026/03/02') == 3
+
+
+def test_shared_employee_never_double_booked():
+    rehab_wb, nurse_wb = template_workbook('rehab'), template_workbook('nurse')
+    # 各自排班時會撞時段的一組人：護理部那位改用復健部的員工編號 (同一人兩邊都有登記)
+    alone = {d: _slots(run(io.BytesIO(to_bytes(wb)))[0]) for d, run, wb in
+             (('rehab', rehab.run_scheduler_bytes, rehab_wb), ('nurse', nurse.run_nurse_scheduler, nurse_wb))}
+    shared_id, nurse_id = next((r, n) for r in sorted({s[0] for s in alone['rehab']}) for n in sorted({s[0] for s in alone['nurse']})
+                               if {s[1:] for s in alone['rehab'] if s[0] == r} & {s[1:] for s in alone['nurse'] if s[0] == n})
+    ws = nurse_wb['2_人員設定']
+    row = next(r for r in range(2, ws.max_row + 1) if ws.cell(row=r, column=3).value == nurse_id)
+    ws.cell(row=row, column=3).value = shared_id
+
+    outputs, _, msg = run_joint_scheduler([('rehab', io.BytesIO(to_bytes(rehab_wb))), ('nurse', io.BytesIO(to_bytes(nurse_wb)))])
+    assert outputs is not None, msg
+    joint = {d: _slots(out) for d, out in outputs.items()}
+    mine = {d: {s[1:] for s in slots if s[0] == shared_id} for d, slots in joint.items()}
+    assert mine['rehab'] and mine['nurse']          # 兩邊都有排到這個人
+    assert not mine['rehab'] & mine['nurse']        # 但不會在同一時段
+    assert not {s for s in joint['rehab'] if s[0] != 'NO_ID'} & joint['nurse']
@@ -0,0 +1,97 @@
+import io
+
+import openpyxl
+import pytest
+
+from conftest import template_workbook, to_bytes
+from engine import nurse, rehab
+from engine.layout import LAYOUT_SHEET, SiteLayout, header_locations, ordered_shifts, read_layout_sheet, shift_rank
+from engine.raw_io import read_raw_table
+from engine.reimport import LAYOUT_COL_SHEET
+
+
+def test_slot_order_and_decode():
+    layout = SiteLayout(['a', 'B', 'a', ' '], ['甲', '乙', '丁'], fill_locations=['丁', '甲', '不存在'])
+    assert layout.shifts == ['A', 'B'] and layout.all_shifts == 'AB'
+    assert layout.fill_locations == ['甲', '丁']   # 依地點順序，未設定的地點略過
+    slots = [layout.slot(s, l) for s in layout.shifts for l in layout.locations]
+    assert slots == sorted(slots) == list(range(6))
+    assert [layout.decode(x) for x in slots] == [(s, l) for s in 'AB' for l in ('甲', '乙', '丁')]
+
+
+def test_invalid_layouts():
+    with pytest.raises(ValueError, match='單一字元'): SiteLayout(['AM', 'PM'], ['甲'])
+    with pytest.raises(ValueError): SiteLayout([], ['甲'])
+    with pytest.raises(ValueError): SiteLayout(['A'], [' '])
+
+
+def test_rule_pattern_prefers_longest_location():
+    layout = SiteLayout('AB', ['甲', '甲二'])
+    assert layout.rule_pattern.match('A甲二').groups() == ('A', '甲二')
+    assert layout.rule_pattern.match('B甲').groups() == ('B', '甲')
+    assert layout.rule_pattern.match('A').groups() == ('A', None)
+    assert layout.rule_pattern.match('C甲') is None
+
+
+def test_header_and_shift_helpers():
+    assert header_locations(['日期', '丁院_醫師', '院_醫師', None, '己院_醫師', '丁_PT需求'], '院_醫師') == ['丁', '己']
+    assert ordered_shifts(['b', None, 'A', 'nan', ' ', 'B', 'D'], 'ABC') == ['B', 'A', 'D']
+    assert ordered_shifts([None], 'ABC') == ['A', 'B', 'C']
+    assert sorted(['X', 'C', 'A', 'D', 'B'], key=shift_rank('ABC')) == ['A', 'B', 'C', 'X', 'D']
+
+
+def test_read_layout_sheet():
+    wb = openpyxl.Workbook()
+    assert read_layout_sheet(wb) is None
+    ws = wb.create_sheet(LAYOUT_SHEET)
+    for row in (['地點', '類型', '說明'], ['甲', '固定'], ['丁', '補位'], [None, '補位'], ['乙', None]): ws.append(row)
+    assert read_layout_sheet(wb) == (['甲', '乙'], ['丁'])
+
+
+def _rehab_with_site(loc, calendar=True):
+    wb = template_workbook('rehab')
+    wb[LAYOUT_SHEET].append([loc, '補位', '新院區'])
+    if calendar:
+        ws = wb['1_行事曆與醫師']
+        c = ws.max_column + 1
+        for i, h in enumerate([f'{loc}院_醫師', f'{loc}_PT需求', f'{loc}_OT需求']): ws.cell(1, c + i, h)
+        for r in range(2, ws.max_row + 1): ws.cell(r, c, '新醫師'); ws.cell(r, c + 1, 1); ws.cell(r, c + 2, 0)
+    return io.BytesIO(to_bytes(wb))
+
+
+def _matrix_locations(output):
+    wb = openpyxl.load_workbook(io.BytesIO(output.getvalue()), read_only=True)
+    locs = {row[3] for row in wb[LAYOUT_COL_SHEET].iter_rows(min_row=2, values_only=True)}
+    wb.close()
+    return locs
+
+
+def test_rehab_extra_fill_site():
+    output, msg = rehab.run_scheduler_bytes(_rehab_with_site('己'))
+    assert output is not None, msg
+    assert '己' in _matrix_locations(output)
+    raw = read_raw_table(io.BytesIO(output.getvalue()))
+    assert (raw['地點'] == '己').sum() > 0
+    # 設定頁列了補位院區，行事曆卻沒有對應欄位
+    output, msg = rehab.run_scheduler_bytes(_rehab_with_site('己', calendar=False))
+    assert output is None and '己' in msg
+
+
+def test_nurse_extra_site_and_shift():
+    wb = template_workbook('nurse')
+    ws = wb['1_醫師班表與營業日']
+    c = ws.max_column + 1
+    ws.cell(1, c, '丙院_醫師')
+    for r in range(2, ws.max_row + 1): ws.cell(r, c, '劉醫師')
+    first = [ws.cell(2, i).value for i in range(1, c + 1)]
+    ws.append(first[:2] + ['D'] + first[3:])   # 第一天多一個 D 時段
+    output, msg = nurse.run_nurse_scheduler(io.BytesIO(to_bytes(wb)))
+    assert output is not None, msg
+    assert {'甲', '乙', '丙'} <= _matrix_locations(output)
+    raw = read_raw_table(io.BytesIO(output.getvalue()))
+    assert (raw['地點'] == '丙').sum() > 0 and (raw['時段'] == 'D').sum() > 0
+    # 儀表板沒有 D數 欄，但 D 時段仍算上班：全休 = 營業天數 - 有排班的天數
+    worked = raw.groupby('姓名')['日期'].nunique()
+    dash = openpyxl.load_workbook(io.BytesIO(output.getvalue()), read_only=True)['互動排班表']
+    days_off = {r[0]: r[11] for r in dash.iter_rows(min_row=7, max_col=12, values_only=True) if r[0]}
+    assert all(days_off[n] == raw['日期'].nunique() - worked.get(n, 0) for n in days_off)
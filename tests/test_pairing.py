@@ -0,0 +1,61 @@
+import io
+
+import openpyxl
+
+from conftest import template_workbook, to_bytes
+from engine.core import ScheduleEngine
+from engine.pairing import PAIR_COLUMNS, PAIR_ITEM, PairCounts, doctor_key, read_pair_goal
+from engine.rehab import REHAB_PROFILE
+
+
+def test_doctor_key_ignores_blanks():
+    for blank in (None, float('nan'), '', ' ', 'nan', 'None', '無'):
+        assert doctor_key(blank) is None
+    assert doctor_key(' 王醫師 ') == '王醫師'
+
+
+def test_read_pair_goal():
+    assert read_pair_goal([('醫師搭配目標', '輪替')]) == 'rotation'
+    assert read_pair_goal([('醫師搭配目標', 'continuity')]) == 'continuity'
+    assert read_pair_goal([('醫師搭配目標', '不考慮')], default='rotation') is None
+    assert read_pair_goal([('醫師搭配目標', None)], default='rotation') == 'rotation'
+    assert read_pair_goal([('7天內最多診數', 5)], default='continuity') == 'continuity'
+
+
+def test_counts_seed_and_rows():
+    pairs = PairCounts()
+    pairs.seed([('甲', '王醫師', 3), ('甲', '李醫師', '2'), ('乙', '王醫師', 'x'), ('丙', '無', 4), ('丁',)])
+    pairs.add('甲', '王醫師'); pairs.add('乙', '李醫師'); pairs.add('乙', None)
+    assert pairs.get('甲', '王醫師') == 4 and pairs.get('甲', '李醫師') == 2
+    assert pairs.get('乙', '王醫師') == 0 and pairs.get('乙', None) == 0 and pairs.get('戊', '陳醫師') == 0
+    assert len(pairs) == 3
+    assert pairs.rows() == [['乙', '李醫師', 1], ['甲', '王醫師', 4], ['甲', '李醫師', 2]]
+    assert list(pairs.to_frame().columns) == PAIR_COLUMNS
+
+
+def test_result_sheet_seeds_next_month():
+    pairs = PairCounts()
+    pairs.add('甲', '王醫師', 2); pairs.add('乙', '李醫師')
+    wb = openpyxl.Workbook()
+    ws = pairs.write_sheet(wb)
+    again = PairCounts(); again.seed(ws.iter_rows(min_row=2, values_only=True))
+    assert again.rows() == pairs.rows()
+
+
+# ---------- 復健部預設不考慮搭配，全域控制台可開啟 ----------
+def _rehab_records(goal):
+    wb = template_workbook('rehab')
+    if goal is not None:
+        for row in wb['0_全域控制台'].iter_rows(min_row=2):
+            if row[0].value == PAIR_ITEM: row[1].value = goal
+    engine = ScheduleEngine(REHAB_PROFILE, io.BytesIO(to_bytes(wb)))
+    assert engine.load_data()[0]
+    engine.solve()
+    return engine.pair_goal, engine.records()
+
+
+def test_rehab_pairing_is_off_unless_control_sheet_enables_it():
+    goal, default = _rehab_records(None)
+    assert goal is None
+    goal, rotated = _rehab_records('輪替')
+    assert goal == 'rotation' and rotated != default
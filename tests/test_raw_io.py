@@ -0,0 +1,59 @@
+import io
+
+import pandas as pd
+import pytest
+
+from engine.raw_io import RAW_COLUMNS, RAW_SHEET, _sniff, export_raw_files, parquet_available, read_raw_table
+from engine.validate import UploadError
+
+RECORDS = [
+    {'日期': '2026/03/02', '時段': 'A', '地點': '晉安', '姓名': '甲', '員工編號': '00123'},
+    {'日期': '2026/03/02', '時段': 'B', '地點': '毅安', '姓名': '乙', '員工編號': None},
+    {'日期': '2026/03/03', '時段': 'C', '地點': '晉安', '姓名': '甲', '員工編號': '00123'},
+]
+
+
+def _xlsx(df):
+    out = io.BytesIO()
+    with pd.ExcelWriter(out) as writer: df.to_excel(writer, sheet_name=RAW_SHEET, index=False)
+    out.seek(0)
+    return out
+
+
+def test_sniff_restores_position(tmp_path):
+    buf = io.BytesIO(b'PK\x03\x04rest')
+    assert _sniff(buf) == 'xlsx' and buf.tell() == 0
+    assert _sniff(io.BytesIO(b'PAR1....')) == 'parquet'
+    assert _sniff(io.BytesIO('日期,時段\n'.encode('utf-8-sig'))) == 'csv'
+    path = tmp_path / 'raw.csv'; path.write_bytes(b'a,b\n')
+    assert _sniff(str(path)) == 'csv'
+
+
+def test_csv_round_trip_keeps_ids_and_dates():
+    files = export_raw_files(RECORDS, formats=('csv',))
+    df = read_raw_table(files['csv'])
+    assert list(df.columns) == RAW_COLUMNS
+    assert df['日期'].tolist() == ['2026/03/02', '2026/03/02', '2026/03/03']
+    assert df['員工編號'].tolist() == ['00123', 'NO_ID', '00123']   # 前導 0 不被轉成數字
+
+
+@pytest.mark.skipif(not parquet_available(), reason="未安裝 pyarrow / fastparquet")
+def test_parquet_round_trip_matches_csv():
+    files = export_raw_files(RECORDS)
+    pd.testing.assert_frame_equal(read_raw_table(files['parquet']), read_raw_table(files['csv']), check_dtype=False)
+
+
+def test_xlsx_and_csv_read_the_same_rows():
+    df = pd.DataFrame(RECORDS[:1] + RECORDS[2:], columns=RAW_COLUMNS)
+    from_xlsx = read_raw_table(_xlsx(df))
+    from_csv = read_raw_table(export_raw_files(df, formats=('csv',))['csv'])
+    assert from_xlsx[['時段', '地點', '姓名']].values.tolist() == from_csv[['時段', '地點', '姓名']].values.tolist()
+
+
+def test_rejects_bad_tables():
+    with pytest.raises(UploadError, match='缺少欄位'):
+        read_raw_table(io.BytesIO('日期,時段\n2026/03/02,A\n'.encode('utf-8-sig')))
+    with pytest.raises(UploadError):
+        read_raw_table(_xlsx(pd.DataFrame({'日期': ['2026/03/02']})))
+    with pytest.raises(ValueError, match='不支援'):
+        export_raw_files(RECORDS, formats=('json',))
@@ -0,0 +1,91 @@
+import io
+
+import openpyxl
+
+from conftest import template_workbook, to_bytes
+from engine import nurse, rehab
+from engine.reimport import DASH_SHEET, LAYOUT_COL_SHEET, LAYOUT_ROW_SHEET, import_dashboard, validate_changes
+
+
+def _result(dept='rehab'):
+    run = rehab.run_scheduler_bytes if dept == 'rehab' else nurse.run_nurse_scheduler
+    output, msg = run(io.BytesIO(to_bytes(template_workbook(dept))))
+    assert output is not None, msg
+    return openpyxl.load_workbook(output)
+
+
+def _matrix(wb):
+    """(姓名, 日期, 時段, 地點) -> 儲存格座標，由隱藏配置頁反查"""
+    cols = {c: (d, s, l) for c, d, s, l in wb[LAYOUT_COL_SHEET].iter_rows(min_row=2, values_only=True)}
+    rows = {r: name for r, name, _ in wb[LAYOUT_ROW_SHEET].iter_rows(min_row=2, values_only=True)}
+    return {(name, *slot): (r, c) for r, name in rows.items() for c, slot in cols.items()}
+
+
+def _edit(wb, changes):
+    ws = wb[DASH_SHEET]
+    for (r, c), v in changes.items(): ws.cell(row=r, column=c).value = v
+    return io.BytesIO(to_bytes(wb))
+
+
+def test_unedited_dashboard_has_no_changes():
+    records, changes, issues = import_dashboard(io.BytesIO(to_bytes(_result())))
+    assert records and changes.empty and issues.empty
+
+
+def test_detects_adds_removals_and_same_shift_conflict():
+    wb = _result()
+    matrix = _matrix(wb)
+    ws = wb[DASH_SHEET]
+    placed = sorted(cell for cell, (r, c) in matrix.items() if ws.cell(row=r, column=c).value == 'V')
+    removed = placed[0]
+    # 同一人同一時段另一個地點：新增後同時段重複
+    name, d, s, l = placed[-1]
+    added = next(cell for cell in matrix if cell[:3] == (name, d, s) and cell[3] != l)
+    records, changes, issues = import_dashboard(_edit(wb, {matrix[removed]: None, matrix[added]: 'v'}))
+
+    assert sorted(map(tuple, changes[['姓名', '日期', '時段', '地點', '變更']].values.tolist())) == sorted([(*added, '新增'), (*removed, '移除')])
+    assert issues[['姓名', '日期', '時段', '地點']].values.tolist() == [list(added)]
+    assert '同時段重複排班' in issues['問題'].iloc[0]
+    cells = {(r['姓名'], r['日期'], r['時段'], r['地點']) for r in records}
+    assert added in cells and removed not in cells and len(cells) == len(placed)
+
+
+def test_day_limit_and_availability_only_checked_for_added_cells():
+    edited = {('甲', '2026/03/02', 'A', '1'), ('甲', '2026/03/02', 'B', '1'), ('甲', '2026/03/02', 'C', '1'),
+              ('乙', '2026/03/02', 'A', '1'), ('乙', '2026/03/02', 'B', '1'), ('乙', '2026/03/02', 'C', '1')}
+    added = {('甲', '2026/03/02', 'C', '1')}
+    issues = validate_changes(added, edited, availability=lambda n, d, s: '例外請假 OFF' if s == 'C' else None, max_per_day=2)
+    # 乙 原本就超過上限但沒有新增，不列入
+    assert issues.values.tolist() == [['甲', '2026/03/02', 'C', '1', '單日超過 2 診、例外請假 OFF']]
+    assert validate_changes(added, edited, max_per_day=None).empty
+
+
+def test_old_result_without_layout_sheets():
+    # 舊版結果檔沒有隱藏配置頁：由表頭推回欄位，結果與新版相同
+    wb = _result()
+    matrix = _matrix(wb)
+    ws = wb[DASH_SHEET]
+    cell = next(cell for cell, (r, c) in sorted(matrix.items()) if ws.cell(row=r, column=c).value == 'V')
+    r, c = matrix[cell]
+    ws.cell(row=r, column=c).value = None
+    for title in (LAYOUT_COL_SHEET, LAYOUT_ROW_SHEET): del wb[title]
+    _, changes, issues = import_dashboard(io.BytesIO(to_bytes(wb)))
+    assert changes[['姓名', '日期', '時段', '地點', '變更']].values.tolist() == [[*cell, '移除']]
+    assert issues.empty
+
+
+def test_nurse_import_flags_unavailable_addition():
+    wb = _result('nurse')
+    matrix = _matrix(wb)
+    ws = wb[DASH_SHEET]
+    inp = template_workbook('nurse')
+    scheduler = nurse.ClinicSchedulerNurse(io.BytesIO(to_bytes(inp)))
+    scheduler.load_data()
+    added = next(cell for cell, (r, c) in sorted(matrix.items())
+                 if ws.cell(row=r, column=c).value != 'V' and scheduler.unavailable_reason(*cell[:3]))
+    res, msg = nurse.import_nurse_dashboard(_edit(wb, {matrix[added]: 'V'}), io.BytesIO(to_bytes(inp)))
+    assert res is not None, msg
+    _, changes, issues = res
+    assert changes['變更'].tolist() == ['新增']
+    assert issues[['姓名', '日期', '時段', '地點']].values.tolist() == [list(added)]
+    assert issues['問題'].iloc[0] == scheduler.unavailable_reason(*added[:3])
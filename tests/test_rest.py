@@ -0,0 +1,70 @@
+import random
+
+from engine.rest import RestIndex, read_rest_settings, rest_config
+
+
+def test_read_rest_settings():
+    rows = [('0_說明', None), ('7天內最多診數', 10, '...'), ('最多連續上班天數', '6'), ('禁止晚接早 (C→A)', '是')]
+    assert read_rest_settings(rows) == {'max_per_window': 10, 'window_days': 7, 'max_consecutive': 6, 'no_turnaround': True}
+    # 空白 / 否 / 非數字 = 不限制，引擎就不做休息檢查
+    assert read_rest_settings([('7天內最多診數', None), ('最多連續上班天數', 'abc'), ('禁止晚接早 (C→A)', '否')]) is None
+    assert read_rest_settings([]) is None
+
+
+def test_rest_config_from_json():
+    assert rest_config({}) is None
+    assert rest_config({'max_per_window': 0}) is None
+    assert rest_config({'max_consecutive': 5.0, 'window_days': 14}) == {'max_per_window': None, 'window_days': 14, 'max_consecutive': 5, 'no_turnaround': False}
+
+
+def test_turnaround_both_directions():
+    idx = RestIndex(no_turnaround=True)
+    idx.add('甲', 10, 'C')
+    assert idx.violation('甲', 11, 'A') == "前一天 C 班，不接 A 班"
+    assert idx.violation('甲', 11, 'B') is None
+    idx.add('甲', 20, 'A')
+    assert idx.violation('甲', 19, 'C') == "隔天 A 班，不排 C 班"
+    assert idx.violation('乙', 11, 'A') is None
+
+
+def _rescan(days, key, day, shift, cfg):
+    """直接掃描已排日期的對照版本 (舊做法)"""
+    mine = {d: s for (k, d), s in days.items() if k == key}
+    n = cfg['window_days']
+    if cfg['max_per_window']:
+        for s in range(day - n + 1, day + 1):
+            if sum(len(mine.get(d, '')) for d in range(s, s + n)) >= cfg['max_per_window']: return True
+    if cfg['max_consecutive'] and day not in mine:
+        run = 1; d = day - 1
+        while d in mine: run += 1; d -= 1
+        d = day + 1
+        while d in mine: run += 1; d += 1
+        if run > cfg['max_consecutive']: return True
+    if cfg['no_turnaround']:
+        if shift == 'A' and 'C' in mine.get(day - 1, ''): return True
+        if shift == 'C' and 'A' in mine.get(day + 1, ''): return True
+    return False
+
+
+def test_incremental_index_matches_rescan():
+    cfg = {'max_per_window': 5, 'window_days': 7, 'max_consecutive': 4, 'no_turnaround': True}
+    rng = random.Random(3)
+    idx = RestIndex(**cfg)
+    days = {}
+    for _ in range(3000):
+        key, day, shift = rng.choice('甲乙丙'), rng.randrange(60), rng.choice('ABC')
+        if shift in days.get((key, day), ''): continue
+        blocked = idx.violation(key, day, shift) is not None
+        assert blocked == _rescan(days, key, day, shift, cfg), (key, day, shift)
+        if not blocked:
+            idx.add(key, day, shift)
+            days[(key, day)] = days.get((key, day), '') + shift
+
+
+def test_forget_keeps_recent_window():
+    idx = RestIndex(max_per_window=2, max_consecutive=3)
+    for d in (1, 2, 30, 31): idx.add('甲', d, 'A')
+    idx.forget(32)
+    assert idx.violation('甲', 32, 'A') == "7天內已排 2 診"
+    assert idx.violation('甲', 40, 'A') is None
+    assert all(k[1] >= 32 - 7 for k in idx._shifts)
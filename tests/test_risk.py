@@ -0,0 +1,49 @@
+import io
+
+import numpy as np
+
+from conftest import template_workbook, to_bytes
+from engine.core import ScheduleEngine
+from engine.rehab import REHAB_PROFILE
+from engine.risk import simulate_staffing_risk
+
+
+def _solved():
+    engine = ScheduleEngine(REHAB_PROFILE, io.BytesIO(to_bytes(template_workbook('rehab'))))
+    assert engine.load_data()[0]
+    engine.solve()
+    return engine
+
+
+def _dense_reference(engine, n_scenarios, absence_rate, seed):
+    """原本的稠密矩陣寫法，只用於小輸入的對照"""
+    slots, cells = [], []
+    for d_str, active in engine.active_slots().items():
+        for slot in active:
+            shift, loc = engine.layout.decode(slot)
+            workers = engine.schedule[d_str].get(slot, [])
+            for w in workers: cells.append((len(slots), (w['name'], d_str)))
+            slots.append((int(sum(engine.requirements.get((d_str, shift, loc), {}).values())), len(workers)))
+    person_days = list(dict.fromkeys(k for _, k in cells))
+    index = {k: i for i, k in enumerate(person_days)}
+    assign = np.zeros((len(person_days), len(slots)), dtype=np.float32)
+    for s, k in cells: assign[index[k], s] += 1
+    need = np.array([s[0] for s in slots], dtype=np.float32); staffed = np.array([s[1] for s in slots], dtype=np.float32)
+    absent = (np.random.default_rng(seed).random((n_scenarios, len(person_days)), dtype=np.float32) < np.float32(absence_rate)).astype(np.float32)
+    gap = np.maximum(need - (staffed - absent @ assign), 0)
+    return (gap > 0).sum(axis=0), gap.sum(axis=0)
+
+
+def test_sparse_accumulation_matches_dense_matrix():
+    engine = _solved()
+    df = simulate_staffing_risk(engine, n_scenarios=500, absence_rate=0.1, seed=3)
+    hits, gaps = _dense_reference(engine, 500, 0.1, 3)
+    assert sorted(df['缺人機率'].round(4)) == sorted((hits / 500).round(4))
+    assert np.isclose(df['平均缺口'].sum(), (gaps / 500).sum(), atol=0.01)
+
+
+def test_batch_size_does_not_change_result():
+    engine = _solved()
+    a = simulate_staffing_risk(engine, n_scenarios=300, seed=5, batch=300)
+    b = simulate_staffing_risk(engine, n_scenarios=300, seed=5, batch=7)
+    assert a.equals(b)
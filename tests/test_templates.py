@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+
+import openpyxl
+import pytest
+
+from engine import nurse, rehab, templates
+from engine.pairing import PAIR_ITEM
+from engine.rest import CONTROL_SHEET, TURNAROUND_ITEM
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(templates, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(templates, 'CACHE_DIR', str(tmp_path / 'templates'))
+    return tmp_path / 'templates'
+
+
+def _counting_build():
+    calls = []
+
+    def build(year, month, roster):
+        calls.append((year, month)); time.sleep(0.02)
+        return f"{year}-{month}-{len(roster)}".encode()
+    return build, calls
+
+
+def test_cache_hit_and_roster_key(cache_dir):
+    build, calls = _counting_build()
+    assert templates.cached_template('rehab', 2026, 3, [['甲']], build).read() == b'2026-3-1'
+    assert templates.cached_template('rehab', '2026', 3.0, [['甲']], build).read() == b'2026-3-1'
+    assert templates.cached_template('rehab', 2026, 3, [['甲'], ['乙']], build).read() == b'2026-3-2'   # 名單不同 = 不同快取
+    assert calls == [(2026, 3), (2026, 3)]
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_concurrent_requests_build_once(cache_dir):
+    build, calls = _counting_build()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(templates.cached_template('nurse', 2026, 4, [], build).read())) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert calls == [(2026, 4)] and results == [b'2026-4-0'] * 8
+
+
+def test_eviction_keeps_most_recently_used(cache_dir, monkeypatch):
+    monkeypatch.setattr(templates, 'MAX_CACHED', 2)
+    build, calls = _counting_build()
+    now = time.time()
+    for k, month in enumerate((1, 2, 3)):
+        templates.cached_template('rehab', 2026, month, [], build)
+        (path,) = [p for p in cache_dir.iterdir() if f"2026{month:02d}" in p.name]
+        os.utime(path, (now - 100 + k, now - 100 + k))   # 依建立順序給不同的 mtime
+    assert sorted(p.name[6:12] for p in cache_dir.iterdir()) == ['202602', '202603']
+    templates.cached_template('rehab', 2026, 1, [], build)     # 被淘汰的月份重新產生
+    assert calls == [(2026, 1), (2026, 2), (2026, 3), (2026, 1)]
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+def test_locks_do_not_grow(cache_dir):
+    build, _ = _counting_build()
+    for month in range(1, 13): templates.cached_template('rehab', 2027, month, [], build)
+    assert len(templates._locks) == templates.LOCK_STRIPES
+
+
+def test_template_prefilled_from_latest_roster(cache_dir):
+    assert templates.load_roster('rehab', 'default') == 'default'
+    staff = {'新人': {'id': 'E99', 'type': 'FT', 'role': 'PT(物治)', 'target': 30.0, 'rules': {0: 'A甲'}}}   # engine.staff 格式
+    templates.save_roster('rehab', templates.roster_rows(staff, 5))
+    wb = openpyxl.load_workbook(rehab.generate_template_bytes(2026, 5))
+    assert list(wb['2_人員設定'].iter_rows(min_row=2, values_only=True))[0][:8] == (1, '新人', 'E99', 'FT', 'PT(物治)', 30, None, 'A甲')
+    # 名單檔損毀時退回預設名單
+    (cache_dir.parent / 'roster_rehab.json').write_text('{', encoding='utf-8')
+    assert templates.load_roster('rehab', 'default') == 'default'
+
+
+@pytest.mark.parametrize('generate', [rehab.generate_template_bytes, nurse.generate_nurse_template_bytes])
+def test_control_sheet_validations_follow_item_rows(cache_dir, generate):
+    ws = openpyxl.load_workbook(generate(2026, 6))[CONTROL_SHEET]
+    rows = {ws.cell(r, 1).value: r for r in range(2, ws.max_row + 1)}
+    cells = {str(dv.sqref): dv.formula1 for dv in ws.data_validations.dataValidation}
+    assert cells[f"B{rows[TURNAROUND_ITEM]}"] == '"是,否"'
+    assert '輪替' in cells[f"B{rows[PAIR_ITEM]}"]
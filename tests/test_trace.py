@@ -0,0 +1,47 @@
+import io
+
+import openpyxl
+import pandas as pd
+
+from conftest import template_workbook, to_bytes
+from engine import rehab
+from engine.trace import TRACE_COLUMNS, TRACE_KEY, DecisionTrace
+
+
+def test_rejections_grouped_with_counts_and_capped_sample():
+    trace = DecisionTrace(top_k=2)
+    rejected = [('OFF', f"N{i}") for i in range(50)] + [('同時段已排', 'X')]
+    trace.record('2026/03/02', 'A', '丁', '補位', ['甲'], [(9, '甲'), (5, '乙'), (1, '丙')], rejected)
+    (*_, scored, _), = trace._buf
+    assert scored == [(9, '甲'), (5, '乙')]
+    frame = trace.to_frame()
+    assert list(frame.columns) == TRACE_COLUMNS
+    row = frame.iloc[0]
+    assert row['排入'] == '甲'
+    assert row['候選 (分數)'] == '甲 (9)、乙 (5)'
+    assert row['未列入原因'] == 'OFF 50 人: N0、N1、N2…；同時段已排 1 人: X'
+
+
+def test_ring_buffer_drops_oldest():
+    trace = DecisionTrace(maxlen=3)
+    for d in range(5): trace.record(f"2026/03/0{d + 1}", 'A', None, '固定規則', ('甲',))
+    assert len(trace) == 3 and trace.dropped == 2
+    assert trace.to_frame()['日期'].tolist() == ['2026/03/03', '2026/03/04', '2026/03/05']
+    assert trace.to_frame()['未列入原因'].tolist() == [''] * 3
+
+
+def test_run_puts_trace_csv_beside_workbook():
+    raw_out = {}
+    output, msg = rehab.run_scheduler_bytes(io.BytesIO(to_bytes(template_workbook('rehab'))), raw_out=raw_out, trace=True)
+    assert output is not None, msg
+    assert '決策紀錄' not in openpyxl.load_workbook(output).sheetnames
+    frame = pd.read_csv(raw_out[TRACE_KEY], encoding='utf-8-sig', keep_default_na=False)
+    assert list(frame.columns) == TRACE_COLUMNS
+    assert (frame['步驟'] == '固定規則').any() and (frame['未列入原因'] != '').any()
+
+
+def test_csv_notes_dropped_records():
+    trace = DecisionTrace(maxlen=2)
+    for d in range(3): trace.record(f"2026/03/0{d + 1}", 'A', None, '固定規則', ('甲',))
+    frame = pd.read_csv(trace.to_csv(), encoding='utf-8-sig', keep_default_na=False)
+    assert len(frame) == 3 and frame['日期'].iloc[-1] == '(較早的 1 筆紀錄已超出緩衝上限)'
@@ -0,0 +1,70 @@
+import io
+
+import openpyxl
+import pytest
+
+from conftest import template_workbook, to_bytes
+from engine import api, rehab
+from engine.erp import build_erp_delta, read_manifest
+from engine.raw_io import RAW_COLUMNS, read_raw_table
+from engine.reimport import read_dashboard
+from engine.validate import UploadError, check_upload_size, validate_workbook
+
+
+def _blank_xlsx():
+    return to_bytes(openpyxl.Workbook())
+
+
+def test_size_limit_and_empty_file():
+    with pytest.raises(UploadError, match='超過上限'): check_upload_size(io.BytesIO(b'x' * 2048), max_mb=0.001)
+    with pytest.raises(UploadError, match='空的'): check_upload_size(io.BytesIO(b''))
+
+
+def test_input_template_passes_schema_and_bad_header_is_reported():
+    assert validate_workbook(io.BytesIO(to_bytes(template_workbook('rehab'))), rehab.REHAB_SCHEMA) is None
+    wb = template_workbook('rehab'); wb['3_例外請假'].cell(row=1, column=2, value='日期')
+    with pytest.raises(UploadError, match='第 2 欄應為'):
+        validate_workbook(io.BytesIO(to_bytes(wb)), rehab.REHAB_SCHEMA)
+
+
+def test_header_error_does_not_skip_later_sheets():
+    wb = template_workbook('rehab'); wb['2_人員設定'].cell(row=1, column=2).value = '名字'
+    wb['3_例外請假'].append(['林振明', 'not a date', 'A', 'OFF'])
+    with pytest.raises(UploadError) as e: validate_workbook(io.BytesIO(to_bytes(wb)), rehab.REHAB_SCHEMA)
+    assert '第 2 欄應為' in str(e.value) and '不是日期' in str(e.value)
+
+
+def test_range_date_cell_passes_upload_validation():
+    wb = template_workbook('rehab')
+    wb['3_例外請假'].append(['林振明', '2026/03/02~2026/03/05', None, 'OFF'])
+    assert validate_workbook(io.BytesIO(to_bytes(wb)), rehab.REHAB_SCHEMA) is None
+
+
+@pytest.mark.parametrize('reader', [read_raw_table, read_dashboard, read_manifest])
+def test_result_readers_reject_wrong_workbook(reader):
+    with pytest.raises(UploadError, match='缺少工作表'): reader(io.BytesIO(_blank_xlsx()))
+
+
+def test_raw_table_checks_columns_for_csv():
+    with pytest.raises(UploadError, match='底稿缺少欄位'): read_raw_table(io.BytesIO(b'a,b\n1,2\n'))
+
+
+def test_erp_grid_header_is_checked():
+    wb = openpyxl.Workbook(); wb.active.title = 'ERP導入'; wb.active.append(['x', 'y', 'z'])
+    with pytest.raises(UploadError, match='ERP 導入檔'): read_manifest(io.BytesIO(to_bytes(wb)))
+
+
+def test_converters_return_messages_instead_of_raising():
+    output, msg = rehab.convert_erp_bytes(io.BytesIO(_blank_xlsx()))
+    assert output is None and msg.startswith('❌') and '原始運算底稿' in msg
+    csv = io.BytesIO(','.join(RAW_COLUMNS).encode('utf-8') + '\n2026/03/02,A,丁,甲,E1\n'.encode('utf-8'))
+    result, msg = rehab.convert_erp_delta(csv, io.BytesIO(_blank_xlsx()))
+    assert result is None and msg.startswith('❌')
+
+
+def test_api_erp_checks_rows():
+    res = api.handle('/erp', {'dept': 'rehab', 'rows': [['not a date', 'A', '丁', '甲', 'E1'], ['2026/03/02']]})
+    assert not res['ok'] and len(res['errors']) == 2
+    res = api.handle('/erp', {'dept': 'rehab', 'rows': [['2026/03/02', 'A', '丁', '甲', 'E1']], 'previous': {'E1': 'x'}})
+    assert not res['ok'] and 'previous' in res['msg']
+    assert api.handle('/erp', {'dept': 'rehab', 'rows': [['2026/03/02', 'A', '丁', '甲', 'E1']]})['ok']
@@ -0,0 +1 @@
+# 開發用命令列工具 (壓力測試、差異測試)；以 python -m tools.<名稱> 執行
@@ -0,0 +1,344 @@
+"""
+差異測試 (golden corpus)：同一批輸入表，用參考引擎與其他執行模式各跑一次，逐格比對結果與耗時。
+
+    python -m tools.difftest --generated 10 --corpus-dir samples/ --modes chunked_month,json
+
+參考模式 = run_scheduler_bytes / run_nurse_scheduler (頁面上的「開始排班」)。
+每個模式比對：原始運算底稿逐格 (順序與內容)、由底稿算出的人員統計 (實際 / A/B/C 數 / 組合天數 / 全休)，
+有輸出互動排班表的模式另外逐格比對儀表板統計欄 (A~L)。
+發現差異時把輸入表縮到仍會出現差異的最少日期 / 請假列，寫到 --out 目錄方便重現。
+真實輸入表請先用 --anonymize-to 去識別化後再放進 corpus (姓名、員編、醫師換成代號，對應關係一致)。
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# 模板快取與名單寫到暫存目錄，不影響正式資料
+os.environ.setdefault('SCHEDULE_DATA_DIR', tempfile.mkdtemp(prefix='schedule_difftest_'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+import pandas as pd
+
+from engine import api, nurse, rehab
+from engine.dashboard import compute_staff_stats
+from engine.layout import LAYOUT_SHEET, LOC_FILL, header_locations, ordered_shifts
+from engine.pairing import PAIR_SHEET, read_pair_goal
+from engine.raw_io import RAW_COLUMNS, read_raw_table
+from engine.rest import CONTROL_SHEET, read_rest_settings
+from tools.loadtest import synthetic_input
+
+CALENDAR_SHEETS = {'rehab': '1_行事曆與醫師', 'nurse': '1_醫師班表與營業日'}
+
+
+# ==========================================
+# 📄 輸入表 -> JSON 請求 (json 模式用，與 engine.payload 的格式相同)
+# ==========================================
+def _rows(wb, title):
+    if title not in wb.sheetnames: return [], {}
+    rows = list(wb[title].iter_rows(values_only=True))
+    if not rows: return [], {}
+    return [r for r in rows[1:] if r and r[0] is not None], {h: i for i, h in enumerate(rows[0]) if h}
+
+
+def workbook_payload(dept, data):
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    cal, col = _rows(wb, CALENDAR_SHEETS[dept])
+    locs = header_locations(col, '院_醫師')
+    calendar = []
+    for r in cal:
+        if dept == 'rehab':
+            sites = {loc: {'doctor': r[col[f'{loc}院_醫師']], 'PT': r[col[f'{loc}_PT需求']] if f'{loc}_PT需求' in col else 0,
+                           'OT': r[col[f'{loc}_OT需求']] if f'{loc}_OT需求' in col else 0} for loc in locs}
+            closed = r[col['營業狀態']] == '休診'
+        else:
+            sites = {loc: {'doctor': r[col[f'{loc}院_醫師']]} for loc in locs}
+            closed = r[col['營業狀態']] != '營業'
+        calendar.append({'date': r[col['日期']], 'shift': r[col['時段']], 'closed': closed, 'sites': sites})
+
+    staff_rows, scol = _rows(wb, '2_人員設定')
+    staff = []
+    for r in staff_rows:
+        if not r[1]: continue
+        if dept == 'rehab':
+            rules = {i: r[7 + i] or '' for i in range(5) if 7 + i < len(r)}
+            target = r[5] if isinstance(r[5], (int, float)) else 0
+            staff.append({'name': str(r[1]).strip(), 'id': r[2], 'type': str(r[3]).strip(), 'role': str(r[4]).strip(), 'target': target, 'rules': rules})
+        else:
+            rules = {i: r[scol[f'{wk} (固定)']] or '' for i, wk in nurse.WEEKDAY_COLS.items() if f'{wk} (固定)' in scol}
+            staff.append({'name': str(r[scol['姓名']]).replace(' ', ''), 'id': r[scol['員工編號']], 'type': r[scol['身分 (下拉)']],
+                          'role': r[scol['職能 (下拉)']], 'target': r[scol['本月個人目標 (數字)']] or 0, 'rules': rules})
+
+    exceptions = []
+    for r in _rows(wb, '3_例外請假')[0]:
+        if not r[1]: continue
+        exceptions.append({'name': str(r[0]).strip(), 'date': r[1], 'shifts': r[2], 'kind': r[3],
+                           'end': r[5] if len(r) > 5 else None, 'weekdays': r[6] if len(r) > 6 else None})
+    payload = {'dept': dept, 'calendar': calendar, 'staff': staff, 'exceptions': [x for x in exceptions if x['kind'] in api.DEPARTMENTS[dept][2]]}
+
+    control = _rows(wb, CONTROL_SHEET)[0]
+    payload['rest'] = read_rest_settings(control)
+    goal = read_pair_goal(control, default=False)
+    if goal is not False: payload['pair_goal'] = goal or 'none'
+    payload['pairs'] = [list(r[:3]) for r in _rows(wb, PAIR_SHEET)[0]]
+    if dept == 'rehab' and LAYOUT_SHEET in wb.sheetnames:
+        payload['fixed_locations'] = [str(r[0]).strip() for r in _rows(wb, LAYOUT_SHEET)[0] if (r[1] if len(r) > 1 else None) != LOC_FILL]
+    if dept == 'nurse':
+        payload['doctor_load'] = {r[0]: r[1] for r in _rows(wb, '4_醫師人力規則')[0]}
+    wb.close()
+    return json.loads(json.dumps(payload, default=str, ensure_ascii=False))  # 與 HTTP 請求相同，日期都變成字串
+
+
+# ==========================================
+# ⚙️ 執行模式：回傳 (底稿 DataFrame, 儀表板統計列 或 None)
+# ==========================================
+def _dashboard_rows(output):
+    wb = openpyxl.load_workbook(output, read_only=True)
+    rows = [list(r[:12]) for r in wb['互動排班表'].iter_rows(min_row=7, values_only=True)]
+    wb.close()
+    return rows
+
+
+def run_reference(dept, data, trace=False):
+    run = rehab.run_scheduler_bytes if dept == 'rehab' else nurse.run_nurse_scheduler
+    output, msg = run(io.BytesIO(data), trace=trace)
+    if output is None: raise ValueError(msg)
+    return read_raw_table(io.BytesIO(output.getvalue())), _dashboard_rows(output)
+
+
+def run_chunked(dept, data, chunk):
+    run = rehab.run_scheduler_chunked if dept == 'rehab' else nurse.run_nurse_chunked
+    path, msg = run(io.BytesIO(data), chunk=chunk)
+    if path is None: raise ValueError(msg)
+    try:
+        with open(path, 'rb') as f: return read_raw_table(io.BytesIO(f.read())), None
+    finally:
+        os.remove(path)
+
+
+def run_json(dept, data):
+    res = api.handle('/schedule', workbook_payload(dept, data))
+    if not res['ok']: raise ValueError(res['msg'])
+    return pd.DataFrame(res['rows'], columns=RAW_COLUMNS), None
+
+
+MODES = {
+    'trace': lambda dept, data: run_reference(dept, data, trace=True),
+    'chunked_month': lambda dept, data: run_chunked(dept, data, 'month'),
+    'chunked_week': lambda dept, data: run_chunked(dept, data, 'week'),
+    'json': run_json,
+}
+
+
+# ==========================================
+# 🔍 比對
+# ==========================================
+def normalize(raw):
+    df = raw[RAW_COLUMNS].copy()
+    df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y/%m/%d')
+    return df.astype(str).reset_index(drop=True)
+
+
+def staff_stats(raw, dates):
+    return compute_staff_stats(raw[['姓名', '日期', '時段', '地點']].itertuples(index=False), sorted(raw['姓名'].unique()), dates,
+                               ordered_shifts(raw['時段'], ()))
+
+
+def compare(ref, alt):
+    """回傳差異 dict；完全相同時為空"""
+    a, b = normalize(ref[0]), normalize(alt[0])
+    diff = {}
+    if len(a) != len(b): diff['rows'] = f"{len(a)} -> {len(b)}"
+    n = min(len(a), len(b))
+    cells = (a.iloc[:n] != b.iloc[:n]).to_numpy()
+    if cells.any() or len(a) != len(b):
+        diff['cells'] = int(cells.sum()) + abs(len(a) - len(b)) * len(RAW_COLUMNS)
+        first = int(cells.any(axis=1).argmax()) if cells.any() else n
+        diff['first'] = [a.iloc[first].tolist() if first < len(a) else None, b.iloc[first].tolist() if first < len(b) else None]
+        key = lambda df: sorted(map(tuple, df.values.tolist()))
+        diff['order_only'] = key(a) == key(b)
+    dates = sorted(set(a['日期']) | set(b['日期']))
+    sa, sb = staff_stats(a, dates), staff_stats(b, dates)
+    sa, sb = sa.align(sb, fill_value=0)
+    bad = (sa != sb).any(axis=1)
+    if bad.any(): diff['stats'] = sorted(sa.index[bad])
+    if ref[1] is not None and alt[1] is not None and ref[1] != alt[1]:
+        diff['dashboard'] = sum(x != y for x, y in zip(ref[1], alt[1])) + abs(len(ref[1]) - len(alt[1]))
+    return diff
+
+
+def timed(fn, *args, repeat=1):
+    best, result = None, None
+    for _ in range(repeat):
+        t = time.perf_counter(); result = fn(*args); elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+# ==========================================
+# ✂️ 縮小重現輸入：逐步刪日期 / 請假列，差異仍在就保留刪除
+# ==========================================
+def _without(data, dept, drop_dates=(), drop_exceptions=()):
+    """刪掉指定日期的行事曆列，以及內容相同的請假列"""
+    wb = openpyxl.load_workbook(io.BytesIO(data))
+    ws = wb[CALENDAR_SHEETS[dept]]
+    for i in sorted((r[0].row for r in ws.iter_rows(min_row=2) if str(r[0].value) in drop_dates), reverse=True): ws.delete_rows(i)
+    ws = wb['3_例外請假']
+    for i in sorted((r[0].row for r in ws.iter_rows(min_row=2) if tuple(c.value for c in r) in drop_exceptions), reverse=True): ws.delete_rows(i)
+    out = io.BytesIO(); wb.save(out)
+    return out.getvalue()
+
+
+def _diverges(dept, data, mode):
+    try:
+        return bool(compare(run_reference(dept, data), MODES[mode](dept, data)))
+    except Exception:
+        return False  # 縮到無法排班 (例如沒有營業日) 不算重現
+
+
+def minimize(dept, data, mode, max_runs=200):
+    """ddmin 式縮小：先刪日期 (一次刪一半、再逐漸變細)，再刪請假列；回傳 (縮小後的 xlsx, 執行次數)"""
+    runs = 0
+    def shrink(items, key):
+        nonlocal data, runs
+        size = max(len(items) // 2, 1)
+        while items and runs < max_runs:
+            removed = False
+            for start in range(0, len(items), size):
+                chunk = set(items[start:start + size])
+                candidate = _without(data, dept, **{key: chunk})
+                runs += 1
+                if _diverges(dept, candidate, mode):
+                    data = candidate; items = [x for x in items if x not in chunk]; removed = True
+                    break
+                if runs >= max_runs: break
+            if not removed:
+                if size == 1: break
+                size //= 2
+            size = min(size, max(len(items) // 2, 1))
+    wb = openpyxl.load_workbook(io.BytesIO(data))
+    dates = sorted({str(r[0]) for r in wb[CALENDAR_SHEETS[dept]].iter_rows(min_row=2, values_only=True) if r and r[0] is not None})
+    exceptions = list(dict.fromkeys(r for r in wb['3_例外請假'].iter_rows(min_row=2, values_only=True) if r and r[0]))
+    shrink(dates, 'drop_dates')
+    shrink(exceptions, 'drop_exceptions')
+    return data, runs
+
+
+# ==========================================
+# 🕶️ 真實輸入表去識別化
+# ==========================================
+def anonymize(data):
+    """姓名 -> P001、員工編號 -> E001、醫師 -> D01 (含「4_醫師人力規則」的關鍵字)；同一個值對應同一代號"""
+    wb = openpyxl.load_workbook(io.BytesIO(data))
+    maps = {'name': {}, 'id': {}, 'doc': {}}
+    def code(kind, val, fmt):
+        if val is None or str(val).strip() in ('', '無', '預設值'): return val
+        m = maps[kind]
+        return m.setdefault(str(val).strip(), fmt.format(len(m) + 1))
+    for ws in wb.worksheets:
+        rows = list(ws.iter_rows())
+        if not rows: continue
+        headers = [c.value for c in rows[0]]
+        for j, h in enumerate(headers):
+            h = str(h or '')
+            kind = ('name', 'P{:03d}') if h == '姓名' else ('id', 'E{:03d}') if h == '員工編號' else \
+                   ('doc', 'D{:02d}') if h.endswith('院_醫師') or h.startswith('醫師姓名') or h == '醫師' else None
+            if kind is None: continue
+            for row in rows[1:]: row[j].value = code(kind[0], row[j].value, kind[1])
+    out = io.BytesIO(); wb.save(out)
+    return out.getvalue()
+
+
+# ==========================================
+# 🏃 主程式
+# ==========================================
+def department_of(data):
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True)
+    names = wb.sheetnames; wb.close()
+    return next((dept for dept, sheet in CALENDAR_SHEETS.items() if sheet in names), None)
+
+
+def build_corpus(n_generated, corpus_dir, seed):
+    """[(案例名稱, 部門, xlsx bytes)]：合成輸入表 (engine 模板 + 隨機請假 / 休診 / 需求) 與目錄中的去識別化輸入表"""
+    rnd = random.Random(seed); cases = []
+    for i in range(n_generated):
+        for dept in ('rehab', 'nurse'):
+            cases.append((f"gen{i:02d}_{dept}", dept, synthetic_input(dept, 2026, 1 + (seed + i) % 12, rnd)))
+    for path in sorted(glob.glob(os.path.join(corpus_dir, '*.xlsx'))) if corpus_dir else []:
+        with open(path, 'rb') as f: data = f.read()
+        dept = department_of(data)
+        if dept: cases.append((os.path.splitext(os.path.basename(path))[0], dept, data))
+        else: print(f"略過 {path}：不是排班輸入表")
+    return cases
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--generated', type=int, default=5, help='每個部門產生幾份合成輸入表')
+    parser.add_argument('--corpus-dir', help='放去識別化真實輸入表 (xlsx) 的目錄')
+    parser.add_argument('--modes', default=','.join(MODES), help=f'要比對的模式 ({", ".join(MODES)})')
+    parser.add_argument('--repeat', type=int, default=1, help='每個案例重複幾次取最快時間')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='difftest_out', help='差異案例的最小重現輸入表輸出目錄')
+    parser.add_argument('--no-minimize', action='store_true', help='有差異時不縮小輸入表')
+    parser.add_argument('--anonymize-to', help='把 --corpus-dir 的輸入表去識別化後寫到此目錄，然後結束')
+    parser.add_argument('--csv', help='另外把結果寫成 CSV')
+    args = parser.parse_args(argv)
+
+    if args.anonymize_to:
+        if not args.corpus_dir: parser.error('--anonymize-to 需搭配 --corpus-dir')
+        os.makedirs(args.anonymize_to, exist_ok=True)
+        for i, path in enumerate(sorted(glob.glob(os.path.join(args.corpus_dir, '*.xlsx'))), 1):
+            with open(path, 'rb') as f: data = anonymize(f.read())
+            with open(os.path.join(args.anonymize_to, f"anon_{i:03d}.xlsx"), 'wb') as f: f.write(data)  # 檔名也不帶原名
+        print(f"已去識別化 → {args.anonymize_to}")
+        return []
+
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown: parser.error(f"未知的模式: {', '.join(sorted(unknown))}")
+
+    cases = build_corpus(args.generated, args.corpus_dir, args.seed)
+    print(f"{len(cases)} 個案例 × {len(modes)} 個模式", flush=True)
+    print(f"{'案例':<18} {'模式':<14} {'參考 ms':>8} {'模式 ms':>8} {'倍數':>6}  結果")
+    rows = []
+    for name, dept, data in cases:
+        try:
+            ref, ref_t = timed(run_reference, dept, data, repeat=args.repeat)
+        except Exception as e:
+            print(f"{name:<18} {'(參考)':<14} 無法排班: {e}"); continue
+        for mode in modes:
+            try:
+                alt, alt_t = timed(MODES[mode], dept, data, repeat=args.repeat)
+                diff = compare(ref, alt)
+            except Exception as e:
+                alt_t, diff = float('nan'), {'error': str(e)}
+            row = {'case': name, 'dept': dept, 'mode': mode, 'ref_ms': ref_t * 1000, 'mode_ms': alt_t * 1000,
+                   'speedup': ref_t / alt_t if alt_t == alt_t and alt_t else float('nan'), 'same': not diff, 'diff': json.dumps(diff, ensure_ascii=False)}
+            if diff and 'error' not in diff and not args.no_minimize:
+                small, runs = minimize(dept, data, mode)
+                os.makedirs(args.out, exist_ok=True)
+                row['repro'] = os.path.join(args.out, f"{name}_{mode}.xlsx")
+                with open(row['repro'], 'wb') as f: f.write(small)
+            rows.append(row)
+            status = '✅ 相同' if not diff else f"❌ {row['diff']}" + (f" → {row['repro']}" if row.get('repro') else '')
+            print(f"{name:<18} {mode:<14} {row['ref_ms']:>8.0f} {row['mode_ms']:>8.0f} {row['speedup']:>6.2f}  {status}", flush=True)
+
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        print('\n模式彙總 (倍數 = 參考耗時 / 模式耗時，中位數)：')
+        for mode, g in df.groupby('mode', sort=False):
+            print(f"  {mode:<14} 相同 {int(g['same'].sum())}/{len(g)}  倍數 {g['speedup'].median():.2f}")
+    if args.csv: df.to_csv(args.csv, index=False)
+    return rows
+
+
+if __name__ == '__main__':
+    rows = main()
+    sys.exit(1 if any(not r['same'] for r in rows) else 0)
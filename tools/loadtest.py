@@ -0,0 +1,149 @@
+"""
+本機壓力測試：模擬多位協調人員同時排班 / 轉檔 / 下載模板。
+
+    python -m tools.loadtest --levels 1,2,4,8 --sessions 4
+
+每個並行數 (level) 開 level 個 session (執行緒，與 Streamlit 每個 session 一條執行緒相同)，
+每個 session 依序執行 --sessions 次隨機操作；輸入表由模板加上隨機請假 / 需求變動產生。
+輸出每個 level 的吞吐量、p50/p95/p99 延遲與記憶體高峰。完全在本機執行，不需要任何外部服務。
+"""
+import argparse
+import io
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+# 模板快取與名單寫到暫存目錄，不影響正式資料
+os.environ.setdefault('SCHEDULE_DATA_DIR', tempfile.mkdtemp(prefix='schedule_loadtest_'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import openpyxl
+
+from engine import nurse, rehab
+
+OPERATIONS = ('rehab', 'nurse', 'rehab_erp', 'nurse_erp', 'template')
+
+
+# ==========================================
+# 🧪 合成輸入表
+# ==========================================
+def synthetic_input(dept, year, month, rnd):
+    """模板 + 隨機請假 / 休診 / 需求變動，回傳 xlsx bytes"""
+    gen = rehab.build_template if dept == 'rehab' else nurse.build_nurse_template
+    roster = rehab.REAL_STAFF_DATA if dept == 'rehab' else nurse.DEFAULT_STAFF
+    wb = openpyxl.load_workbook(io.BytesIO(gen(year, month, roster)))
+    ws1 = wb[wb.sheetnames[1]]; ws3 = wb['3_例外請假']
+    names = [row[1] for row in roster]
+    dates = sorted({r[0].value for r in ws1.iter_rows(min_row=2)})
+    status_col = 10 if dept == 'rehab' else 6
+    for r in ws1.iter_rows(min_row=2):
+        if rnd.random() < 0.05: r[status_col - 1].value = '休診'
+        if dept == 'rehab':
+            for c in range(5, 9): r[c].value = rnd.randint(0, 5)
+    for _ in range(rnd.randint(5, 40)):
+        ws3.append([rnd.choice(names), rnd.choice(dates), rnd.choice(['A', 'B', 'C', 'AB', None]), rnd.choice(['OFF', 'OFF', 'ON'])])
+    out = io.BytesIO(); wb.save(out)
+    return out.getvalue()
+
+
+def build_corpus(n, seed):
+    """每個部門 n 份輸入表與對應的排班結果 (ERP 轉檔用)"""
+    rnd = random.Random(seed)
+    corpus = {'rehab': [], 'nurse': []}
+    for dept, run in (('rehab', rehab.run_scheduler_bytes), ('nurse', nurse.run_nurse_scheduler)):
+        for i in range(n):
+            data = synthetic_input(dept, 2026, 1 + (seed + i) % 12, rnd)
+            result, _ = run(io.BytesIO(data))
+            corpus[dept].append((data, result.getvalue()))
+    return corpus
+
+
+# ==========================================
+# ⏱️ 執行
+# ==========================================
+def run_operation(op, corpus, rnd):
+    if op == 'template':
+        # 不同年月才會真的產生；相同年月走磁碟快取
+        gen = rehab.generate_template_bytes if rnd.random() < 0.5 else nurse.generate_nurse_template_bytes
+        return gen(rnd.choice([2026, 2027]), rnd.randint(1, 12))
+    dept = 'rehab' if op.startswith('rehab') else 'nurse'
+    data, result = rnd.choice(corpus[dept])
+    if op == 'rehab': return rehab.run_scheduler_bytes(io.BytesIO(data))
+    if op == 'nurse': return nurse.run_nurse_scheduler(io.BytesIO(data))
+    if op == 'rehab_erp': return rehab.convert_erp_bytes(io.BytesIO(result))
+    return nurse.convert_nurse_erp(io.BytesIO(result))
+
+
+def session(ops, n_ops, corpus, seed, latencies, lock):
+    rnd = random.Random(seed)
+    for _ in range(n_ops):
+        op = rnd.choice(ops)
+        t = time.perf_counter()
+        run_operation(op, corpus, rnd)
+        elapsed = time.perf_counter() - t
+        with lock: latencies.append((op, elapsed))
+
+
+def run_level(level, ops, n_ops, corpus, seed, trace_memory):
+    latencies, lock = [], threading.Lock()
+    if trace_memory: tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=level) as pool:
+        futures = [pool.submit(session, ops, n_ops, corpus, seed * 1000 + i, latencies, lock) for i in range(level)]
+        for f in futures: f.result()
+    wall = time.perf_counter() - start
+    ms = np.array([x for _, x in latencies]) * 1000
+    row = {
+        'level': level, 'ops': len(ms), 'throughput': len(ms) / wall,
+        'p50': np.percentile(ms, 50), 'p95': np.percentile(ms, 95), 'p99': np.percentile(ms, 99),
+        'peak_mb': tracemalloc.get_traced_memory()[1] / 2**20 if trace_memory else float('nan'),
+        'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    row['by_op'] = {op: np.percentile([x * 1000 for o, x in latencies if o == op], 50) for op in ops if any(o == op for o, _ in latencies)}
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--levels', default='1,2,4,8', help='並行 session 數，逗號分隔')
+    parser.add_argument('--sessions', type=int, default=4, help='每個 session 執行幾次操作')
+    parser.add_argument('--ops', default=','.join(OPERATIONS), help=f'操作種類 ({", ".join(OPERATIONS)})')
+    parser.add_argument('--corpus', type=int, default=3, help='每個部門產生幾份合成輸入表')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-tracemalloc', action='store_true', help='不追蹤 Python 配置高峰 (tracemalloc 會拖慢約 2 倍)')
+    parser.add_argument('--csv', help='另外把結果寫成 CSV')
+    args = parser.parse_args(argv)
+
+    ops = [op.strip() for op in args.ops.split(',') if op.strip()]
+    unknown = set(ops) - set(OPERATIONS)
+    if unknown: parser.error(f"未知的操作: {', '.join(sorted(unknown))}")
+    levels = [int(x) for x in args.levels.split(',')]
+
+    print(f"產生合成輸入表 ({args.corpus} 份 × 2 部門)...", flush=True)
+    corpus = build_corpus(args.corpus, args.seed)
+    trace_memory = not args.no_tracemalloc
+    if trace_memory: tracemalloc.start()
+
+    rows = []
+    print(f"{'並行':>4} {'次數':>5} {'ops/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'高峰 MB':>8} {'RSS MB':>8}")
+    for level in levels:
+        row = run_level(level, ops, args.sessions, corpus, args.seed, trace_memory)
+        rows.append(row)
+        print(f"{row['level']:>4} {row['ops']:>5} {row['throughput']:>7.2f} {row['p50']:>8.0f} {row['p95']:>8.0f} {row['p99']:>8.0f} {row['peak_mb']:>8.1f} {row['rss_mb']:>8.0f}", flush=True)
+        print('     p50 by op: ' + ', '.join(f"{op} {v:.0f}ms" for op, v in row['by_op'].items()))
+
+    if args.csv:
+        import pandas as pd
+        pd.DataFrame([{k: v for k, v in r.items() if k != 'by_op'} for r in rows]).to_csv(args.csv, index=False)
+    return rows
+
+
+if __name__ == '__main__':
+    main()